@@ -1,4 +1,16 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.translation import gettext_lazy as _
+
+from .importer import (
+    OPTIONAL_COLUMNS,
+    REQUIRED_COLUMNS,
+    ImportFileError,
+    import_students,
+)
 from .models import User, Student, Parent
 
 
@@ -30,7 +42,15 @@ class UserAdmin(admin.ModelAdmin):
         verbose_name_plural = "Users"
 
 
+class StudentImportForm(forms.Form):
+    file = forms.FileField(label=_("CSV or XLSX file"))
+    send_welcome = forms.BooleanField(
+        label=_("Send welcome emails"), required=False, initial=True
+    )
+
+
 class StudentAdmin(admin.ModelAdmin):
+    change_list_template = "admin/accounts/student/change_list.html"
     list_display = [
         "student",
         "program",
@@ -52,6 +72,50 @@ class StudentAdmin(admin.ModelAdmin):
         return obj.student.email
     get_email.short_description = "Email"
 
+    def get_urls(self):
+        urls = [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_view),
+                name="accounts_student_import",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        result = None
+        form = StudentImportForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            try:
+                result = import_students(
+                    upload,
+                    upload.name,
+                    send_welcome=form.cleaned_data["send_welcome"],
+                )
+            except ImportError:
+                messages.error(request, _("Reading XLSX files requires openpyxl."))
+            except ImportFileError as e:
+                form.add_error("file", str(e))
+            else:
+                messages.success(
+                    request,
+                    _("Imported %(created)s students, %(skipped)s rows skipped.")
+                    % {"created": result.created, "skipped": len(result.errors)},
+                )
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": _("Import students"),
+            "form": form,
+            "result": result,
+            "required_columns": REQUIRED_COLUMNS,
+            "optional_columns": OPTIONAL_COLUMNS,
+        }
+        return TemplateResponse(request, "admin/accounts/student/import.html", context)
+
 
 admin.site.register(User, UserAdmin)
 admin.site.register(Student, StudentAdmin)
@@ -152,9 +152,8 @@ class StaffAddForm(UserCreationForm):
             
             # Send welcome email to the new lecturer
             try:
-                from django.core.mail import send_mail
-                from django.conf import settings
-                
+                from core.mail import queue_mail
+
                 subject = f"Welcome to KCET CMS - {user.get_full_name}"
                 message = f"""
 Dear {user.get_full_name},
@@ -173,19 +172,11 @@ Best regards,
 KCET CMS Team
                 """
                 
-                # Send email
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.EMAIL_FROM_ADDRESS,
-                    recipient_list=[user.email],
-                    fail_silently=False,
-                )
-                
-                print(f"✅ Welcome email sent to lecturer {user.email}")
-                
+                # Sent by the outbox worker
+                queue_mail(subject, message, [user.email])
+
             except Exception as e:
-                print(f"⚠️ Error sending welcome email to lecturer {user.email}: {e}")
+                print(f"⚠️ Error queueing welcome email to lecturer {user.email}: {e}")
             
             # Automatically assign courses to the new lecturer
             try:
@@ -444,9 +435,8 @@ class StudentAddForm(UserCreationForm):
             
             # Send welcome email to the new student
             try:
-                from django.core.mail import send_mail
-                from django.conf import settings
-                
+                from core.mail import queue_mail
+
                 subject = f"Welcome to KCET CMS - {user.get_full_name}"
                 message = f"""
 Dear {user.get_full_name},
@@ -466,19 +456,11 @@ Best regards,
 KCET CMS Team
                 """
                 
-                # Send email
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.EMAIL_FROM_ADDRESS,
-                    recipient_list=[user.email],
-                    fail_silently=False,
-                )
-                
-                print(f"✅ Welcome email sent to {user.email}")
-                
+                # Sent by the outbox worker
+                queue_mail(subject, message, [user.email])
+
             except Exception as e:
-                print(f"⚠️ Error sending welcome email to {user.email}: {e}")
+                print(f"⚠️ Error queueing welcome email to {user.email}: {e}")
 
         return user
 
@@ -0,0 +1,92 @@
+"""
+Profile picture variants.
+
+When a new picture is uploaded it is cropped to a square and written at
+``PICTURE_SIZES`` in WebP and JPEG.  The file names carry a hash of the
+uploaded bytes, so a variant never changes once written and can be
+cached forever; a new upload simply gets new names.  The work happens
+once per upload, after the user row is committed, instead of on every
+``User.save``.  The variants of a replaced picture or a deleted user are
+removed once no other user's ``picture_hash`` points at them.
+"""
+import hashlib
+import io
+import logging
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+PICTURE_SIZES = (48, 96, 300)
+VARIANT_FORMATS = (("webp", "WEBP"), ("jpg", "JPEG"))
+VARIANT_DIR = "profile_pictures/variants"
+VARIANT_QUALITY = 85
+
+
+def variant_name(digest, size, ext):
+    return f"{VARIANT_DIR}/{digest}-{size}.{ext}"
+
+
+def pick_size(size):
+    """The smallest variant size covering ``size`` px (or the largest one)."""
+    return next((s for s in PICTURE_SIZES if s >= size), PICTURE_SIZES[-1])
+
+
+def _square_rgb(image):
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    else:
+        image = image.convert("RGB")
+    side = min(image.size)
+    return ImageOps.fit(image, (side, side), Image.LANCZOS)
+
+
+def write_picture_variants(picture):
+    """Write every variant of ``picture`` (a ``FieldFile``); return the digest."""
+    picture.open("rb")
+    try:
+        data = picture.read()
+    finally:
+        picture.close()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    with Image.open(io.BytesIO(data)) as image:
+        square = _square_rgb(image)
+    for size in PICTURE_SIZES:
+        thumb = square.resize((size, size), Image.LANCZOS)
+        for ext, fmt in VARIANT_FORMATS:
+            name = variant_name(digest, size, ext)
+            if default_storage.exists(name):
+                continue
+            buffer = io.BytesIO()
+            thumb.save(buffer, fmt, quality=VARIANT_QUALITY)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    return digest
+
+
+def update_picture_variants(user):
+    """Generate the variants of ``user.picture`` and record their digest."""
+    name = user.picture.name
+    try:
+        digest = write_picture_variants(user.picture)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning("Could not process picture %s of user %s: %s", name, user.pk, e)
+        return None
+    # Skip if another upload replaced the picture meanwhile
+    type(user).objects.filter(pk=user.pk, picture=name).update(picture_hash=digest)
+    user.picture_hash = digest
+    return digest
+
+
+def delete_picture_variants(model, digest):
+    """Delete the variants of ``digest`` unless a ``model`` row still uses them."""
+    if not digest or model.objects.filter(picture_hash=digest).exists():
+        return
+    for size in PICTURE_SIZES:
+        for ext, _ in VARIANT_FORMATS:
+            default_storage.delete(variant_name(digest, size, ext))
@@ -0,0 +1,364 @@
+"""
+Bulk student import from CSV or XLSX.
+
+The file is streamed row by row and handled in chunks of
+``IMPORT_CHUNK_SIZE``.  Each chunk is validated against the file so far
+and one query per lookup (programs, usernames, enrollment numbers), then
+saved in its own transaction with ``bulk_create`` for users, student
+profiles, enrollments and tuition fees.  Welcome emails go to the outbox
+in the same transaction.  A bad row is reported with its line number and the
+rest of the file carries on.  Before the first chunk is saved the whole file
+is read once (``check_file``), so a file that cannot be decoded or lacks
+required columns is refused as a whole instead of half imported.
+
+The first row holds the column names; ``first_name``, ``last_name``,
+``email``, ``enrollment_number`` and ``program`` (title or id) are
+required, ``username``, ``password``, ``level``, ``semester``,
+``gender``, ``phone`` and ``address`` are optional.
+"""
+import csv
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, transaction
+
+from core.activity import log_activity
+from core.enrollment import default_batches, enroll_students
+from core.fees import provision_fee_schedules
+from core.mail import queue_html_mail
+from core.models import CourseOffering
+from core.utils import allocate_slugs
+from course.models import Program
+
+from .models import GENDERS, LEVEL, Student, User
+from .utils import generate_password
+
+IMPORT_CHUNK_SIZE = 500
+# PBKDF2 releases the GIL, so passwords are hashed on a few threads
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+REQUIRED_COLUMNS = ("first_name", "last_name", "email", "enrollment_number", "program")
+OPTIONAL_COLUMNS = (
+    "username",
+    "password",
+    "level",
+    "semester",
+    "gender",
+    "phone",
+    "address",
+)
+
+# Columns checked against the max_length of these models' fields
+LENGTH_CHECKED_COLUMNS = {
+    "first_name": User,
+    "last_name": User,
+    "email": User,
+    "username": User,
+    "phone": User,
+    "address": User,
+    "enrollment_number": Student,
+}
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported."""
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []  # (line, message)
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+def _column(name):
+    return str(name or "").strip().lower().replace(" ", "_")
+
+
+def read_rows(fileobj, filename=""):
+    """Yield ``(line, {column: value})`` for every data row of the file."""
+    if filename.lower().endswith(".xlsx"):
+        rows = _read_xlsx(fileobj)
+    else:
+        if isinstance(fileobj.read(0), bytes):
+            fileobj = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+        rows = csv.reader(fileobj)
+    header = None
+    for line, values in enumerate(rows, start=1):
+        if header is None:
+            header = [_column(value) for value in values]
+            continue
+        if not any(str(value or "").strip() for value in values):
+            continue
+        yield line, {
+            column: str(value if value is not None else "").strip()
+            for column, value in zip(header, values)
+        }
+
+
+def _read_xlsx(fileobj):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _read_errors(filename):
+    errors = (UnicodeDecodeError, csv.Error, zipfile.BadZipFile)
+    if filename.lower().endswith(".xlsx"):
+        from openpyxl.utils.exceptions import InvalidFileException
+
+        # openpyxl raises KeyError for a zip that is not a workbook
+        errors += (InvalidFileException, KeyError)
+    return errors
+
+
+def check_file(fileobj, filename=""):
+    """
+    Read all of ``fileobj`` and rewind it; raises ``ImportFileError`` when
+    it cannot be decoded or its header lacks a required column.
+    """
+    xlsx = filename.lower().endswith(".xlsx")
+    text = None
+    if not xlsx and isinstance(fileobj.read(0), bytes):
+        text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    rows = _read_xlsx(fileobj) if xlsx else csv.reader(text or fileobj)
+    try:
+        header = next(rows, None)
+        if header is None:
+            raise ImportFileError("The file is empty.")
+        missing = set(REQUIRED_COLUMNS).difference(map(_column, header))
+        if missing:
+            raise ImportFileError(
+                "Missing columns: "
+                + ", ".join(c for c in REQUIRED_COLUMNS if c in missing)
+            )
+        for _ in rows:
+            pass
+    except UnicodeDecodeError:
+        raise ImportFileError("The file is not UTF-8 encoded text.")
+    except _read_errors(filename) as e:
+        raise ImportFileError(f"The file could not be read: {e}")
+    finally:
+        if xlsx:
+            rows.close()
+        elif text is not None:
+            # Keep the upload open for the import
+            text.detach()
+    fileobj.seek(0)
+
+
+class StudentImporter:
+    def __init__(self, send_welcome=True, chunk_size=IMPORT_CHUNK_SIZE):
+        self.send_welcome = send_welcome
+        self.chunk_size = chunk_size
+        self.result = ImportResult()
+        self.programs = {}
+        for pk, title in Program.objects.values_list("pk", "title"):
+            self.programs[str(pk)] = pk
+            self.programs.setdefault(title.strip().lower(), pk)
+        self.levels = {str(value).lower(): value for value, _ in LEVEL}
+        self.semesters = {
+            str(value).lower(): value for value, _ in settings.SEMESTER_CHOICES
+        }
+        self.genders = {str(value).lower(): value for value, _ in GENDERS}
+        self.seen_usernames = set()
+        self.seen_enrollment_numbers = set()
+
+    def run(self, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk)
+        self.result.errors.sort()
+        if self.result.created:
+            log_activity(f"Imported {self.result.created} students")
+        return self.result
+
+    def _clean(self, row):
+        missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+        if missing:
+            raise ValidationError(f"Missing {', '.join(missing)}")
+        for column, model in LENGTH_CHECKED_COLUMNS.items():
+            max_length = model._meta.get_field(column).max_length
+            if len(row.get(column, "")) > max_length:
+                raise ValidationError(
+                    f"{column} is longer than {max_length} characters"
+                )
+        try:
+            validate_email(row["email"])
+        except ValidationError:
+            raise ValidationError(f"Invalid email {row['email']!r}")
+        program_id = self.programs.get(row["program"].lower())
+        if program_id is None:
+            raise ValidationError(f"Unknown program {row['program']!r}")
+        cleaned = dict(row, program_id=program_id)
+        for column, choices in (
+            ("level", self.levels),
+            ("semester", self.semesters),
+            ("gender", self.genders),
+        ):
+            value = row.get(column, "")
+            if value and value.lower() not in choices:
+                raise ValidationError(f"Invalid {column} {value!r}")
+            cleaned[column] = choices.get(value.lower()) if value else None
+
+        number = row["enrollment_number"]
+        if number in self.seen_enrollment_numbers:
+            raise ValidationError(f"Duplicate enrollment number {number!r}")
+        self.seen_enrollment_numbers.add(number)
+        username = row.get("username", "")
+        if username:
+            if username in self.seen_usernames:
+                raise ValidationError(f"Duplicate username {username!r}")
+            self.seen_usernames.add(username)
+        return cleaned
+
+    def _import_chunk(self, chunk):
+        valid = []
+        for line, row in chunk:
+            try:
+                valid.append((line, self._clean(row)))
+            except ValidationError as e:
+                self.result.error(line, e.messages[0])
+
+        numbers = {row["enrollment_number"] for _, row in valid}
+        usernames = {row["username"] for _, row in valid if row.get("username")}
+        taken_numbers = set(
+            Student.objects.filter(enrollment_number__in=numbers).values_list(
+                "enrollment_number", flat=True
+            )
+        )
+        taken_usernames = set(
+            User.objects.filter(username__in=usernames).values_list(
+                "username", flat=True
+            )
+        )
+        rows = []
+        for line, row in valid:
+            if row["enrollment_number"] in taken_numbers:
+                self.result.error(
+                    line, f"Enrollment number {row['enrollment_number']!r} exists"
+                )
+            elif row.get("username") in taken_usernames:
+                self.result.error(line, f"Username {row['username']!r} exists")
+            else:
+                rows.append((line, row))
+        if not rows:
+            return
+
+        try:
+            self._save(rows)
+        except DatabaseError:
+            # Lost a race with another writer, or a value the database
+            # refuses; find the culprits row by row
+            for line, row in rows:
+                try:
+                    self._save([(line, row)])
+                except DatabaseError as e:
+                    self.result.error(line, f"Could not be saved: {e}")
+
+    @transaction.atomic
+    def _save(self, rows):
+        # Explicit usernames of the file so far must not be handed out
+        generated = allocate_slugs(
+            User,
+            [f"{row['first_name']} {row['last_name']}" for _, row in rows],
+            field="username",
+            reserved=self.seen_usernames,
+        )
+        passwords = [row.get("password") or generate_password() for _, row in rows]
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+            hashes = list(pool.map(make_password, passwords))
+        batches = default_batches({row["program_id"] for _, row in rows})
+
+        users = [
+            User(
+                username=row.get("username") or username,
+                password=password_hash,
+                first_name=row["first_name"],
+                last_name=row["last_name"],
+                email=row["email"],
+                gender=row["gender"],
+                phone=row.get("phone") or None,
+                address=row.get("address") or None,
+                is_student=True,
+                batch_id=batches[row["program_id"]],
+            )
+            for (_, row), username, password_hash in zip(rows, generated, hashes)
+        ]
+        User.objects.bulk_create(users)
+        # Not every backend sets primary keys on bulk_create
+        ids = dict(
+            User.objects.filter(username__in=[user.username for user in users])
+            .values_list("username", "pk")
+        )
+        for user in users:
+            user.pk = ids[user.username]
+
+        Student.objects.bulk_create(
+            [
+                Student(
+                    student_id=user.pk,
+                    enrollment_number=row["enrollment_number"],
+                    program_id=row["program_id"],
+                    level=row["level"],
+                    semester=row["semester"],
+                )
+                for user, (_, row) in zip(users, rows)
+            ]
+        )
+        provision_fee_schedules(users)
+
+        by_batch = {}
+        for user in users:
+            by_batch.setdefault(user.batch_id, []).append(user)
+        offerings = {}
+        for pk, batch_id in CourseOffering.objects.filter(
+            batch_id__in=by_batch
+        ).values_list("pk", "batch_id"):
+            offerings.setdefault(batch_id, []).append(pk)
+        for batch_id, students in by_batch.items():
+            enroll_students(students, offerings.get(batch_id, ()))
+
+        if self.send_welcome:
+            for user, password in zip(users, passwords):
+                self._queue_welcome(user, password)
+        self.result.created += len(users)
+
+    def _queue_welcome(self, user, password):
+        queue_html_mail(
+            "Your KCET account confirmation and credentials",
+            [user.email],
+            "accounts/email/new_student_account_confirmation.html",
+            {"user": user, "password": password},
+        )
+
+
+def import_students(
+    fileobj, filename="", send_welcome=True, chunk_size=IMPORT_CHUNK_SIZE
+):
+    """
+    Import the students in ``fileobj``; returns an ``ImportResult``.
+
+    Raises ``ImportFileError`` before anything is saved if the file
+    cannot be read.
+    """
+    check_file(fileobj, filename)
+    importer = StudentImporter(send_welcome=send_welcome, chunk_size=chunk_size)
+    return importer.run(read_rows(fileobj, filename))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from accounts.images import update_picture_variants
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = "Create the resized variants of uploaded profile pictures that lack them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Regenerate the variants of every uploaded picture",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(picture__isnull=False).exclude(
+            picture__in=["", "default.png"]
+        )
+        if not options["all"]:
+            users = users.filter(picture_hash="")
+        done = failed = 0
+        for user in users.only("pk", "picture", "picture_hash").iterator():
+            if update_picture_variants(user):
+                done += 1
+            else:
+                failed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {done} pictures, {failed} failed")
+        )
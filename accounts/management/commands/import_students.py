@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.importer import IMPORT_CHUNK_SIZE, import_students
+from core.activity import activity_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Create student accounts from a CSV or XLSX file. Rows with errors "
+        "are reported and skipped; the rest of the file is imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or XLSX file with a header row")
+        parser.add_argument(
+            "--no-email",
+            action="store_true",
+            help="Do not send welcome emails",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help="Rows saved per transaction",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            with open(path, "rb") as f, activity_buffer():
+                result = import_students(
+                    f,
+                    path,
+                    send_welcome=not options["no_email"],
+                    chunk_size=options["chunk_size"],
+                )
+        except OSError as e:
+            raise CommandError(e)
+        except ImportError:
+            raise CommandError("Reading XLSX files requires openpyxl")
+
+        for line, message in result.errors:
+            self.stderr.write(self.style.ERROR(f"Line {line}: {message}"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result.created} students, {len(result.errors)} rows skipped"
+            )
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.8 on 2026-10-19 01:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_student_feedback_submitted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='picture_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+    ]
@@ -1,12 +1,20 @@
-from django.db import models
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.db import models, transaction
 from django.urls import reverse
 from django.contrib.auth.models import AbstractUser, UserManager
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Q
-from PIL import Image
 
 from course.models import Program
+from .images import (
+    delete_picture_variants,
+    pick_size,
+    update_picture_variants,
+    variant_name,
+)
 from .validators import ASCIIUsernameValidator
 
 
@@ -78,6 +86,8 @@ class User(AbstractUser):
     picture = models.ImageField(
         upload_to="profile_pictures/%y/%m/%d/", default="default.png", null=True
     )
+    # Content hash naming the picture's resized variants (see accounts.images)
+    picture_hash = models.CharField(max_length=16, blank=True, editable=False)
     email = models.EmailField(blank=True, null=True)
     batch = models.ForeignKey('core.Batch', on_delete=models.SET_NULL, null=True, blank=True, related_name='students')
 
@@ -118,24 +128,40 @@ class User(AbstractUser):
             no_picture = settings.MEDIA_URL + "default.png"
             return no_picture
 
+    def get_picture_variant(self, size, ext="jpg"):
+        """URL of the picture variant covering ``size`` px, or the original."""
+        if not self.picture_hash:
+            return self.get_picture()
+        return default_storage.url(
+            variant_name(self.picture_hash, pick_size(size), ext)
+        )
+
     def get_absolute_url(self):
         return reverse("profile_single", kwargs={"user_id": self.id})
 
     def save(self, *args, **kwargs):
+        # Only a freshly uploaded file is uncommitted; saves that merely
+        # touch other fields (last_login...) leave the picture alone.
+        uploaded = bool(self.picture) and not self.picture._committed
+        previous_hash = self.picture_hash
+        if uploaded:
+            self.picture_hash = ""
         super().save(*args, **kwargs)
-        try:
-            img = Image.open(self.picture.path)
-            if img.height > 300 or img.width > 300:
-                output_size = (300, 300)
-                img.thumbnail(output_size)
-                img.save(self.picture.path)
-        except:
-            pass
+        if uploaded:
+            transaction.on_commit(partial(update_picture_variants, self))
+            # Runs after the new variants, so re-uploading the same image
+            # keeps them
+            transaction.on_commit(
+                partial(delete_picture_variants, type(self), previous_hash)
+            )
 
     def delete(self, *args, **kwargs):
         if self.picture.url != settings.MEDIA_URL + "default.png":
             self.picture.delete()
         super().delete(*args, **kwargs)
+        transaction.on_commit(
+            partial(delete_picture_variants, type(self), self.picture_hash)
+        )
 
 
 class StudentManager(models.Manager):
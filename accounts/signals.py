@@ -3,6 +3,7 @@ from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from course.models import Course, CourseAllocation, Program
 from core.models import Session, CourseOffering, Batch, StudentEnrollment
+from core.enrollment import enroll_batch, enroll_students
 from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
 from django.shortcuts import redirect
@@ -77,121 +78,15 @@ def update_lecturer_course_assignments(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def auto_enroll_student_in_courses(sender, instance, created, **kwargs):
+def enroll_student_in_batch_courses(sender, instance, created, **kwargs):
     """
-    Automatically enroll students in course offerings when they're added to a batch.
-    This ensures students appear in attendance lists for their assigned courses.
+    Keep students enrolled in every course offering of their batch, whether
+    the batch was set when the student was created or assigned later.
     """
-    if created and instance.is_student and instance.batch:
-        try:
-            # Get all course offerings for this batch
-            course_offerings = CourseOffering.objects.filter(batch=instance.batch)
-            
-            for offering in course_offerings:
-                StudentEnrollment.objects.get_or_create(
-                    student=instance,
-                    course_offering=offering,
-                    defaults={'is_active': True}
-                )
-            print(f"Auto-enrolled {instance.get_full_name} in {course_offerings.count()} courses")
-            
-        except Exception as e:
-            print(f"Error auto-enrolling student {instance.get_full_name}: {e}")
-
-
-@receiver(post_save, sender=User)
-def auto_enroll_existing_student_in_new_courses(sender, instance, created, **kwargs):
-    """
-    Auto-enroll existing students in new courses when their batch gets new course offerings.
-    """
-    if not created and instance.is_student and instance.batch:
-        try:
-            # Get all course offerings for this batch
-            course_offerings = CourseOffering.objects.filter(batch=instance.batch)
-            
-            # Get existing enrollments
-            existing_enrollments = StudentEnrollment.objects.filter(
-                student=instance,
-                course_offering__in=course_offerings
-            )
-            
-            # Enroll in courses that don't have enrollments yet
-            for offering in course_offerings:
-                if not existing_enrollments.filter(course_offering=offering).exists():
-                    StudentEnrollment.objects.get_or_create(
-                        student=instance,
-                        course_offering=offering,
-                        defaults={'is_active': True}
-                    )
-                    print(f"Auto-enrolled existing student {instance.get_full_name} in {offering.course.title}")
-                    
-        except Exception as e:
-            print(f"Error auto-enrolling existing student {instance.get_full_name}: {e}")
-
-
-@receiver(post_save, sender=CourseOffering)
-def auto_enroll_batch_students_in_new_course(sender, instance, created, **kwargs):
-    """
-    Automatically enroll all students from a batch in a new course offering.
-    This ensures when a new course is added to a batch, all students are automatically enrolled.
-    """
-    if created and instance.batch:
-        try:
-            batch_students = User.objects.filter(is_student=True, batch=instance.batch)
-            
-            for student in batch_students:
-                StudentEnrollment.objects.get_or_create(
-                    student=student,
-                    course_offering=instance,
-                    defaults={'is_active': True}
-                )
-            print(f"Auto-enrolled {batch_students.count()} students in {instance.course.title}")
-            
-        except Exception as e:
-            print(f"Error auto-enrolling batch students: {e}")
-
-
-@receiver(post_save, sender=CourseOffering)
-def sync_course_offerings_on_allocation_change(sender, instance, created, **kwargs):
-    """
-    Sync CourseOfferings when CourseAllocation changes.
-    This ensures both systems stay in sync.
-    """
-    if created:
-        try:
-            # Create corresponding CourseAllocation if it doesn't exist
-            from course.models import CourseAllocation
-            CourseAllocation.objects.get_or_create(
-                lecturer=instance.lecturer,
-                course=instance.course,
-                session=instance.session,
-                defaults={'is_active': True}
-            )
-            print(f"Created CourseAllocation for {instance.course.title}")
-            
-        except Exception as e:
-            print(f"Error syncing CourseAllocation: {e}")
-
-
-@receiver(post_save, sender=CourseAllocation)
-def sync_course_allocations_on_offering_change(sender, instance, created, **kwargs):
-    """
-    Sync CourseOfferings when CourseAllocation changes.
-    This ensures both systems stay in sync.
-    """
-    if created:
-        try:
-            # Create corresponding CourseOffering if it doesn't exist
-            CourseOffering.objects.get_or_create(
-                lecturer=instance.lecturer,
-                course=instance.course,
-                session=instance.session,
-                defaults={'is_active': True}
-            )
-            print(f"Created CourseOffering for {instance.course.title}")
-            
-        except Exception as e:
-            print(f"Error syncing CourseOffering: {e}")
+    if instance.is_student and instance.batch_id:
+        enroll_students(
+            [instance], CourseOffering.objects.filter(batch_id=instance.batch_id)
+        )
 
 
 @receiver(post_save, sender=User)
@@ -257,50 +152,4 @@ def auto_enroll_batch_students_in_existing_courses(sender, instance, created, **
     in any existing course offerings for that batch.
     """
     if created:
-        try:
-            # Get all students in this batch
-            batch_students = User.objects.filter(is_student=True, batch=instance)
-            
-            # Get all course offerings for this batch
-            course_offerings = CourseOffering.objects.filter(batch=instance)
-            
-            # Enroll each student in each course offering
-            for student in batch_students:
-                for offering in course_offerings:
-                    StudentEnrollment.objects.get_or_create(
-                        student=student,
-                        course_offering=offering,
-                        defaults={'is_active': True}
-                    )
-            
-            if batch_students.exists() and course_offerings.exists():
-                print(f"Auto-enrolled {batch_students.count()} students in {course_offerings.count()} courses for batch {instance.title}")
-                
-        except Exception as e:
-            print(f"Error auto-enrolling batch students in existing courses: {e}")
-
-
-@receiver(post_save, sender=User)
-def auto_assign_batch_to_student(sender, instance, created, **kwargs):
-    """
-    When a student is created or updated, ensure they are enrolled in all courses
-    for their batch, even if the batch was assigned later.
-    """
-    if instance.is_student and instance.batch:
-        try:
-            # Get all course offerings for this batch
-            course_offerings = CourseOffering.objects.filter(batch=instance.batch)
-            
-            # Enroll student in all course offerings for their batch
-            for offering in course_offerings:
-                StudentEnrollment.objects.get_or_create(
-                    student=instance,
-                    course_offering=offering,
-                    defaults={'is_active': True}
-                )
-            
-            if course_offerings.exists():
-                print(f"Ensured {instance.get_full_name} is enrolled in {course_offerings.count()} courses for batch {instance.batch.title}")
-                
-        except Exception as e:
-            print(f"Error ensuring student enrollment: {e}")
+        enroll_batch(instance)
@@ -0,0 +1,113 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from accounts.images import PICTURE_SIZES, variant_name
+from accounts.models import User
+
+
+def _png(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 128)).save(buffer, "PNG")
+    return SimpleUploadedFile("me.png", buffer.getvalue(), content_type="image/png")
+
+
+class PictureVariantsTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username="user1")
+
+    def test_upload_writes_square_variants(self):
+        self.user.picture = _png(640, 480)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(len(self.user.picture_hash), 16)
+        for size in PICTURE_SIZES:
+            for ext in ("webp", "jpg"):
+                path = os.path.join(
+                    self.media_root, variant_name(self.user.picture_hash, size, ext)
+                )
+                with Image.open(path) as image:
+                    self.assertEqual(image.size, (size, size))
+        # The upload itself is kept as it was
+        with Image.open(self.user.picture.path) as image:
+            self.assertEqual(image.size, (640, 480))
+
+    def test_saves_without_a_new_file_skip_processing(self):
+        self.user.picture = _png(100, 100)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save(update_fields=["last_login"])
+            User.objects.get(pk=self.user.pk).save()
+        self.assertEqual(callbacks, [])
+
+    def _upload(self, user, picture):
+        user.picture = picture
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        return user.picture_hash
+
+    def _variants_exist(self, digest):
+        return [
+            default_storage.exists(variant_name(digest, size, ext))
+            for size in PICTURE_SIZES
+            for ext in ("webp", "jpg")
+        ]
+
+    def test_replaced_picture_variants_are_deleted(self):
+        old = self._upload(self.user, _png(100, 100))
+        self.assertEqual(self._upload(self.user, _png(100, 100)), old)
+        self.assertTrue(all(self._variants_exist(old)))
+
+        new = self._upload(self.user, _png(200, 100))
+        self.assertNotEqual(new, old)
+        self.assertFalse(any(self._variants_exist(old)))
+        self.assertTrue(all(self._variants_exist(new)))
+
+    def test_deleted_user_variants_are_deleted_unless_shared(self):
+        other = User.objects.create_user(username="user2")
+        digest = self._upload(self.user, _png(100, 100))
+        self.assertEqual(self._upload(other, _png(100, 100)), digest)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertTrue(all(self._variants_exist(digest)))
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertFalse(any(self._variants_exist(digest)))
+
+    def test_broken_upload_keeps_original(self):
+        self.user.picture = SimpleUploadedFile("me.png", b"not an image")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.picture_hash, "")
+
+    def test_template_tag_picks_sizes(self):
+        template = Template(
+            '{% load accounts_tags %}{% profile_picture user 48 class="avatar" %}'
+        )
+        html = template.render(Context({"user": self.user}))
+        self.assertEqual(html, '<img src="/media/default.png" alt="user1" class="avatar">')
+
+        self.user.picture = _png(320, 320)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        html = template.render(Context({"user": self.user}))
+        digest = self.user.picture_hash
+        webp_2x = variant_name(digest, 96, "webp")
+        self.assertIn(f"{digest}-48.webp 1x, /media/{webp_2x} 2x", html)
+        self.assertIn(f'src="/media/{variant_name(digest, 48, "jpg")}"', html)
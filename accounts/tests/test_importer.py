@@ -0,0 +1,155 @@
+import io
+
+from django.conf import settings
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.importer import ImportFileError, import_students
+from accounts.models import Student, User
+from core.mail import send_queued_mail
+from core.models import Batch, CourseOffering, StudentEnrollment, StudentTuitionFee
+from course.models import Course, Program
+
+HEADER = "First name,Last name,Email,Enrollment number,Program,Semester,Username\n"
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+)
+class StudentImporterTestCase(TestCase):
+    def setUp(self):
+        self.program = Program.objects.create(title="Computer Science")
+        lecturer = User.objects.create_user(username="lecturer", is_lecturer=True)
+        self.offering = CourseOffering.objects.create(
+            program=self.program,
+            course=Course.objects.create(
+                title="Algorithms",
+                code="CS-1",
+                program=self.program,
+                level=settings.BACHELOR_DEGREE,
+                semester=settings.FIRST,
+            ),
+            lecturer=lecturer,
+            batch=Batch.objects.create(
+                title="Default Computer Science", program=self.program
+            ),
+        )
+        User.objects.create_user(username="ada-lovelace")
+
+    def _import(self, body, **kwargs):
+        result = import_students(io.BytesIO((HEADER + body).encode()), **kwargs)
+        send_queued_mail(rate_limit=0)
+        return result
+
+    def test_valid_rows_are_imported_with_related_rows(self):
+        result = self._import(
+            "Ada,Lovelace,ada@example.com,EN1,Computer Science,1st,\n"
+            "Ada,Lovelace,ada2@example.com,EN2,computer science,,\n"
+            f"Alan,Turing,alan@example.com,EN3,{self.program.pk},2nd,aturing\n",
+            chunk_size=2,
+        )
+        self.assertEqual(result.created, 3)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(
+            set(
+                User.objects.filter(is_student=True).values_list("username", flat=True)
+            ),
+            {"ada-lovelace-2", "ada-lovelace-3", "aturing"},
+        )
+        self.assertEqual(Student.objects.filter(program=self.program).count(), 3)
+        self.assertEqual(
+            StudentEnrollment.objects.filter(course_offering=self.offering).count(), 3
+        )
+        self.assertEqual(StudentTuitionFee.objects.count(), 24)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertTrue(User.objects.get(username="aturing").has_usable_password())
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        Student.objects.create(
+            student=User.objects.create_user(username="old"), enrollment_number="EN9"
+        )
+        result = self._import(
+            "Ada,Lovelace,not-an-email,EN1,Computer Science,,\n"
+            "Ada,Lovelace,ada@example.com,EN2,Physics,,\n"
+            "Ada,Lovelace,ada@example.com,EN9,Computer Science,,\n"
+            "Ada,Lovelace,ada@example.com,EN3,Computer Science,9th,\n"
+            ",Lovelace,ada@example.com,EN4,Computer Science,,\n"
+            "Alan,Turing,alan@example.com,EN5,Computer Science,,\n"
+            "Alan,Turing,alan@example.com,EN5,Computer Science,,\n",
+            send_welcome=False,
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [2, 3, 4, 5, 6, 8])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_generated_usernames_avoid_explicit_ones(self):
+        result = self._import(
+            "Ada,Lovelace,ada@example.com,EN1,Computer Science,,\n"
+            "Ada,Lovelace,ada2@example.com,EN2,Computer Science,,ada-lovelace-2\n",
+            send_welcome=False,
+        )
+        self.assertEqual(result.errors, [])
+        self.assertEqual(
+            set(
+                User.objects.filter(is_student=True).values_list("username", flat=True)
+            ),
+            {"ada-lovelace-2", "ada-lovelace-3"},
+        )
+
+    def test_too_long_values_are_reported(self):
+        result = self._import(
+            f"Ada,Lovelace,ada@example.com,{'E' * 21},Computer Science,,\n"
+            f"Ada,{'L' * 151},ada@example.com,EN2,Computer Science,,\n"
+            f"Ada,Lovelace,ada@example.com,EN3,Computer Science,,{'a' * 151}\n"
+            "Alan,Turing,alan@example.com,EN4,Computer Science,,\n",
+            send_welcome=False,
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual(
+            result.errors,
+            [
+                (2, "enrollment_number is longer than 20 characters"),
+                (3, "last_name is longer than 150 characters"),
+                (4, "username is longer than 150 characters"),
+            ],
+        )
+
+    def test_unreadable_file_imports_nothing(self):
+        good = "Ada,Lovelace,ada@example.com,EN1,Computer Science,,\n"
+        latin = "Jos\xe9,B,jose@example.com,EN2,Computer Science,,\n"
+        for data, message in (
+            ((HEADER + good).encode() + latin.encode("latin-1"), "not UTF-8"),
+            (b"First name,Email\nAda,ada@example.com\n", "Missing columns"),
+            (b"", "empty"),
+        ):
+            with self.assertRaisesMessage(ImportFileError, message):
+                import_students(io.BytesIO(data), "students.csv", chunk_size=1)
+        self.assertFalse(Student.objects.exists())
+
+    def test_admin_upload_of_unreadable_file(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile("students.csv", HEADER.encode() + b"\xff\xfe\n")
+        response = self.client.post(
+            reverse("admin:accounts_student_import"), {"file": upload}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response, "form", "file", "The file is not UTF-8 encoded text."
+        )
+
+    def test_admin_upload(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile(
+            "students.csv",
+            (HEADER + "Ada,Lovelace,ada@example.com,EN1,Computer Science,,\n").encode(),
+        )
+        response = self.client.post(
+            reverse("admin:accounts_student_import"), {"file": upload}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Student.objects.filter(enrollment_number="EN1").exists())
@@ -1,8 +1,7 @@
-import threading
 from datetime import datetime
 from django.contrib.auth import get_user_model
 from django.conf import settings
-from core.utils import send_html_email
+from core.mail import queue_html_mail
 
 
 def generate_password():
@@ -31,32 +30,14 @@ def generate_lecturer_credentials():
     return generate_lecturer_id(), generate_password()
 
 
-class EmailThread(threading.Thread):
-    def __init__(self, subject, recipient_list, template_name, context):
-        self.subject = subject
-        self.recipient_list = recipient_list
-        self.template_name = template_name
-        self.context = context
-        threading.Thread.__init__(self)
-
-    def run(self):
-        send_html_email(
-            subject=self.subject,
-            recipient_list=self.recipient_list,
-            template=self.template_name,
-            context=self.context,
-        )
-
-
 def send_new_account_email(user, password):
     if user.is_student:
         template_name = "accounts/email/new_student_account_confirmation.html"
     else:
         template_name = "accounts/email/new_lecturer_account_confirmation.html"
-    email = {
-        "subject": "Your KCET account confirmation and credentials",
-        "recipient_list": [user.email],
-        "template_name": template_name,
-        "context": {"user": user, "password": password},
-    }
-    EmailThread(**email).start()
+    queue_html_mail(
+        "Your KCET account confirmation and credentials",
+        [user.email],
+        template_name,
+        {"user": user, "password": password},
+    )
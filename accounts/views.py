@@ -4,7 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.template.loader import get_template, render_to_string
+from django.template.loader import render_to_string
 from django.utils.decorators import method_decorator
 from django.views.generic import CreateView
 from django_filters.views import FilterView
@@ -40,6 +40,7 @@ from core.models import Semester, Session
 from course.models import Course
 from result.models import TakenCourse
 from core.models import StudentFeedback
+from core.pdf import build_list_pdf
 
 # ########################################################
 # Utility Functions
@@ -57,6 +58,13 @@ def render_to_pdf(template_name, context):
     return response
 
 
+def _display_name(username, first_name, last_name):
+    """Same rule as ``User.get_full_name`` for rows fetched with values_list."""
+    if first_name and last_name:
+        return first_name + " " + last_name
+    return username
+
+
 # ########################################################
 # Authentication and Registration
 # ########################################################
@@ -398,16 +406,33 @@ class LecturerFilterView(FilterView):
 @login_required
 @admin_required
 def render_lecturer_pdf_list(request):
-    lecturers = User.objects.filter(is_lecturer=True)
-    template_path = "pdf/lecturer_list.html"
-    context = {"lecturers": lecturers}
+    lecturers = (
+        User.objects.filter(is_lecturer=True)
+        .order_by("username")
+        .values_list("username", "first_name", "last_name", "email", "phone", "address")
+    )
+    rows = (
+        (
+            str(count),
+            username,
+            _display_name(username, first_name, last_name),
+            email or "",
+            phone or "",
+            address or "",
+        )
+        for count, (username, first_name, last_name, email, phone, address) in enumerate(
+            lecturers.iterator(chunk_size=2000), start=1
+        )
+    )
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = 'filename="lecturers_list.pdf"'
-    template = get_template(template_path)
-    html = template.render(context)
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    if pisa_status.err:
-        return HttpResponse(f"We had some errors <pre>{html}</pre>")
+    build_list_pdf(
+        response,
+        "Lecturers",
+        ("#", "Username", "Full Name", "Email", "Mob No.", "Address/City"),
+        rows,
+        col_widths=(30, 90, 160, 200, 100, 190),
+    )
     return response
 
 
@@ -511,16 +536,41 @@ class StudentListView(FilterView):
 @login_required
 @admin_required
 def render_student_pdf_list(request):
-    students = Student.objects.all()
-    template_path = "pdf/student_list.html"
-    context = {"students": students}
+    students = Student.objects.order_by("student__username").values_list(
+        "student__username",
+        "enrollment_number",
+        "student__first_name",
+        "student__last_name",
+        "student__email",
+        "program__title",
+    )
+    rows = (
+        (
+            str(count),
+            username,
+            enrollment_number or "-",
+            _display_name(username, first_name, last_name),
+            email or "",
+            program or "",
+        )
+        for count, (
+            username,
+            enrollment_number,
+            first_name,
+            last_name,
+            email,
+            program,
+        ) in enumerate(students.iterator(chunk_size=2000), start=1)
+    )
     response = HttpResponse(content_type="application/pdf")
     response["Content-Disposition"] = 'filename="students_list.pdf"'
-    template = get_template(template_path)
-    html = template.render(context)
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    if pisa_status.err:
-        return HttpResponse(f"We had some errors <pre>{html}</pre>")
+    build_list_pdf(
+        response,
+        "Students",
+        ("#", "Username", "Enrollment Number", "Full Name", "Email", "Program"),
+        rows,
+        col_widths=(40, 90, 100, 160, 200, 180),
+    )
     return response
 
 
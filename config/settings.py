@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.translation import gettext_lazy as _
 
 # Build paths inside the project like this: os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -109,8 +110,11 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + PROJECT_APPS
 MIDDLEWARE = [
     # "django.middleware.security.SecurityMiddleware",  # Temporarily disabled for development
     "core.middleware.ForceHTTPMiddleware",  # Force HTTP access
+    "core.middleware.QueryProfilingMiddleware",  # Only active with QUERY_PROFILING
+    "core.middleware.ActivityLogMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "core.middleware.SlidingSessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -119,6 +123,10 @@ MIDDLEWARE = [
     # "django.middleware.clickjacking.XFrameOptionsMiddleware",  # Disabled for development
 ]
 
+# Per-request query counts and timings, shown at /query-profile/ (admins only)
+QUERY_PROFILING = config("QUERY_PROFILING", default=False, cast=bool)
+QUERY_PROFILING_BUFFER_SIZE = config("QUERY_PROFILING_BUFFER_SIZE", default=500, cast=int)
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -212,10 +220,52 @@ USE_L10N = True
 
 USE_TZ = True
 
+# Cache configuration
+# The default is a memory cache per process; set CACHE_BACKEND (e.g.
+# django.core.cache.backends.redis.RedisCache) and CACHE_LOCATION to share
+# one between workers.
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+SHARED_CACHE_BACKENDS = (
+    "django.core.cache.backends.redis.RedisCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+    "django.core.cache.backends.db.DatabaseCache",
+)
+
 # Session configuration
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+# Sessions kept in the cache ("cached_db", "cache") need a cache every worker
+# shares; a per-process memory cache would keep logged out sessions alive in
+# the other workers.
+SESSION_BACKEND = config("SESSION_BACKEND", default="db")
+if (
+    SESSION_BACKEND in ("cached_db", "cache")
+    and CACHES["default"]["BACKEND"] not in SHARED_CACHE_BACKENDS
+):
+    raise ImproperlyConfigured(
+        f"SESSION_BACKEND={SESSION_BACKEND!r} needs a shared cache "
+        "(CACHE_BACKEND set to Redis, Memcached or the database cache)."
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
 SESSION_COOKIE_AGE = 3600  # 1 hour
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
-SESSION_SAVE_EVERY_REQUEST = True
+# Expiry slides via core.middleware.SlidingSessionMiddleware instead of a
+# write on every request: the session is only re-saved once less than
+# SESSION_REFRESH_PERCENT of SESSION_COOKIE_AGE remains.
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_PERCENT = config("SESSION_REFRESH_PERCENT", default=75, cast=int)
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
@@ -237,6 +287,50 @@ STATICFILES_FINDERS = [
 # Media files config
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+# Files served only through views that check access (course videos).
+# Must not be inside MEDIA_ROOT or reachable from the web server.
+PRIVATE_MEDIA_ROOT = config(
+    "PRIVATE_MEDIA_ROOT", default=os.path.join(BASE_DIR, "private_media")
+)
+
+# Let the front proxy send course videos: "X-Accel-Redirect" (nginx) or
+# "X-Sendfile" (Apache/lighttpd). Empty streams them from Django.
+VIDEO_SENDFILE_HEADER = config("VIDEO_SENDFILE_HEADER", default="")
+# nginx `internal` location that maps to PRIVATE_MEDIA_ROOT, for X-Accel-Redirect
+VIDEO_SENDFILE_PREFIX = config("VIDEO_SENDFILE_PREFIX", default="/protected-media/")
+
+# Chunked course file/video uploads: largest chunk accepted (and suggested to
+# clients), largest file, and hours before an abandoned upload is pruned.
+CHUNKED_UPLOAD_CHUNK_SIZE = config(
+    "CHUNKED_UPLOAD_CHUNK_SIZE", default=8 * 1024 * 1024, cast=int
+)
+CHUNKED_UPLOAD_MAX_SIZE = config(
+    "CHUNKED_UPLOAD_MAX_SIZE", default=4 * 1024 * 1024 * 1024, cast=int
+)
+CHUNKED_UPLOAD_EXPIRY_HOURS = config("CHUNKED_UPLOAD_EXPIRY_HOURS", default=24, cast=int)
+
+# Upper bound on how long a worker may show a stale news ticker
+NEWS_FEED_CACHE_TIMEOUT = config("NEWS_FEED_CACHE_TIMEOUT", default=300, cast=int)
+
+# Quiz snapshots are keyed by Quiz.version, so this only bounds memory use
+QUIZ_SNAPSHOT_CACHE_TIMEOUT = config(
+    "QUIZ_SNAPSHOT_CACHE_TIMEOUT", default=3600, cast=int
+)
+
+# How long a quiz's item analysis may lag behind newly completed sittings
+QUIZ_ANALYTICS_CACHE_TIMEOUT = config(
+    "QUIZ_ANALYTICS_CACHE_TIMEOUT", default=900, cast=int
+)
+
+# Activity log entries older than this are removed by `manage.py prune_activity_log`
+ACTIVITY_LOG_RETENTION_DAYS = config("ACTIVITY_LOG_RETENTION_DAYS", default=180, cast=int)
+
+# Threads rendering result PDFs in the background; 0 renders inside the request.
+PDF_RENDER_WORKERS = config("PDF_RENDER_WORKERS", default=2, cast=int)
+# MEDIA_ROOT folders of rendered PDFs; files not served for this many days
+# are removed by `manage.py prune_pdf_cache`
+PDF_CACHE_FOLDERS = ["result_sheet", "registration_form"]
+PDF_CACHE_RETENTION_DAYS = config("PDF_CACHE_RETENTION_DAYS", default=30, cast=int)
 
 # -----------------------------------
 # E-mail configuration
@@ -252,6 +346,17 @@ EMAIL_HOST_USER = config("EMAIL_HOST_USER", default="")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD", default="")
 EMAIL_FROM_ADDRESS = config("EMAIL_FROM_ADDRESS", default="noreply@kcet.edu")
 EMAIL_USE_SSL = False
+# Outbox messages claimed and sent per SMTP connection by send_queued_mail
+MAIL_QUEUE_BATCH_SIZE = config("MAIL_QUEUE_BATCH_SIZE", default=100, cast=int)
+# Messages per second the outbox worker may send (0 = no limit)
+MAIL_RATE_LIMIT = config("MAIL_RATE_LIMIT", default=10, cast=float)
+# Delivery attempts before an outbox message is marked failed
+MAIL_MAX_ATTEMPTS = config("MAIL_MAX_ATTEMPTS", default=5, cast=int)
+# Seconds before the first retry; doubled on every further attempt
+MAIL_RETRY_BACKOFF = config("MAIL_RETRY_BACKOFF", default=60, cast=int)
+# Sent and failed outbox messages older than this are removed by
+# `manage.py prune_outbound_email`
+MAIL_OUTBOX_RETENTION_DAYS = config("MAIL_OUTBOX_RETENTION_DAYS", default=7, cast=int)
 
 # crispy config
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
@@ -0,0 +1,58 @@
+"""
+Buffered activity log.
+
+``log_activity`` does not write immediately.  Inside an
+``activity_buffer()`` block (every request gets one from
+``ActivityLogMiddleware``; commands can open their own) messages are
+collected and written with a single ``bulk_create`` when the block ends.
+Messages only join the buffer once the transaction they were logged in
+commits, so work that is rolled back leaves no log entry.
+"""
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ActivityLog
+
+ACTIVITY_LOG_BATCH_SIZE = 500
+
+_local = threading.local()
+
+
+def _buffers():
+    if not hasattr(_local, "buffers"):
+        _local.buffers = []
+    return _local.buffers
+
+
+def _flush(entries):
+    if entries:
+        ActivityLog.objects.bulk_create(entries, batch_size=ACTIVITY_LOG_BATCH_SIZE)
+        entries.clear()
+
+
+def log_activity(message):
+    """Record ``message`` once the current transaction commits."""
+    entry = ActivityLog(message=message, created_at=timezone.now())
+    buffers = _buffers()
+    if buffers:
+        transaction.on_commit(partial(buffers[-1].append, entry))
+    else:
+        transaction.on_commit(partial(_flush, [entry]))
+
+
+@contextmanager
+def activity_buffer():
+    """Collect ``log_activity`` messages and write them in one go on exit."""
+    entries = []
+    _buffers().append(entries)
+    try:
+        yield entries
+    finally:
+        _buffers().pop()
+        # Registered last, so it runs after the appends of an enclosing
+        # transaction; outside a transaction it runs immediately.
+        transaction.on_commit(partial(_flush, entries))
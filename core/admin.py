@@ -3,7 +3,7 @@ from .models import (
     NewsAndEvents, Session, Semester, Announcement,
     Batch, Classroom, CourseOffering, TimetableSlot,
     Attendance, AttendanceSession, CollegeCalendar, StudentFeedback,
-    Lecturer, Feedback, TuitionFee, StudentTuitionFee
+    Lecturer, Feedback, TuitionFee, StudentTuitionFee, OutboundEmail
 )
 from django.utils import timezone
 
@@ -235,3 +235,21 @@ class StudentTuitionFeeAdmin(admin.ModelAdmin):
         count = queryset.count()
         self.message_user(request, f'Payment reminders sent to {count} students.')
     send_payment_reminders.short_description = "Send payment reminders"
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('to', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to', 'subject')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    # Bodies may hold initial passwords
+    exclude = ('body', 'html_body')
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status=OutboundEmail.SENT).update(
+            status=OutboundEmail.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{count} emails will be sent on the next worker run.')
+    retry_now.short_description = "Retry selected emails now"
@@ -1,5 +1,4 @@
 import os
-import joblib
 import pickle
 from django.conf import settings
 from django.core.cache import cache
@@ -19,6 +18,8 @@ class AIModelManager:
     def _load_models(self):
         """Load all AI models from the models directory"""
         try:
+            import joblib
+
             # Load feature names
             feature_names_path = os.path.join(self.models_dir, 'feature_names.pkl')
             if os.path.exists(feature_names_path):
@@ -141,21 +142,25 @@ class AIModelManager:
         
         return info
 
-# Global instance
-ai_manager = AIModelManager()
+# Global instance, created on first use so that importing this module
+# does not unpickle the models (and import LightGBM) at startup
+_ai_manager = None
 
 def get_ai_manager():
     """Get the global AI model manager instance"""
-    return ai_manager
+    global _ai_manager
+    if _ai_manager is None:
+        _ai_manager = AIModelManager()
+    return _ai_manager
 
 def predict_student_performance(student_data):
     """Convenience function to predict student performance"""
-    return ai_manager.predict_performance(student_data)
+    return get_ai_manager().predict_performance(student_data)
 
 def predict_student_score(student_data):
     """Convenience function to predict student score"""
-    return ai_manager.predict_score(student_data)
+    return get_ai_manager().predict_score(student_data)
 
 def is_ai_available():
     """Check if AI models are available"""
-    return len(ai_manager.models) > 0
+    return len(get_ai_manager().models) > 0
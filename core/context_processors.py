@@ -1,11 +1,13 @@
 from typing import Dict
 from django.http import HttpRequest
-from .models import NewsAndEvents
+from django.utils.functional import SimpleLazyObject
+from .news_feed import get_news_feed
 import time
 
 
 def news_ticker(request: HttpRequest) -> Dict[str, object]:
-    items = NewsAndEvents.objects.all().order_by("-updated_date")[:10]
+    # Only templates that actually read ticker_items touch the cache.
+    items = SimpleLazyObject(get_news_feed)
     can_add_news = False
     user = getattr(request, "user", None)
     
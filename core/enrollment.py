@@ -0,0 +1,306 @@
+"""
+Keeps ``CourseOffering`` in step with ``CourseAllocation``.
+
+The allocation is the source of truth: a lecturer should have exactly one
+offering for every course allocated to them.  Signal receivers only record
+which lecturers changed (``schedule_lecturer_sync``); once the transaction
+commits, ``sync_lecturer_offerings`` runs a single time for all of them.
+It diffs the wanted offerings against the existing ones, creates and
+deletes the difference in bulk and enrolls the batch students of the new
+offerings.  Untouched offerings keep their enrollments and attendance.
+
+Offerings created or deleted directly (admin, timetabling) are folded
+back into the allocation first, so the diff does not undo them.
+
+``enroll_students`` / ``enroll_batch`` are the enrollment primitives used
+by the receivers and commands: one ``bulk_create(ignore_conflicts=True)``
+instead of a ``get_or_create`` per student and offering.
+"""
+import threading
+import weakref
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+
+from course.models import Course, CourseAllocation, Program
+
+from .models import Batch, CourseOffering, StudentEnrollment
+
+ENROLLMENT_BATCH_SIZE = 500
+DEFAULT_LECTURES_PER_WEEK = 3
+
+_local = threading.local()
+
+
+class _LecturerSync:
+    """
+    The sync run by ``on_commit`` for the current transaction.
+
+    It is registered again on every change, because a registration made in
+    a savepoint that rolls back is dropped; only the first call does work.
+    The thread only keeps a weak reference: once Django has run or dropped
+    every registration (commit or rollback), the sync is gone and the next
+    transaction starts a new one.
+    """
+
+    def __init__(self):
+        self.lecturer_ids = set()
+        self.added_offerings = set()
+        self.removed_offerings = set()
+        self.done = False
+
+    def __call__(self):
+        if self.done:
+            return
+        self.done = True
+        if _pending_sync() is self:
+            _local.sync = None
+        _local.syncing = True
+        try:
+            with transaction.atomic():
+                _fold_offering_changes(self.added_offerings, self.removed_offerings)
+                sync_lecturer_offerings(self.lecturer_ids)
+                enroll_batch_students(self.added_offerings)
+        finally:
+            _local.syncing = False
+
+
+def _pending_sync():
+    ref = getattr(_local, "sync", None)
+    return ref() if ref is not None else None
+
+
+def _schedule(update):
+    if getattr(_local, "syncing", False):
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        sync = _LecturerSync()
+        update(sync)
+        sync()
+        return
+    sync = _pending_sync()
+    if sync is None or sync.done:
+        sync = _LecturerSync()
+        _local.sync = weakref.ref(sync)
+    update(sync)
+    transaction.on_commit(sync)
+
+
+def schedule_lecturer_sync(*lecturer_ids):
+    """Sync the offerings of ``lecturer_ids`` when the transaction commits."""
+    _schedule(lambda sync: sync.lecturer_ids.update(filter(None, lecturer_ids)))
+
+
+def schedule_offering_added(offering):
+    """Add a directly created offering to its lecturer's allocation."""
+
+    def update(sync):
+        sync.added_offerings.add(offering.pk)
+        sync.lecturer_ids.add(offering.lecturer_id)
+
+    _schedule(update)
+
+
+def schedule_offering_removed(offering):
+    """Drop the course of a directly deleted offering from the allocation."""
+
+    def update(sync):
+        sync.added_offerings.discard(offering.pk)
+        sync.removed_offerings.add((offering.lecturer_id, offering.course_id))
+        sync.lecturer_ids.add(offering.lecturer_id)
+
+    _schedule(update)
+
+
+def _fold_offering_changes(added_offering_ids, removed_pairs):
+    Through = CourseAllocation.courses.through
+    if removed_pairs:
+        lecturer_ids = {lecturer_id for lecturer_id, _ in removed_pairs}
+        # Another offering of the same course keeps it allocated
+        still_offered = set(
+            CourseOffering.objects.filter(lecturer_id__in=lecturer_ids).values_list(
+                "lecturer_id", "course_id"
+            )
+        )
+        gone = removed_pairs - still_offered
+        rows = Through.objects.filter(
+            courseallocation__lecturer_id__in={lecturer_id for lecturer_id, _ in gone},
+            course_id__in={course_id for _, course_id in gone},
+        ).values_list("pk", "courseallocation__lecturer_id", "course_id")
+        stale = [pk for pk, *pair in rows if tuple(pair) in gone]
+        if stale:
+            Through.objects.filter(pk__in=stale).delete()
+
+    if not added_offering_ids:
+        return
+    offered = set(
+        CourseOffering.objects.filter(pk__in=added_offering_ids).values_list(
+            "lecturer_id", "course_id"
+        )
+    )
+    lecturer_ids = {lecturer_id for lecturer_id, _ in offered}
+    allocated = set(
+        Through.objects.filter(
+            courseallocation__lecturer_id__in=lecturer_ids
+        ).values_list("courseallocation__lecturer_id", "course_id")
+    )
+    missing = offered - allocated
+    if not missing:
+        return
+    allocations = {}
+    for pk, lecturer_id in CourseAllocation.objects.filter(
+        lecturer_id__in={lecturer_id for lecturer_id, _ in missing}
+    ).order_by("-pk").values_list("pk", "lecturer_id"):
+        allocations[lecturer_id] = pk  # the oldest allocation wins
+    for lecturer_id, _ in missing:
+        if lecturer_id not in allocations:
+            allocations[lecturer_id] = CourseAllocation.objects.create(
+                lecturer_id=lecturer_id
+            ).pk
+    Through.objects.bulk_create(
+        [
+            Through(courseallocation_id=allocations[lecturer_id], course_id=course_id)
+            for lecturer_id, course_id in missing
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def default_batches(program_ids):
+    """Map each program id to its "Default <program>" batch id, creating missing ones."""
+    titles = dict(Program.objects.filter(pk__in=program_ids).values_list("pk", "title"))
+    batches = {}
+    for pk, program_id, title in Batch.objects.filter(
+        program_id__in=program_ids,
+        title__in=[f"Default {title}" for title in titles.values()],
+    ).order_by("-pk").values_list("pk", "program_id", "title"):
+        if title == f"Default {titles[program_id]}":
+            batches[program_id] = pk
+    for program_id, title in titles.items():
+        if program_id not in batches:
+            batches[program_id] = Batch.objects.create(
+                title=f"Default {title}", program_id=program_id
+            ).pk
+    return batches
+
+
+def sync_lecturer_offerings(lecturer_ids):
+    """
+    Give each of ``lecturer_ids`` one offering per allocated course.
+
+    Offerings of courses no longer allocated are deleted; new offerings go
+    to the program's default batch and get its students enrolled.
+    """
+    lecturer_ids = set(lecturer_ids)
+    if not lecturer_ids:
+        return
+    wanted = set(
+        CourseAllocation.courses.through.objects.filter(
+            courseallocation__lecturer_id__in=lecturer_ids
+        ).values_list("courseallocation__lecturer_id", "course_id")
+    )
+    current = {}
+    for pk, lecturer_id, course_id in CourseOffering.objects.filter(
+        lecturer_id__in=lecturer_ids
+    ).values_list("pk", "lecturer_id", "course_id"):
+        current.setdefault((lecturer_id, course_id), []).append(pk)
+
+    stale = [pk for pair, pks in current.items() if pair not in wanted for pk in pks]
+    if stale:
+        CourseOffering.objects.filter(pk__in=stale).delete()
+
+    missing = wanted - current.keys()
+    if not missing:
+        return
+    programs = dict(
+        Course.objects.filter(
+            pk__in={course_id for _, course_id in missing}
+        ).values_list("pk", "program_id")
+    )
+    batches = default_batches(set(programs.values()))
+    CourseOffering.objects.bulk_create(
+        [
+            CourseOffering(
+                lecturer_id=lecturer_id,
+                course_id=course_id,
+                program_id=programs[course_id],
+                batch_id=batches[programs[course_id]],
+                lectures_per_week=DEFAULT_LECTURES_PER_WEEK,
+            )
+            for lecturer_id, course_id in missing
+        ]
+    )
+    # Not every backend returns primary keys from bulk_create
+    new_offerings = CourseOffering.objects.filter(
+        lecturer_id__in={lecturer_id for lecturer_id, _ in missing},
+        course_id__in=programs,
+    ).values_list("pk", "lecturer_id", "course_id")
+    enroll_batch_students(
+        pk for pk, lecturer_id, course_id in new_offerings
+        if (lecturer_id, course_id) in missing
+    )
+
+
+def _pks(objects):
+    if isinstance(objects, QuerySet):
+        return list(objects.values_list("pk", flat=True))
+    return [getattr(obj, "pk", obj) for obj in objects]
+
+
+def _create_enrollments(pairs):
+    StudentEnrollment.objects.bulk_create(
+        (
+            StudentEnrollment(student_id=student_id, course_offering_id=offering_id)
+            for student_id, offering_id in pairs
+        ),
+        batch_size=ENROLLMENT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def enroll_students(students, offerings):
+    """
+    Enroll every one of ``students`` in every one of ``offerings``.
+
+    Both may be querysets, model instances or primary keys.  Existing
+    enrollments, active or not, are left alone.
+    """
+    offering_ids = _pks(offerings)
+    if offering_ids:
+        _create_enrollments(
+            (student_id, offering_id)
+            for student_id in _pks(students)
+            for offering_id in offering_ids
+        )
+
+
+def enroll_batch(batch):
+    """Enroll the students of ``batch`` in all of the batch's offerings."""
+    batch_id = getattr(batch, "pk", batch)
+    enroll_students(
+        get_user_model().objects.filter(is_student=True, batch_id=batch_id),
+        CourseOffering.objects.filter(batch_id=batch_id),
+    )
+
+
+def enroll_batch_students(offering_ids):
+    """Enroll the students of each offering's batch in that offering."""
+    offerings = list(
+        CourseOffering.objects.filter(pk__in=set(offering_ids)).values_list(
+            "pk", "batch_id"
+        )
+    )
+    if not offerings:
+        return
+    students = {}
+    for pk, batch_id in get_user_model().objects.filter(
+        is_student=True, batch_id__in={batch_id for _, batch_id in offerings}
+    ).values_list("pk", "batch_id"):
+        students.setdefault(batch_id, []).append(pk)
+    _create_enrollments(
+        (student_id, offering_id)
+        for offering_id, batch_id in offerings
+        for student_id in students.get(batch_id, ())
+    )
@@ -0,0 +1,125 @@
+"""
+Set-based tuition fee updates.
+
+Per-row ``StudentTuitionFee.save()`` costs a query (or two) per student.
+These helpers do the same work in a fixed number of statements and
+compute ``is_overdue`` in SQL with the same rule as ``save()``.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, Q, Value, When
+from django.utils import timezone
+
+from accounts.models import User
+from .models import StudentTuitionFee, TuitionFee
+
+BULK_BATCH_SIZE = 1000
+SEMESTERS = range(1, 9)
+# Due date for semesters without a TuitionFee configuration.
+DEFAULT_DUE_DAYS = 30
+
+
+def overdue_expression(today, due_date=None):
+    """
+    SQL equivalent of the overdue rule in ``StudentTuitionFee.save``.
+
+    Pass ``due_date`` when the same UPDATE also sets it: the SET clause
+    sees the old column value, so the new date has to be a constant.
+    """
+    if due_date is None:
+        condition = When(is_paid=False, due_date__lt=today, then=Value(True))
+    else:
+        condition = When(is_paid=False, then=Value(due_date < today))
+    return Case(condition, default=Value(False), output_field=BooleanField())
+
+
+def provision_fee_schedules(students):
+    """
+    Create the eight-semester fee schedule for ``students`` (users or pks).
+
+    Due dates come from the active ``TuitionFee`` configuration.  Rows a
+    student already has are left untouched, so this is safe to call for a
+    whole import batch.  Costs two queries regardless of batch size.
+    """
+    student_ids = [getattr(student, "pk", student) for student in students]
+    if not student_ids:
+        return 0
+    today = timezone.now().date()
+    default_due_date = today + timedelta(days=DEFAULT_DUE_DAYS)
+    due_dates = dict(
+        TuitionFee.objects.filter(is_active=True).values_list("semester", "due_date")
+    )
+    rows = [
+        StudentTuitionFee(
+            student_id=student_id,
+            semester=semester,
+            due_date=due_dates.get(semester, default_due_date),
+            is_overdue=due_dates.get(semester, default_due_date) < today,
+        )
+        for student_id in student_ids
+        for semester in SEMESTERS
+    ]
+    StudentTuitionFee.objects.bulk_create(
+        rows, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True
+    )
+    return len(rows)
+
+
+def apply_semester_fee(semester, due_date, students=None):
+    """
+    Give every student a fee row for ``semester`` due on ``due_date``.
+
+    Missing rows are inserted with one ``bulk_create`` and existing rows
+    are moved to the new date with one UPDATE.  Returns the number of
+    students covered.
+    """
+    if students is None:
+        students = User.objects.filter(is_student=True)
+    today = timezone.now().date()
+    student_ids = list(students.values_list("pk", flat=True))
+
+    with transaction.atomic():
+        StudentTuitionFee.objects.bulk_create(
+            [
+                StudentTuitionFee(
+                    student_id=student_id,
+                    semester=semester,
+                    due_date=due_date,
+                    is_overdue=due_date < today,
+                )
+                for student_id in student_ids
+            ],
+            batch_size=BULK_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        StudentTuitionFee.objects.filter(
+            semester=semester, student__in=students
+        ).update(
+            due_date=due_date,
+            is_overdue=overdue_expression(today, due_date=due_date),
+            updated_at=timezone.now(),
+        )
+    return len(student_ids)
+
+
+def sweep_overdue_fees(today=None):
+    """
+    Flag every unpaid fee whose due date has passed, in one UPDATE.
+
+    ``updated_at`` is left alone so the sweep does not bury real changes
+    in the dashboard's recent-updates list.  Returns the rows flagged.
+    """
+    today = today or timezone.now().date()
+    return StudentTuitionFee.objects.filter(
+        is_paid=False, due_date__lt=today, is_overdue=False
+    ).update(is_overdue=True)
+
+
+def fee_status_counts():
+    """Pending, overdue and paid fee counts from a single aggregate query."""
+    return StudentTuitionFee.objects.aggregate(
+        pending_fees=Count("pk", filter=Q(is_paid=False)),
+        overdue_fees=Count("pk", filter=Q(is_overdue=True)),
+        paid_fees=Count("pk", filter=Q(is_paid=True)),
+    )
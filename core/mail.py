@@ -0,0 +1,167 @@
+"""
+Persistent, per-recipient outbox.
+
+``queue_mail`` stores one ``OutboundEmail`` row per recipient with a
+single INSERT, so addresses are never disclosed to each other and
+enqueueing costs the same for one recipient or a thousand.  Rows written
+in a transaction that is rolled back are never sent.
+
+``send_queued_mail`` (run by the ``send_queued_mail`` command) claims due
+rows in batches, sends them over one SMTP connection at no more than
+``MAIL_RATE_LIMIT`` messages per second and records the outcome.  Failed
+messages are retried with exponential backoff until ``MAIL_MAX_ATTEMPTS``
+is reached.
+
+Some messages carry initial passwords, so the bodies of sent messages are
+blanked; ``prune_outbound_email`` deletes old sent and failed rows.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# A claimed batch is retried after this long if its worker died mid-send
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def queue_mail(subject, message, recipient_list, from_email=None, html_message=None):
+    """Queue one copy of the message per recipient; returns how many were queued."""
+    from_email = from_email or settings.EMAIL_FROM_ADDRESS
+    subject = " ".join(str(subject).split())[:255]
+    recipients = list(dict.fromkeys(r for r in recipient_list if r))
+    OutboundEmail.objects.bulk_create(
+        [
+            OutboundEmail(
+                to=recipient,
+                from_email=from_email,
+                subject=subject,
+                body=message,
+                html_body=html_message or "",
+            )
+            for recipient in recipients
+        ]
+    )
+    return len(recipients)
+
+
+def queue_html_mail(subject, recipient_list, template, context):
+    """Render ``template`` and queue it with a plain text alternative."""
+    html_message = render_to_string(template, context)
+    return queue_mail(
+        subject, strip_tags(html_message), recipient_list, html_message=html_message
+    )
+
+
+def _claim(batch_size):
+    """Lease the next due messages to this worker and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=ids).update(
+            attempts=F("attempts") + 1, next_attempt_at=now + CLAIM_LEASE
+        )
+    return list(OutboundEmail.objects.filter(pk__in=ids).order_by("pk"))
+
+
+def _as_message(email, connection):
+    message = EmailMultiAlternatives(
+        email.subject, email.body, email.from_email, [email.to], connection=connection
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, "text/html")
+    return message
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=settings.MAIL_RETRY_BACKOFF * 2 ** (attempts - 1))
+
+
+def _failed(email, error):
+    email.last_error = str(error)
+    if email.attempts >= settings.MAIL_MAX_ATTEMPTS:
+        email.status = OutboundEmail.FAILED
+    else:
+        email.next_attempt_at = timezone.now() + _retry_delay(email.attempts)
+
+
+class _Throttle:
+    def __init__(self, rate_limit):
+        self.interval = 1.0 / rate_limit if rate_limit else 0
+        self.next_send = time.monotonic()
+
+    def wait(self):
+        delay = self.next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_send = time.monotonic() + self.interval
+
+
+def send_queued_mail(batch_size=None, rate_limit=None):
+    """
+    Send every message that is due; returns ``(sent, failed)``.
+
+    Messages that fail are rescheduled, or marked failed once they have
+    used up their attempts.
+    """
+    batch_size = batch_size or settings.MAIL_QUEUE_BATCH_SIZE
+    throttle = _Throttle(settings.MAIL_RATE_LIMIT if rate_limit is None else rate_limit)
+    connection = get_connection()
+    sent = failed = 0
+    while True:
+        batch = _claim(batch_size)
+        if not batch:
+            break
+        delivered, undelivered = [], []
+        try:
+            # One SMTP session for the whole batch
+            connection.open()
+        except Exception as e:
+            logger.warning("Could not connect to the mail server: %s", e)
+            for email in batch:
+                _failed(email, e)
+            undelivered = batch
+        else:
+            try:
+                for email in batch:
+                    throttle.wait()
+                    try:
+                        connection.send_messages([_as_message(email, connection)])
+                    except Exception as e:
+                        logger.warning("Failed to send email %s: %s", email.pk, e)
+                        _failed(email, e)
+                        undelivered.append(email)
+                    else:
+                        delivered.append(email.pk)
+            finally:
+                connection.close()
+        OutboundEmail.objects.filter(pk__in=delivered).update(
+            status=OutboundEmail.SENT,
+            sent_at=timezone.now(),
+            last_error="",
+            body="",
+            html_body="",
+        )
+        OutboundEmail.objects.bulk_update(
+            undelivered, ["status", "next_attempt_at", "last_error"]
+        )
+        sent += len(delivered)
+        failed += len(undelivered)
+    if sent or failed:
+        logger.info("Sent %s queued emails, %s failed", sent, failed)
+    return sent, failed
@@ -1,7 +1,9 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from core.models import Batch
-from accounts.models import User, Student
+from core.enrollment import default_batches, enroll_batch
+from accounts.models import User
+
+UPDATE_BATCH_SIZE = 1000
 
 
 class Command(BaseCommand):
@@ -16,67 +18,65 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         self.stdout.write('Starting student batch assignment...')
-        
+        verbose = options['verbosity'] > 1
+
         with transaction.atomic():
-            # Get all students
-            students = User.objects.filter(is_student=True).select_related('student')
-            
-            assigned_count = 0
+            students = list(
+                User.objects.filter(is_student=True).select_related(
+                    'batch', 'student__program'
+                )
+            )
+            batches = default_batches(
+                {
+                    student.student.program_id
+                    for student in students
+                    if hasattr(student, 'student') and student.student.program_id
+                }
+            )
+
+            assigned = []
             skipped_count = 0
-            
             for student in students:
-                try:
-                    # Get student's program
-                    if hasattr(student, 'student') and student.student.program:
-                        program = student.student.program
-                        
-                        # Get or create batch for this program
-                        batch, batch_created = Batch.objects.get_or_create(
-                            title=f"Default {program.title}",
-                            program=program
-                        )
-                        
-                        if batch_created:
-                            self.stdout.write(f'Created batch: {batch.title}')
-                        
-                        # Check if student already has a batch
-                        if hasattr(student, 'batch') and student.batch and not options['force']:
-                            self.stdout.write(
-                                self.style.WARNING(
-                                    f'Skipped: {student.get_full_name} (already in batch: {student.batch.title})'
-                                )
-                            )
-                            skipped_count += 1
-                            continue
-                        
-                        # Assign student to batch
-                        student.batch = batch
-                        student.save()
-                        
+                if not hasattr(student, 'student') or not student.student.program_id:
+                    if verbose:
                         self.stdout.write(
-                            self.style.SUCCESS(
-                                f'Assigned: {student.get_full_name} -> {batch.title}'
+                            self.style.WARNING(
+                                f'Skipped: {student.get_full_name} (no program assigned)'
                             )
                         )
-                        assigned_count += 1
-                        
-                    else:
+                    skipped_count += 1
+                    continue
+
+                if student.batch_id and not options['force']:
+                    if verbose:
                         self.stdout.write(
                             self.style.WARNING(
-                                f'Skipped: {student.get_full_name} (no program assigned)'
+                                f'Skipped: {student.get_full_name} (already in batch: {student.batch.title})'
                             )
                         )
-                        skipped_count += 1
-                        
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f'Error assigning {student.get_full_name}: {e}'
+                    skipped_count += 1
+                    continue
+
+                batch_id = batches[student.student.program_id]
+                if student.batch_id != batch_id:
+                    student.batch_id = batch_id
+                    assigned.append(student)
+                    if verbose:
+                        self.stdout.write(
+                            self.style.SUCCESS(
+                                f'Assigned: {student.get_full_name} -> '
+                                f'Default {student.student.program.title}'
+                            )
                         )
-                    )
-        
+
+            # bulk_update skips the per-user post_save receivers; enrollments
+            # are created below, once per batch.
+            User.objects.bulk_update(assigned, ['batch'], batch_size=UPDATE_BATCH_SIZE)
+            for batch_id in {student.batch_id for student in assigned}:
+                enroll_batch(batch_id)
+
         self.stdout.write(
             self.style.SUCCESS(
-                f'\nAssignment completed! Assigned: {assigned_count}, Skipped: {skipped_count}'
+                f'\nAssignment completed! Assigned: {len(assigned)}, Skipped: {skipped_count}'
             )
         )
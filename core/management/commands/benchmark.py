@@ -0,0 +1,431 @@
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from accounts.models import User, Student
+from core.models import (
+    Attendance,
+    Batch,
+    Classroom,
+    CollegeCalendar,
+    CourseOffering,
+    Semester,
+    Session,
+    StudentEnrollment,
+    StudentFeedback,
+)
+from core.profiling import record_queries
+from course.models import Course, CourseAllocation, Program
+from result.models import TakenCourse
+
+BULK_BATCH_SIZE = 5000
+HOT_PATHS = (
+    "detention_list",
+    "batch_attendance",
+    "timetable_generation",
+    "score_entry",
+    "search_suggestions",
+    "feedback_popup",
+)
+# Every hot path needs at least one of each
+COUNT_OPTIONS = (
+    "programs",
+    "courses_per_program",
+    "students",
+    "lecturers",
+    "days",
+    "repeat",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic college with bulk_create (no signals), time the "
+        "hot paths and print the results as JSON. Everything is rolled back "
+        "unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--programs", type=int, default=50)
+        parser.add_argument("--courses-per-program", type=int, default=8)
+        parser.add_argument("--students", type=int, default=10000)
+        parser.add_argument("--lecturers", type=int, default=300)
+        parser.add_argument(
+            "--days", type=int, default=90, help="Working days of attendance"
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            choices=HOT_PATHS,
+            help="Only time these hot paths",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help=(
+                "Commit the generated data instead of rolling it back "
+                "(only on a database without sessions)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        for name in COUNT_OPTIONS:
+            if options[name] < 1:
+                option = "--" + name.replace("_", "-")
+                raise CommandError(f"{option} must be at least 1.")
+        # The generated session becomes the current one
+        if options["keep"] and Session.objects.exists():
+            raise CommandError(
+                "--keep would replace the current session; only use it on a "
+                "database without sessions."
+            )
+        self.rng = random.Random(options["seed"])
+        self.options = options
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            data = self.generate()
+            generated_in = time.perf_counter() - start
+            self.stderr.write(f"Generated dataset in {generated_in:.1f}s")
+
+            results = {}
+            for name in options["only"] or HOT_PATHS:
+                self.stderr.write(f"Timing {name}...")
+                results[name] = self.measure(getattr(self, f"run_{name}"), data)
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "database": connection.vendor,
+            "scale": {
+                key: options[key]
+                for key in (
+                    "programs",
+                    "courses_per_program",
+                    "students",
+                    "lecturers",
+                    "days",
+                    "seed",
+                )
+            },
+            "rows": data["rows"],
+            "generated_in_s": round(generated_in, 3),
+            "repeat": options["repeat"],
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    # ########################################################
+    # Timing
+    # ########################################################
+
+    def measure(self, run, data):
+        timings = []
+        queries = 0
+        for _ in range(self.options["repeat"]):
+            with record_queries() as recorder:
+                start = time.perf_counter()
+                run(data)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = recorder.count
+        return {
+            "runs_ms": [round(t, 2) for t in timings],
+            "median_ms": round(statistics.median(timings), 2),
+            "min_ms": round(min(timings), 2),
+            "queries": queries,
+        }
+
+    def _client(self, user):
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        client.force_login(user)
+        return client
+
+    def _get(self, client, url, **params):
+        response = client.get(url, params)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{url} returned {response.status_code}")
+        return response
+
+    def run_detention_list(self, data):
+        self._get(
+            data["admin_client"],
+            reverse("detention_list"),
+            start_date=data["start_date"].isoformat(),
+            end_date=data["end_date"].isoformat(),
+        )
+
+    def run_batch_attendance(self, data):
+        self._get(
+            data["admin_client"],
+            reverse("batch_attendance", args=[data["batch"].id]),
+            start_date=data["start_date"].isoformat(),
+            end_date=data["end_date"].isoformat(),
+        )
+
+    def run_timetable_generation(self, data):
+        from core.utils import generate_timetable_for_batch
+
+        generate_timetable_for_batch(data["batch"].id)
+
+    def run_score_entry(self, data):
+        self._get(
+            data["lecturer_client"],
+            reverse("add_score_for", args=[data["course"].id]),
+        )
+
+    def run_search_suggestions(self, data):
+        from core.views import search_suggestions_api
+
+        request = RequestFactory().get("/", {"q": "stud"})
+        request.user = data["admin"]
+        search_suggestions_api(request)
+
+    def run_feedback_popup(self, data):
+        self._get(data["student_client"], reverse("feedback_popup"))
+
+    # ########################################################
+    # Data generation
+    # ########################################################
+
+    def _bulk(self, model, objs):
+        return model.objects.bulk_create(objs, batch_size=BULK_BATCH_SIZE)
+
+    def generate(self):
+        opts = self.options
+        rng = self.rng
+        tag = f"bench{opts['seed']}"
+        rows = {}
+
+        Session.objects.update(is_current_session=False)
+        Semester.objects.update(is_current_semester=False)
+        session = Session.objects.create(
+            session=f"{tag}-session", is_current_session=True
+        )
+        Semester.objects.create(
+            semester=settings.FIRST, is_current_semester=True, session=session
+        )
+
+        programs = self._bulk(
+            Program,
+            [Program(title=f"{tag} Program {i}") for i in range(opts["programs"])],
+        )
+        batches = self._bulk(
+            Batch, [Batch(title=f"Default {p.title}", program=p) for p in programs]
+        )
+        courses = self._bulk(
+            Course,
+            [
+                Course(
+                    slug=f"{tag}-course-{p.id}-{i}",
+                    title=f"Course {i} of {p.title}",
+                    code=f"{tag.upper()}-{p.id}-{i}",
+                    credit=3,
+                    program=p,
+                    level=settings.BACHELOR_DEGREE,
+                    semester=settings.FIRST,
+                )
+                for p in programs
+                for i in range(opts["courses_per_program"])
+            ],
+        )
+        rows["programs"] = len(programs)
+        rows["courses"] = len(courses)
+
+        # Hashing once keeps generation fast; every account shares the password.
+        password = make_password("benchmark")
+        admin = User.objects.create_superuser(
+            username=f"{tag}-admin", email=f"{tag}-admin@example.com", password=None
+        )
+        lecturers = self._bulk(
+            User,
+            [
+                User(
+                    username=f"{tag}-lecturer-{i}",
+                    first_name="Lecturer",
+                    last_name=str(i),
+                    email=f"{tag}-lecturer-{i}@example.com",
+                    password=password,
+                    is_lecturer=True,
+                )
+                for i in range(opts["lecturers"])
+            ],
+        )
+        student_users = self._bulk(
+            User,
+            [
+                User(
+                    username=f"{tag}-student-{i}",
+                    first_name="Student",
+                    last_name=str(i),
+                    email=f"{tag}-student-{i}@example.com",
+                    password=password,
+                    is_student=True,
+                    gender=rng.choice("MF"),
+                    batch=batches[i % len(batches)],
+                )
+                for i in range(opts["students"])
+            ],
+        )
+        students = self._bulk(
+            Student,
+            [
+                Student(
+                    student=user,
+                    enrollment_number=f"{tag}-{i}",
+                    level=settings.BACHELOR_DEGREE,
+                    program=batches[i % len(batches)].program,
+                    semester=settings.FIRST,
+                )
+                for i, user in enumerate(student_users)
+            ],
+        )
+        rows["lecturers"] = len(lecturers)
+        rows["students"] = len(students)
+
+        self._bulk(
+            Classroom,
+            [Classroom(name=f"{tag}-room-{i}") for i in range(max(10, len(batches)))],
+        )
+        batch_by_program = {b.program_id: b for b in batches}
+        offerings = self._bulk(
+            CourseOffering,
+            [
+                CourseOffering(
+                    program=course.program,
+                    course=course,
+                    lecturer=lecturers[i % len(lecturers)],
+                    batch=batch_by_program[course.program_id],
+                )
+                for i, course in enumerate(courses)
+            ],
+        )
+        rows["offerings"] = len(offerings)
+
+        allocations = self._bulk(
+            CourseAllocation,
+            [CourseAllocation(lecturer=lecturer, session=session) for lecturer in lecturers],
+        )
+        Through = CourseAllocation.courses.through
+        self._bulk(
+            Through,
+            [
+                Through(
+                    courseallocation_id=allocations[i % len(allocations)].id,
+                    course_id=offering.course_id,
+                )
+                for i, offering in enumerate(offerings)
+            ],
+        )
+
+        offerings_by_batch = {}
+        for offering in offerings:
+            offerings_by_batch.setdefault(offering.batch_id, []).append(offering)
+
+        rows["enrollments"] = len(
+            self._bulk(
+                StudentEnrollment,
+                [
+                    StudentEnrollment(student=user, course_offering=offering)
+                    for user in student_users
+                    for offering in offerings_by_batch[user.batch_id]
+                ],
+            )
+        )
+        student_by_user = {s.student_id: s for s in students}
+        rows["taken_courses"] = len(
+            self._bulk(
+                TakenCourse,
+                [
+                    TakenCourse(
+                        student=student_by_user[user.id], course=offering.course
+                    )
+                    for user in student_users
+                    for offering in offerings_by_batch[user.batch_id]
+                ],
+            )
+        )
+
+        # A semester of working days, one lecture per batch per day.
+        end_date = date.today()
+        days = []
+        day = end_date
+        while len(days) < opts["days"]:
+            if day.weekday() < 5:
+                days.append(day)
+            day -= timedelta(days=1)
+        days.reverse()
+        CollegeCalendar.objects.bulk_create(
+            [CollegeCalendar(date=d, is_working_day=True) for d in days],
+            ignore_conflicts=True,
+        )
+
+        users_by_batch = {}
+        for user in student_users:
+            users_by_batch.setdefault(user.batch_id, []).append(user)
+
+        attendance = 0
+        for day_index, day in enumerate(days):
+            chunk = []
+            for batch_id, batch_offerings in offerings_by_batch.items():
+                offering = batch_offerings[day_index % len(batch_offerings)]
+                for user in users_by_batch.get(batch_id, ()):
+                    chunk.append(
+                        Attendance(
+                            student=user,
+                            course_offering=offering,
+                            date=day,
+                            is_present=rng.random() < 0.8,
+                            marked_by_id=offering.lecturer_id,
+                        )
+                    )
+            attendance += len(self._bulk(Attendance, chunk))
+        rows["attendance"] = attendance
+
+        feedback_student = students[0]
+        feedback_lecturers = lecturers[: len(lecturers) // 2]
+        self._bulk(
+            StudentFeedback,
+            [
+                StudentFeedback(
+                    student=feedback_student,
+                    lecturer=lecturer,
+                    rating=rng.randint(1, 5),
+                    message="Benchmark feedback",
+                )
+                for lecturer in feedback_lecturers
+            ],
+        )
+
+        batch = batches[0]
+        course = offerings_by_batch[batch.id][0].course
+        return {
+            "rows": rows,
+            "admin": admin,
+            "admin_client": self._client(admin),
+            "lecturer_client": self._client(offerings_by_batch[batch.id][0].lecturer),
+            "student_client": self._client(feedback_student.student),
+            "batch": batch,
+            "course": course,
+            "start_date": days[0],
+            "end_date": days[-1],
+        }
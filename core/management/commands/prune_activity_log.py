@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import ActivityLog
+
+DELETE_BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete activity log entries older than the retention period "
+        "(ACTIVITY_LOG_RETENTION_DAYS). Run daily from cron, e.g. "
+        "`15 0 * * * manage.py prune_activity_log`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ACTIVITY_LOG_RETENTION_DAYS,
+            help="Keep entries from the last DAYS days",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        old = ActivityLog.objects.filter(created_at__lt=cutoff)
+        deleted = 0
+        # Short batches keep each DELETE (and its locks) small.
+        while True:
+            ids = list(old.values_list("pk", flat=True)[:DELETE_BATCH_SIZE])
+            if not ids:
+                break
+            deleted += ActivityLog.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} activity log entries"))
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import OutboundEmail
+
+DELETE_BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete sent and failed outbox messages older than the retention "
+        "period (MAIL_OUTBOX_RETENTION_DAYS). Run daily from cron, e.g. "
+        "`30 0 * * * manage.py prune_outbound_email`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.MAIL_OUTBOX_RETENTION_DAYS,
+            help="Keep messages from the last DAYS days",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        old = OutboundEmail.objects.filter(
+            status__in=[OutboundEmail.SENT, OutboundEmail.FAILED],
+            created_at__lt=cutoff,
+        )
+        deleted = 0
+        while True:
+            ids = list(old.values_list("pk", flat=True)[:DELETE_BATCH_SIZE])
+            if not ids:
+                break
+            deleted += OutboundEmail.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} outbox messages"))
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.pdf import prune_cached_pdfs
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete rendered PDFs (PDF_CACHE_FOLDERS) not served for the "
+        "retention period (PDF_CACHE_RETENTION_DAYS). Run daily from cron "
+        "on the host that keeps MEDIA_ROOT, e.g. "
+        "`45 0 * * * manage.py prune_pdf_cache`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.PDF_CACHE_RETENTION_DAYS,
+            help="Keep documents served in the last DAYS days",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options["days"] * 24 * 60 * 60
+        deleted = sum(
+            prune_cached_pdfs(folder, cutoff) for folder in settings.PDF_CACHE_FOLDERS
+        )
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} cached PDFs"))
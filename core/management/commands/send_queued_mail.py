@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the emails waiting in the outbox. Run every minute from cron, "
+        "e.g. `* * * * * manage.py send_queued_mail`, or keep one worker "
+        "running with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting when it is empty",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls with --loop",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Messages sent per SMTP connection (MAIL_QUEUE_BATCH_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_mail(batch_size=options["batch_size"])
+            if sent or failed or not options["loop"]:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Sent {sent} queued emails, {failed} failed")
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
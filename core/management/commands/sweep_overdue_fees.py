@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.fees import sweep_overdue_fees
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark unpaid tuition fees past their due date as overdue. "
+        "Run daily from cron, e.g. `5 0 * * * manage.py sweep_overdue_fees`."
+    )
+
+    def handle(self, *args, **options):
+        flagged = sweep_overdue_fees()
+        self.stdout.write(self.style.SUCCESS(f"Marked {flagged} tuition fees as overdue"))
@@ -1,7 +1,13 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.http import HttpResponse
+from .activity import activity_buffer
 from .models import StudentFeedback
+from .profiling import profile_buffer, record_queries
 from accounts.models import User
 
 
@@ -25,6 +31,77 @@ class ForceHTTPMiddleware:
         return response
 
 
+class QueryProfilingMiddleware:
+    """Record query count, duplicate SQL and timings per request (QUERY_PROFILING)"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_PROFILING", False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        profile_buffer.record(
+            {
+                "view": match.view_name if match else request.path,
+                "path": request.path,
+                "method": request.method,
+                "status": response.status_code,
+                "queries": recorder.count,
+                "duplicates": recorder.duplicates(),
+                "db_ms": round(recorder.db_time * 1000, 2),
+                "total_ms": round(total * 1000, 2),
+                "at": time.time(),
+            }
+        )
+        response["Server-Timing"] = "db;dur=%.2f, total;dur=%.2f" % (
+            recorder.db_time * 1000,
+            total * 1000,
+        )
+        return response
+
+
+class ActivityLogMiddleware:
+    """Write the request's activity log entries with one bulk insert"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with activity_buffer():
+            return self.get_response(request)
+
+
+class SlidingSessionMiddleware:
+    """Refresh session expiry only when it is close to running out"""
+
+    REFRESHED_AT = "_session_refreshed_at"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = getattr(request, "session", None)
+        if session is None or session.is_empty():
+            return response
+
+        age = settings.SESSION_COOKIE_AGE
+        refresh_after = age * (100 - settings.SESSION_REFRESH_PERCENT) / 100
+        now = int(time.time())
+        refreshed_at = session.get(self.REFRESHED_AT, 0)
+        # A modified session is saved anyway, which restarts its expiry too.
+        if session.modified or now - refreshed_at >= refresh_after:
+            session[self.REFRESHED_AT] = now
+        return response
+
+
 class FeedbackRedirectMiddleware:
     """Middleware to redirect students to feedback popup after login"""
     
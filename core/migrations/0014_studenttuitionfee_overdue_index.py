@@ -0,0 +1,17 @@
+# Generated by Django 4.0.8 on 2026-10-19 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_tuitionfee_studenttuitionfee'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studenttuitionfee',
+            index=models.Index(fields=['is_paid', 'due_date'], name='core_studen_is_paid_9a7ff3_idx'),
+        ),
+    ]
@@ -187,12 +187,43 @@ class Semester(models.Model):
 
 class ActivityLog(models.Model):
     message = models.TextField()
-    created_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
     def __str__(self):
         return f"[{self.created_at}]{self.message}"
 
 
+class OutboundEmail(models.Model):
+    """A queued message, sent by the ``send_queued_mail`` worker."""
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, _("Pending")),
+        (SENT, _("Sent")),
+        (FAILED, _("Failed")),
+    )
+
+    to = models.EmailField()
+    from_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.status})"
+
+
 class Announcement(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
@@ -502,6 +533,10 @@ class StudentTuitionFee(models.Model):
     class Meta:
         unique_together = ['student', 'semester']
         ordering = ['student', 'semester']
+        indexes = [
+            # Serves the overdue sweep: NOT is_paid AND due_date < today
+            models.Index(fields=['is_paid', 'due_date']),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - Semester {self.semester}"
@@ -0,0 +1,34 @@
+"""
+Cached list of the latest news and events.
+
+The navbar ticker renders on every page and the home page shows the same
+items, so both read this one cached list instead of querying.  The cache
+is cleared when a ``NewsAndEvents`` row is saved or deleted (see
+``core.signals``).  With a per-process cache such as the default LocMem
+backend other workers only pick up changes when their copy expires, so
+``NEWS_FEED_CACHE_TIMEOUT`` bounds how stale the ticker can get.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import NewsAndEvents
+
+NEWS_FEED_CACHE_KEY = "core:news_feed"
+NEWS_FEED_SIZE = 10
+
+
+def get_news_feed():
+    """Return the latest ``NEWS_FEED_SIZE`` news items, newest first."""
+    items = cache.get(NEWS_FEED_CACHE_KEY)
+    if items is None:
+        items = list(NewsAndEvents.objects.order_by("-updated_date")[:NEWS_FEED_SIZE])
+        cache.set(
+            NEWS_FEED_CACHE_KEY,
+            items,
+            getattr(settings, "NEWS_FEED_CACHE_TIMEOUT", 300),
+        )
+    return items
+
+
+def invalidate_news_feed():
+    cache.delete(NEWS_FEED_CACHE_KEY)
@@ -0,0 +1,336 @@
+"""
+Background PDF rendering with content-addressed storage.
+
+A document is described by a plain-data payload (no model instances, no
+request).  The SHA-256 of that payload names the rendered file, so:
+
+- an unchanged document is served straight from disk without rendering,
+- concurrent requests for the same document share one render job,
+- concurrent requests for different documents never write the same path.
+
+Rendering runs in a small thread pool so the request only has to collect
+the payload.  Set ``PDF_RENDER_WORKERS = 0`` to render inline (tests,
+management commands).
+"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Flowable, LongTable, PageBreak, Paragraph
+from reportlab.platypus import Frame, SimpleDocTemplate, TableStyle
+
+logger = logging.getLogger(__name__)
+
+READY = "ready"
+RENDERING = "rendering"
+FAILED = "failed"
+
+# Bump when a builder's layout changes so previously cached files are not reused.
+RENDERER_VERSION = 1
+
+# Rendered documents and the temporary files of interrupted renders
+CACHED_NAME_RE = re.compile(r"^(?:[0-9a-f]{64}\.pdf|tmp\w+\.pdf\.part)$")
+
+
+def payload_digest(kind, payload):
+    """Return a stable hash for a document kind and its input data."""
+    encoded = json.dumps(
+        {"kind": kind, "version": RENDERER_VERSION, "payload": payload},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def get_pdf_storage(folder):
+    """Storage for rendered documents under ``MEDIA_ROOT/<folder>``."""
+    return FileSystemStorage(location=os.path.join(settings.MEDIA_ROOT, folder))
+
+
+class PDFJobQueue:
+    """Thread pool that renders PDFs and de-duplicates in-flight jobs."""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._errors = {}
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="pdf-render"
+            )
+        return self._executor
+
+    def submit(self, key, path, builder, payload):
+        """Schedule ``builder(tmp_path, payload)`` unless ``key`` is already queued."""
+        with self._lock:
+            if key in self._jobs:
+                return RENDERING
+            self._errors.pop(key, None)
+            if not self.max_workers:
+                self._jobs[key] = None
+            else:
+                self._jobs[key] = self._get_executor().submit(
+                    self._render, key, path, builder, payload
+                )
+                return RENDERING
+        self._render(key, path, builder, payload)
+        return FAILED if key in self._errors else READY
+
+    def status(self, key):
+        with self._lock:
+            if key in self._jobs:
+                return RENDERING
+            if key in self._errors:
+                return FAILED
+        return None
+
+    def pop_error(self, key):
+        with self._lock:
+            return self._errors.pop(key, None)
+
+    def _render(self, key, path, builder, payload):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".pdf.part")
+        os.close(fd)
+        try:
+            builder(tmp_path, payload)
+            # Atomic on POSIX: readers see either no file or the complete file.
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.exception("PDF rendering failed for %s", key)
+            with self._lock:
+                self._errors[key] = str(e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+
+pdf_queue = PDFJobQueue(max_workers=getattr(settings, "PDF_RENDER_WORKERS", 2))
+
+
+def render_cached_pdf(folder, kind, payload, builder):
+    """
+    Return ``(status, storage, name)`` for the document described by ``payload``.
+
+    ``status`` is ``READY`` when ``storage.open(name)`` can be served,
+    ``RENDERING`` while a worker is building it, or ``FAILED`` if the last
+    attempt raised.  A failed document is retried on the next call.
+
+    Serving a cached file bumps its modification time, so
+    ``prune_cached_pdfs`` only removes documents nobody asked for lately.
+    """
+    storage = get_pdf_storage(folder)
+    key = payload_digest(kind, payload)
+    name = f"{key}.pdf"
+    try:
+        os.utime(storage.path(name))
+    except FileNotFoundError:
+        pass
+    else:
+        return READY, storage, name
+
+    status = pdf_queue.status(key)
+    if status == FAILED:
+        pdf_queue.pop_error(key)
+        return FAILED, storage, name
+    if status == RENDERING:
+        return RENDERING, storage, name
+
+    status = pdf_queue.submit(key, storage.path(name), builder, payload)
+    if status == FAILED:
+        pdf_queue.pop_error(key)
+    return status, storage, name
+
+
+def prune_cached_pdfs(folder, cutoff):
+    """
+    Delete rendered documents in ``MEDIA_ROOT/<folder>`` last served before
+    ``cutoff`` (a timestamp); returns how many files were removed.
+
+    Only digest-named files are touched, so anything else kept in the
+    folder survives.  A pruned document is simply rendered again.
+    """
+    storage = get_pdf_storage(folder)
+    try:
+        entries = os.scandir(storage.location)
+    except FileNotFoundError:
+        return 0
+    deleted = 0
+    with entries:
+        for entry in entries:
+            if not CACHED_NAME_RE.match(entry.name):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    deleted += 1
+            except FileNotFoundError:
+                pass
+    return deleted
+
+
+# ########################################################
+# Tabular list documents
+# ########################################################
+
+LIST_ROW_HEIGHT = 16
+LIST_FONT_SIZE = 8
+LIST_PAGES_PER_CHUNK = 20
+LIST_CELL_PADDING = 6
+LIST_TABLE_STYLE = TableStyle(
+    [
+        ("LEFTPADDING", (0, 0), (-1, -1), LIST_CELL_PADDING),
+        ("RIGHTPADDING", (0, 0), (-1, -1), LIST_CELL_PADDING),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), LIST_FONT_SIZE),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.black),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("INNERGRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("BOX", (0, 0), (-1, -1), 0.25, colors.black),
+    ]
+)
+
+
+class _NextChunk(Flowable):
+    """Placeholder that ``_ListDocTemplate`` swaps for the next story chunk."""
+
+    def wrap(self, available_width, available_height):
+        return 0, 0
+
+    def draw(self):
+        pass
+
+
+class _ListDocTemplate(SimpleDocTemplate):
+    """
+    Document whose ``build`` takes an iterator of flowables.
+
+    The story starts as a single ``_NextChunk``; the documented
+    ``filterFlowables`` hook replaces it with the next flowable followed by
+    a fresh placeholder, or discards it once the iterator is exhausted, so
+    at most one table chunk is alive at a time.
+    """
+
+    def build(self, flowables, **kwargs):
+        self._chunks = iter(flowables)
+        super().build([_NextChunk()], **kwargs)
+
+    def filterFlowables(self, flowables):
+        if isinstance(flowables[0], _NextChunk):
+            flowable = next(self._chunks, None)
+            if flowable is None:
+                flowables[0] = None
+            else:
+                flowables[0:1] = [flowable, _NextChunk()]
+
+
+def fit_text(text, width, font_name="Helvetica", font_size=LIST_FONT_SIZE):
+    """Cut ``text`` short with "..." so it is at most ``width`` points wide."""
+    if stringWidth(text, font_name, font_size) <= width:
+        return text
+    # Longest prefix that still fits with the ellipsis
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if stringWidth(text[:middle] + "...", font_name, font_size) <= width:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + "..."
+
+
+def build_list_pdf(out, title, header, rows, col_widths=None):
+    """
+    Write a paginated table of ``rows`` (tuples of strings) to ``out``.
+
+    Values are cut to their column width, so every row is one line of a
+    fixed height and a chunk of whole pages can be laid out as one
+    ``LongTable`` with ``repeatRows=1``; the header lands at the top of
+    every page.  ``rows`` may be any iterator; only one chunk is
+    materialised at a time.
+    """
+    doc = _ListDocTemplate(
+        out,
+        pagesize=landscape(A4),
+        leftMargin=36,
+        rightMargin=36,
+        topMargin=54,
+        bottomMargin=36,
+        title=title,
+    )
+    if col_widths is None:
+        col_widths = [doc.width / len(header)] * len(header)
+    text_widths = [width - 2 * LIST_CELL_PADDING for width in col_widths]
+
+    def fit_row(row, font_name="Helvetica"):
+        return [
+            fit_text(str(value), width, font_name)
+            for value, width in zip(row, text_widths)
+        ]
+
+    header = fit_row(header, "Helvetica-Bold")
+    # Lay out the header and one row to learn the row height, and fill the
+    # frame (the page less the frame's own padding) with whole rows.
+    probe = LongTable(
+        [header, header], colWidths=col_widths, rowHeights=LIST_ROW_HEIGHT
+    )
+    probe.setStyle(LIST_TABLE_STYLE)
+    row_height = probe.wrap(doc.width, doc.height)[1] / 2
+    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height)
+    frame_height = doc.height - frame.topPadding - frame.bottomPadding
+    rows_per_page = int(frame_height // row_height) - 1
+    chunk_size = rows_per_page * LIST_PAGES_PER_CHUNK
+
+    def decorate(canvas, doc):
+        canvas.saveState()
+        canvas.setFont("Helvetica-Bold", 12)
+        canvas.drawString(doc.leftMargin, doc.pagesize[1] - 36, title)
+        canvas.setFont("Helvetica", LIST_FONT_SIZE)
+        canvas.drawRightString(
+            doc.leftMargin + doc.width, 20, "Page %d" % canvas.getPageNumber()
+        )
+        canvas.restoreState()
+
+    def story():
+        rows_iter = iter(rows)
+        first = True
+        while True:
+            chunk = [fit_row(row) for row in itertools.islice(rows_iter, chunk_size)]
+            if not chunk:
+                break
+            if not first:
+                yield PageBreak()
+            first = False
+            table = LongTable(
+                [header] + chunk,
+                colWidths=col_widths,
+                rowHeights=LIST_ROW_HEIGHT,
+                repeatRows=1,
+            )
+            table.setStyle(LIST_TABLE_STYLE)
+            yield table
+        if first:
+            yield Paragraph("No records.", getSampleStyleSheet()["Normal"])
+
+    doc.build(story(), onFirstPage=decorate, onLaterPages=decorate)
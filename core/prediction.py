@@ -0,0 +1,132 @@
+"""
+Student performance prediction with the LightGBM models in ``BASE_DIR``.
+
+Kept apart from ``core.utils`` so that numpy and joblib are only imported
+by the views that predict, not by every module that needs a slug helper.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+from django.conf import settings
+
+from .models import PredictionLog, StudentMetrics
+
+_CLASSIFIER = None
+_REGRESSOR = None
+_FEATURE_NAMES: Optional[List[str]] = None
+
+
+def _load_models_if_needed() -> None:
+    global _CLASSIFIER, _REGRESSOR, _FEATURE_NAMES
+    if _CLASSIFIER is not None and _REGRESSOR is not None and _FEATURE_NAMES is not None:
+        return
+
+    base_dir = settings.BASE_DIR  # project root
+    clf_path = os.path.join(base_dir, "lgb_classifier.pkl")
+    reg_path = os.path.join(base_dir, "lgb_regressor.pkl")
+    feat_path = os.path.join(base_dir, "feature_names.pkl")
+
+    _CLASSIFIER = joblib.load(clf_path)
+    _REGRESSOR = joblib.load(reg_path)
+    _FEATURE_NAMES = joblib.load(feat_path)
+
+
+def build_feature_vector_for_student(user: Any) -> Dict[str, float]:
+    """Build a features dict for a student aligned to training features.
+
+    Strategy:
+    - Start with ZERO defaults for every entry in feature_names.pkl
+    - Optionally fill a few obvious fields if available later
+    This guarantees no "Missing features" errors and preserves correct order.
+    """
+    _load_models_if_needed()
+    assert _FEATURE_NAMES is not None
+
+    # Start with zeros for all expected features to avoid missing keys
+    features: Dict[str, float] = {name: 0.0 for name in _FEATURE_NAMES}
+
+    # Map from StudentMetrics if present
+    metrics = StudentMetrics.objects.filter(user=user).first()
+    if metrics:
+        mapping = {
+            "Attendance (%)": metrics.attendance_percent,
+            "CourseGradesAvg": metrics.course_grades_avg,
+            "GradeAvg": metrics.grade_avg,
+            "CreditHours": metrics.credit_hours,
+            "AgeAtEnroll": metrics.age_at_enroll,
+            "DaysSinceLastLogin": metrics.days_since_last_login,
+            "RiskScore": metrics.risk_score,
+        }
+        for k, v in mapping.items():
+            if k in features:
+                features[k] = float(v)
+
+        # one-hot categorical examples
+        if metrics.residency:
+            key = f"Residency_{metrics.residency}"
+            if key in features:
+                features[key] = 1.0
+        if metrics.financial_aid:
+            key = f"FinancialAid_{metrics.financial_aid}"
+            if key in features:
+                features[key] = 1.0
+        if metrics.pandemic_effect:
+            key = f"PandemicEffect_{metrics.pandemic_effect}"
+            if key in features:
+                features[key] = 1.0
+
+    # major/program one-hot from Student.program.title if available
+    try:
+        program_title = getattr(getattr(user, "student", None), "program", None).title
+        if program_title:
+            one_hot_key = f"Major_{program_title}"
+            if one_hot_key in features:
+                features[one_hot_key] = 1.0
+    except Exception:
+        pass
+
+    return features
+
+
+def align_features(raw_features: Dict[str, float]) -> np.ndarray:
+    """Align features to the training order from feature_names.pkl.
+
+    Any absent feature keys are treated as 0.0 to prevent crashes until
+    real data mapping is provided.
+    """
+    _load_models_if_needed()
+    assert _FEATURE_NAMES is not None
+    values = [raw_features.get(f, 0.0) for f in _FEATURE_NAMES]
+    arr = np.asarray(values, dtype=float).reshape(1, -1)
+    return arr
+
+
+def predict_performance(raw_features: Dict[str, float]) -> Dict[str, object]:
+    """Run classifier and regressor and return results."""
+    _load_models_if_needed()
+    X = align_features(raw_features)
+    cls = _CLASSIFIER.predict(X)[0]
+    reg = float(_REGRESSOR.predict(X)[0])
+    # Ensure category mapping is textual
+    if isinstance(cls, (int, np.integer)):
+        mapping = {0: "Low", 1: "Average", 2: "High"}
+        category = mapping.get(int(cls), str(cls))
+    else:
+        category = str(cls)
+    return {"category": category, "marks": reg}
+
+
+def log_prediction(target_user: Any, requested_by: Any, result: Dict[str, object], features: Dict[str, float]) -> None:
+    try:
+        PredictionLog.objects.create(
+            user=target_user,
+            requested_by=requested_by,
+            category=str(result.get("category")),
+            predicted_marks=float(result.get("marks", 0.0)),
+            features_snapshot=features,
+        )
+    except Exception:
+        # Do not break flow if logging fails
+        pass
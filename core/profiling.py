@@ -0,0 +1,165 @@
+"""
+Query-count and latency profiling.
+
+``QueryRecorder`` is installed with ``connection.execute_wrapper`` and keeps
+one entry per executed statement.  Statements are reduced to a fingerprint
+(literals replaced by ``?``) so the same query issued in a loop shows up as
+one duplicated fingerprint — the usual signature of an N+1 pattern.
+
+Profiles of finished requests are kept in a fixed-size ring buffer that
+the admin dashboard reads; nothing is written to the database.
+"""
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_PARAM_RE = re.compile(r"%s")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Normalise ``sql`` so statements differing only in literals compare equal."""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _PARAM_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+class QueryRecorder:
+    """``execute_wrapper`` callable that records every statement and its duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self, limit=5):
+        """Most repeated fingerprints as ``[(fingerprint, count), ...]``."""
+        counts = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return [(fp, n) for fp, n in counts.most_common(limit) if n > 1]
+
+
+@contextmanager
+def record_queries(using=None):
+    """Record queries run on the default (or given) connection inside the block."""
+    from django.db import connections
+
+    conn = connections[using] if using else connection
+    recorder = QueryRecorder()
+    with conn.execute_wrapper(recorder):
+        yield recorder
+
+
+class ProfileBuffer:
+    """Thread-safe ring buffer of request profiles."""
+
+    def __init__(self, maxlen):
+        self._entries = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def entries(self):
+        """Snapshot of stored profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def summary(self):
+        """Per-view aggregates sorted by the heaviest average query count."""
+        views = {}
+        for entry in self.entries():
+            row = views.setdefault(
+                entry["view"],
+                {
+                    "view": entry["view"],
+                    "requests": 0,
+                    "queries": 0,
+                    "max_queries": 0,
+                    "db_ms": 0.0,
+                    "total_ms": 0.0,
+                    "duplicates": 0,
+                },
+            )
+            row["requests"] += 1
+            row["queries"] += entry["queries"]
+            row["max_queries"] = max(row["max_queries"], entry["queries"])
+            row["db_ms"] += entry["db_ms"]
+            row["total_ms"] += entry["total_ms"]
+            row["duplicates"] += sum(n - 1 for _, n in entry["duplicates"])
+
+        rows = []
+        for row in views.values():
+            n = row["requests"]
+            rows.append(
+                {
+                    "view": row["view"],
+                    "requests": n,
+                    "avg_queries": round(row["queries"] / n, 1),
+                    "max_queries": row["max_queries"],
+                    "avg_duplicates": round(row["duplicates"] / n, 1),
+                    "avg_db_ms": round(row["db_ms"] / n, 2),
+                    "avg_total_ms": round(row["total_ms"] / n, 2),
+                }
+            )
+        return sorted(rows, key=lambda r: r["avg_queries"], reverse=True)
+
+
+profile_buffer = ProfileBuffer(
+    maxlen=getattr(settings, "QUERY_PROFILING_BUFFER_SIZE", 500)
+)
+
+
+class QueryBudgetMixin:
+    """
+    ``TestCase`` mixin for per-view query budgets.
+
+    ``assertQueryBudget(url, 12)`` fails when the view runs more than 12
+    queries, listing the duplicated fingerprints to point at the N+1.
+    """
+
+    def assertQueryBudget(self, url, budget, method="get", client=None, **kwargs):
+        client = client or self.client
+        with record_queries() as recorder:
+            response = getattr(client, method)(url, **kwargs)
+        if recorder.count > budget:
+            details = "\n".join(
+                "  %dx %s" % (n, fp) for fp, n in recorder.duplicates(limit=10)
+            )
+            self.fail(
+                "%s ran %d queries, budget is %d.%s"
+                % (
+                    url,
+                    recorder.count,
+                    budget,
+                    "\nRepeated queries:\n" + details if details else "",
+                )
+            )
+        return response
@@ -1,3 +1,841 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from accounts.models import Student, User
+
+from core.pdf import (
+    FAILED,
+    READY,
+    PDFJobQueue,
+    build_list_pdf,
+    fit_text,
+    payload_digest,
+    render_cached_pdf,
+)
+from core.activity import activity_buffer, log_activity
+from core.enrollment import enroll_students
+from core.fees import (
+    apply_semester_fee,
+    fee_status_counts,
+    provision_fee_schedules,
+    sweep_overdue_fees,
+)
+from core.mail import queue_mail, send_queued_mail
+from core.management.commands.benchmark import HOT_PATHS
+from core.middleware import SlidingSessionMiddleware
+from core.models import (
+    ActivityLog,
+    Batch,
+    CourseOffering,
+    NewsAndEvents,
+    OutboundEmail,
+    Session,
+    StudentEnrollment,
+    StudentTuitionFee,
+    TuitionFee,
+)
+from core.news_feed import get_news_feed
+from core.profiling import QueryBudgetMixin, fingerprint, profile_buffer, record_queries
+from core.utils import allocate_slugs
+from course.models import Course, CourseAllocation, Program
+
+
+class BouncingEmailBackend(locmem.EmailBackend):
+    """locmem backend that refuses mail to bounce@example.com"""
+
+    opened = 0
+
+    def open(self):
+        BouncingEmailBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if "bounce@example.com" in message.to:
+                raise OSError("mailbox unavailable")
+        return super().send_messages(messages)
+
+
+def _write_pdf(path, payload):
+    with open(path, "w") as f:
+        f.write(payload["body"])
+
+
+def _broken_pdf(path, payload):
+    raise ValueError("broken")
+
+
+class PDFRenderingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+        import core.pdf
+
+        self.queue = PDFJobQueue(max_workers=0)
+        self._previous_queue = core.pdf.pdf_queue
+        core.pdf.pdf_queue = self.queue
+        self.addCleanup(setattr, core.pdf, "pdf_queue", self._previous_queue)
+
+    def test_digest_is_stable_and_kind_specific(self):
+        payload = {"b": 1, "a": [1, 2]}
+        self.assertEqual(
+            payload_digest("sheet", payload),
+            payload_digest("sheet", {"a": [1, 2], "b": 1}),
+        )
+        self.assertNotEqual(
+            payload_digest("sheet", payload), payload_digest("form", payload)
+        )
+
+    def test_render_then_reuse_cached_file(self):
+        calls = []
+
+        def builder(path, payload):
+            calls.append(path)
+            _write_pdf(path, payload)
+
+        status, storage, name = render_cached_pdf(
+            "docs", "sheet", {"body": "one"}, builder
+        )
+        self.assertEqual(status, READY)
+        with storage.open(name) as f:
+            self.assertEqual(f.read(), b"one")
+
+        status, _, same_name = render_cached_pdf(
+            "docs", "sheet", {"body": "one"}, builder
+        )
+        self.assertEqual(status, READY)
+        self.assertEqual(same_name, name)
+        self.assertEqual(len(calls), 1)
+
+    def test_prune_unused_documents(self):
+        _, storage, old = render_cached_pdf(
+            "docs", "sheet", {"body": "old"}, _write_pdf
+        )
+        _, _, recent = render_cached_pdf("docs", "sheet", {"body": "new"}, _write_pdf)
+        storage.save("README.txt", io.BytesIO(b"keep"))
+        stale = time.time() - 40 * 24 * 60 * 60
+        for name in (old, recent, "README.txt"):
+            os.utime(storage.path(name), (stale, stale))
+        # Serving a document marks it as used
+        render_cached_pdf("docs", "sheet", {"body": "new"}, _write_pdf)
+
+        with override_settings(PDF_CACHE_FOLDERS=["docs", "missing"]):
+            call_command("prune_pdf_cache", stdout=open(os.devnull, "w"))
+        self.assertEqual(
+            sorted(os.listdir(storage.location)), sorted([recent, "README.txt"])
+        )
+
+    def test_failed_render_leaves_no_partial_file(self):
+        status, storage, name = render_cached_pdf(
+            "docs", "sheet", {"body": "x"}, _broken_pdf
+        )
+        self.assertEqual(status, FAILED)
+        self.assertFalse(storage.exists(name))
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "docs")), [])
+
+
+class ListPDFTests(TestCase):
+    def test_all_rows_are_paginated(self):
+        consumed = []
+
+        def rows():
+            for i in range(200):
+                consumed.append(i)
+                yield (str(i), "user%d" % i)
+
+        out = io.BytesIO()
+        build_list_pdf(out, "Users", ("#", "Username"), rows())
+        self.assertEqual(len(consumed), 200)
+        self.assertTrue(out.getvalue().startswith(b"%PDF"))
+        self.assertGreater(out.getvalue().count(b"/Type /Page\n"), 1)
+
+    @mock.patch("core.pdf.LIST_PAGES_PER_CHUNK", 1)
+    def test_rows_are_pulled_chunk_by_chunk(self):
+        import core.pdf
+
+        consumed = []
+        pages = []
+
+        def rows():
+            for i in range(200):
+                consumed.append(i)
+                yield (str(i), "user%d" % i)
+
+        def after_page(doc):
+            pages.append(len(consumed))
+
+        out = io.BytesIO()
+        with mock.patch.object(core.pdf._ListDocTemplate, "afterPage", after_page):
+            build_list_pdf(out, "Users", ("#", "Username"), rows())
+        # Later rows are only fetched once earlier pages are laid out
+        self.assertLess(pages[0], 200)
+        self.assertEqual(len(pages), out.getvalue().count(b"/Type /Page\n"))
+        self.assertGreater(len(pages), 5)
+        self.assertEqual(len(consumed), 200)
+
+    def test_long_values_are_cut_to_the_column(self):
+        self.assertEqual(fit_text("short", 50), "short")
+        cut = fit_text("x" * 500, 50)
+        self.assertTrue(cut.endswith("..."))
+        self.assertLessEqual(stringWidth(cut, "Helvetica", 8), 50)
+
+        def pages(value):
+            out = io.BytesIO()
+            rows = ((str(i), value) for i in range(200))
+            build_list_pdf(out, "Users", ("#", "Email"), rows, col_widths=(30, 120))
+            return out.getvalue().count(b"/Type /Page\n")
+
+        # Long values neither wrap nor push rows onto extra pages
+        self.assertEqual(pages("a" * 300 + "@example.com"), pages("a@example.com"))
+
+    def test_empty_list(self):
+        out = io.BytesIO()
+        build_list_pdf(out, "Users", ("#", "Username"), iter(()))
+        self.assertTrue(out.getvalue().startswith(b"%PDF"))
+
+
+class QueryProfilingTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.force_login(self.admin)
+
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'a'"),
+            fingerprint("SELECT *  FROM t WHERE id = 42 AND name = 'b''c'"),
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s)"),
+            "SELECT * FROM t WHERE id IN (...)",
+        )
+
+    def test_recorder_reports_duplicates(self):
+        with record_queries() as recorder:
+            for pk in range(3):
+                list(User.objects.filter(pk=pk))
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(recorder.duplicates()[0][1], 3)
+
+    @override_settings(QUERY_PROFILING=True)
+    def test_middleware_records_profile(self):
+        profile_buffer.clear()
+        self.client.get(reverse("home"))
+        entry = profile_buffer.entries()[0]
+        self.assertEqual(entry["view"], "home")
+        self.assertGreater(entry["queries"], 0)
+        self.assertEqual(profile_buffer.summary()[0]["requests"], 1)
+
+    def test_dashboard_is_admin_only(self):
+        self.assertEqual(self.client.get(reverse("query_profile")).status_code, 200)
+        self.client.force_login(
+            User.objects.create_user(username="user", password="password")
+        )
+        self.assertEqual(self.client.get(reverse("query_profile")).status_code, 302)
+
+    def test_home_query_budget(self):
+        cache.clear()
+        self.assertQueryBudget(reverse("home"), 6)
+
+    def test_tuition_fee_dashboard_query_budget(self):
+        self.assertQueryBudget(reverse("tuition_fee_dashboard"), 9)
+
+
+class NewsFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_is_cached_until_news_changes(self):
+        NewsAndEvents.objects.create(title="First", posted_as="News")
+        self.assertEqual([n.title for n in get_news_feed()], ["First"])
+        with self.assertNumQueries(0):
+            get_news_feed()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = NewsAndEvents.objects.create(title="Second", posted_as="News")
+        self.assertEqual([n.title for n in get_news_feed()], ["Second", "First"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual([n.title for n in get_news_feed()], ["First"])
+
+    def test_ticker_is_lazy(self):
+        from core.context_processors import news_ticker
+        from django.test import RequestFactory
+
+        with self.assertNumQueries(0):
+            context = news_ticker(RequestFactory().get("/"))
+        with self.assertNumQueries(1):
+            self.assertFalse(context["ticker_items"])
+
+
+@override_settings(SESSION_COOKIE_AGE=1000, SESSION_REFRESH_PERCENT=75)
+class SlidingSessionTests(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser(
+                username="admin", email="admin@example.com", password="password"
+            )
+        )
+
+    def _stamp(self):
+        return self.client.session[SlidingSessionMiddleware.REFRESHED_AT]
+
+    def test_session_saved_only_when_expiry_is_near(self):
+        self.client.get(reverse("home"))
+        first = self._stamp()
+
+        with mock.patch("core.middleware.time.time", return_value=first + 100):
+            response = self.client.get(reverse("home"))
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(self._stamp(), first)
+
+        with mock.patch("core.middleware.time.time", return_value=first + 300):
+            response = self.client.get(reverse("home"))
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(self._stamp(), first + 300)
+
+
+class TuitionFeeBulkTests(TestCase):
+    def setUp(self):
+        self.students = [
+            User.objects.create_user(
+                username=f"student{i}", email=f"s{i}@example.com", is_student=True
+            )
+            for i in range(3)
+        ]
+
+    def test_apply_semester_fee_sets_due_date_and_overdue_in_sql(self):
+        StudentTuitionFee.objects.filter(semester=2).delete()
+        StudentTuitionFee.objects.filter(
+            student=self.students[0], semester=3
+        ).update(is_paid=True)
+        past = timezone.now().date() - timedelta(days=1)
+
+        with self.assertNumQueries(5):
+            count = apply_semester_fee(3, past)
+        apply_semester_fee(2, past)
+
+        self.assertEqual(count, 3)
+        fees = StudentTuitionFee.objects.filter(semester=3)
+        self.assertEqual(set(fees.values_list("due_date", flat=True)), {past})
+        self.assertEqual(
+            dict(fees.values_list("student_id", "is_overdue")),
+            {
+                self.students[0].pk: False,
+                self.students[1].pk: True,
+                self.students[2].pk: True,
+            },
+        )
+        self.assertEqual(
+            StudentTuitionFee.objects.filter(semester=2, is_overdue=True).count(), 3
+        )
+
+    @override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    def test_queue_mail_sends_one_message_per_recipient(self):
+        queued = queue_mail(
+            "Subject", "Body", ["a@example.com", "", "b@example.com", "a@example.com"]
+        )
+        send_queued_mail(rate_limit=0)
+        self.assertEqual(queued, 2)
+        self.assertEqual(
+            sorted(message.to for message in mail.outbox),
+            [["a@example.com"], ["b@example.com"]],
+        )
+
+    def test_sweep_flags_only_unpaid_past_due_fees(self):
+        today = timezone.now().date()
+        fees = StudentTuitionFee.objects.filter(semester=1)
+        fees.update(due_date=today - timedelta(days=1), is_overdue=False)
+        fees.filter(student=self.students[0]).update(is_paid=True)
+
+        self.assertEqual(sweep_overdue_fees(today), 2)
+        self.assertEqual(sweep_overdue_fees(today), 0)
+        self.assertEqual(
+            fee_status_counts(),
+            {
+                "pending_fees": StudentTuitionFee.objects.filter(is_paid=False).count(),
+                "overdue_fees": 2,
+                "paid_fees": 1,
+            },
+        )
+
+    def test_new_student_schedule_uses_configured_due_dates(self):
+        due = timezone.now().date() + timedelta(days=90)
+        TuitionFee.objects.create(semester=1, due_date=due, amount=500)
+
+        with self.assertNumQueries(2):
+            provision_fee_schedules([self.students[0].pk])
+        user = User.objects.create_user(username="new", is_student=True)
+
+        fees = dict(
+            StudentTuitionFee.objects.filter(student=user).values_list(
+                "semester", "due_date"
+            )
+        )
+        self.assertEqual(sorted(fees), list(range(1, 9)))
+        self.assertEqual(fees[1], due)
+
+    def test_student_fee_page_does_not_write(self):
+        student = self.students[0]
+        self.client.force_login(student)
+        with record_queries() as recorder:
+            response = self.client.get(reverse("student_tuition_fees", args=[student.pk]))
+        self.assertEqual(len(response.context["tuition_fees"]), 8)
+        self.assertFalse(
+            [sql for sql, _ in recorder.queries if sql.lstrip().upper().startswith("INSERT")]
+        )
+
+
+class StartupImportTests(TestCase):
+    HEAVY_MODULES = ("numpy", "pandas", "joblib", "pulp", "lightgbm", "sklearn")
+
+    def test_setup_and_url_loading_skip_heavy_modules(self):
+        script = (
+            "import sys, django\n"
+            "django.setup()\n"
+            "from django.urls import get_resolver\n"
+            "get_resolver().url_patterns\n"
+            "print(' '.join(m for m in %r if m in sys.modules))\n"
+        ) % (self.HEAVY_MODULES,)
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        env["PYTHONPATH"] = os.pathsep.join(sys.path)
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "", "imported at startup")
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        self.program = Program.objects.create(title="Program")
+
+    def _course(self, title, code):
+        return Course.objects.create(
+            title=title,
+            code=code,
+            program=self.program,
+            level=settings.BACHELOR_DEGREE,
+            semester=settings.FIRST,
+        )
+
+    def test_next_free_suffix_in_one_query(self):
+        self._course("Intro to Python", "C-1")
+        self._course("Intro to Python", "C-2")
+        self.assertEqual(
+            sorted(Course.objects.values_list("slug", flat=True)),
+            ["intro-to-python", "intro-to-python-2"],
+        )
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(
+                Course, ["Intro to Python", "Intro to Python", "Databases", "!!"]
+            )
+        self.assertEqual(
+            slugs, ["intro-to-python-3", "intro-to-python-4", "databases", "course"]
+        )
+
+    def test_long_titles_keep_suffix_within_max_length(self):
+        title = "x" * 80
+        self._course(title, "C-1")
+        slug = allocate_slugs(Course, [title])[0]
+        self.assertEqual(len(slug), 50)
+        self.assertTrue(slug.endswith("-2"))
+
+    def test_save_retries_when_slug_is_taken_concurrently(self):
+        self._course("Algebra", "C-1")
+        with mock.patch(
+            "core.utils.allocate_slugs",
+            side_effect=[["algebra"], ["algebra-2"]],
+        ):
+            course = self._course("Algebra", "C-2")
+        self.assertEqual(course.slug, "algebra-2")
+
+
+class ActivityLogTests(TestCase):
+    def setUp(self):
+        self.program = Program.objects.create(title="Program")
+        ActivityLog.objects.all().delete()
+
+    def _create_courses(self, count):
+        for i in range(count):
+            Course.objects.create(
+                title=f"Course {i}",
+                code=f"C-{i}",
+                program=self.program,
+                level=settings.BACHELOR_DEGREE,
+                semester=settings.FIRST,
+            )
+
+    def test_buffered_messages_are_written_in_one_insert(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with activity_buffer() as entries:
+                self._create_courses(3)
+        self.assertEqual(entries, [])
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with activity_buffer():
+                log_activity("one")
+                log_activity("two")
+        with record_queries() as recorder:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(recorder.count, 1)
+
+    def test_rolled_back_work_is_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with activity_buffer():
+                try:
+                    with transaction.atomic():
+                        self._create_courses(1)
+                        raise ValueError
+                except ValueError:
+                    pass
+        self.assertFalse(ActivityLog.objects.exists())
+
+    def test_prune_command_keeps_recent_entries(self):
+        old = timezone.now() - timedelta(days=400)
+        ActivityLog.objects.bulk_create(
+            [ActivityLog(message="old", created_at=old) for _ in range(3)]
+            + [ActivityLog(message="new")]
+        )
+        out = io.StringIO()
+        call_command("prune_activity_log", days=365, stdout=out)
+        self.assertIn("Deleted 3", out.getvalue())
+        self.assertEqual(
+            list(ActivityLog.objects.values_list("message", flat=True)), ["new"]
+        )
+
+
+class OfferingSyncTests(TestCase):
+    def setUp(self):
+        self.program = Program.objects.create(title="Program")
+        self.batch = Batch.objects.create(title="Default Program", program=self.program)
+        self.courses = [
+            Course.objects.create(
+                title=f"Course {i}",
+                code=f"C-{i}",
+                program=self.program,
+                level=settings.BACHELOR_DEGREE,
+                semester=settings.FIRST,
+            )
+            for i in range(6)
+        ]
+        self.lecturer = User.objects.create_user(
+            username="lecturer", email="l@example.com", is_lecturer=True
+        )
+        for i in range(20):
+            User.objects.create_user(
+                username=f"student{i}",
+                email=f"s{i}@example.com",
+                is_student=True,
+                batch=self.batch,
+            )
+
+    def _allocate(self, courses):
+        with self.captureOnCommitCallbacks() as callbacks:
+            allocation, _ = CourseAllocation.objects.get_or_create(
+                lecturer=self.lecturer
+            )
+            allocation.courses.set(courses)
+        # One sync, however often it was registered
+        self.assertEqual(len(set(callbacks)), 1)
+        with record_queries() as recorder:
+            for callback in callbacks:
+                callback()
+        return recorder
+
+    def _offered(self):
+        return dict(
+            CourseOffering.objects.filter(lecturer=self.lecturer).values_list(
+                "course_id", "pk"
+            )
+        )
+
+    def test_allocation_creates_offerings_and_enrollments_in_bulk(self):
+        recorder = self._allocate(self.courses[:5])
+        self.assertLessEqual(recorder.count, 15)
+        self.assertEqual(set(self._offered()), {c.pk for c in self.courses[:5]})
+        self.assertEqual(
+            StudentEnrollment.objects.filter(
+                course_offering__lecturer=self.lecturer
+            ).count(),
+            100,
+        )
+
+    def test_editing_allocation_only_touches_the_difference(self):
+        self._allocate(self.courses[:5])
+        before = self._offered()
+        self._allocate(self.courses[2:])
+        after = self._offered()
+        self.assertEqual(set(after), {c.pk for c in self.courses[2:]})
+        for course in self.courses[2:5]:
+            self.assertEqual(after[course.pk], before[course.pk])
+
+        self._allocate([])
+        self.assertEqual(self._offered(), {})
+
+    def test_direct_offering_is_added_to_allocation(self):
+        self._allocate(self.courses[:1])
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseOffering.objects.create(
+                program=self.program,
+                course=self.courses[5],
+                lecturer=self.lecturer,
+                batch=self.batch,
+            )
+        allocation = CourseAllocation.objects.get(lecturer=self.lecturer)
+        self.assertEqual(
+            set(allocation.courses.values_list("pk", flat=True)),
+            {self.courses[0].pk, self.courses[5].pk},
+        )
+        self.assertEqual(len(self._offered()), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseOffering.objects.get(course=self.courses[5]).delete()
+        self.assertEqual(
+            list(allocation.courses.values_list("pk", flat=True)),
+            [self.courses[0].pk],
+        )
+
+    def test_rolled_back_changes_are_not_synced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    allocation = CourseAllocation.objects.create(lecturer=self.lecturer)
+                    allocation.courses.set(self.courses)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertFalse(CourseOffering.objects.exists())
+
+        # Nothing of the rolled back block is carried into the next sync
+        other = User.objects.create_user(username="other", is_lecturer=True)
+        with self.captureOnCommitCallbacks() as callbacks:
+            CourseAllocation.objects.create(lecturer=other)
+        self.assertEqual(callbacks[0].lecturer_ids, {other.pk})
+
+    def test_sync_survives_a_rolled_back_savepoint(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    allocation = CourseAllocation.objects.create(lecturer=self.lecturer)
+                    allocation.courses.set(self.courses[:1])
+                    raise ValueError
+            except ValueError:
+                pass
+            allocation = CourseAllocation.objects.create(lecturer=self.lecturer)
+            allocation.courses.set(self.courses[1:3])
+        self.assertEqual(set(self._offered()), {c.pk for c in self.courses[1:3]})
+
+
+class BatchEnrollmentTests(TestCase):
+    def setUp(self):
+        self.program = Program.objects.create(title="Program")
+        self.lecturer = User.objects.create_user(
+            username="lecturer", email="l@example.com", is_lecturer=True
+        )
+        self.batch = Batch.objects.create(title="Default Program", program=self.program)
+        self.offerings = [
+            CourseOffering.objects.create(
+                program=self.program,
+                course=Course.objects.create(
+                    title=f"Course {i}",
+                    code=f"C-{i}",
+                    program=self.program,
+                    level=settings.BACHELOR_DEGREE,
+                    semester=settings.FIRST,
+                ),
+                lecturer=self.lecturer,
+                batch=self.batch,
+            )
+            for i in range(3)
+        ]
+        self.students = []
+        for i in range(30):
+            user = User.objects.create_user(
+                username=f"student{i}", email=f"s{i}@example.com", is_student=True
+            )
+            Student.objects.create(student=user, program=self.program)
+            self.students.append(user)
+
+    def test_enroll_students_keeps_existing_enrollments(self):
+        StudentEnrollment.objects.create(
+            student=self.students[0], course_offering=self.offerings[0], is_active=False
+        )
+        with self.assertNumQueries(1):
+            enroll_students(self.students, self.offerings)
+        self.assertEqual(StudentEnrollment.objects.count(), 90)
+        self.assertFalse(
+            StudentEnrollment.objects.get(
+                student=self.students[0], course_offering=self.offerings[0]
+            ).is_active
+        )
+
+    def test_command_assigns_and_enrolls_in_bulk(self):
+        with record_queries() as recorder:
+            call_command("assign_students_to_batches", stdout=io.StringIO())
+        self.assertLess(recorder.count, 15)
+        self.assertEqual(
+            User.objects.filter(is_student=True, batch=self.batch).count(), 30
+        )
+        self.assertEqual(StudentEnrollment.objects.count(), 90)
+
+
+class OutboxTests(TestCase):
+    def test_queueing_is_one_insert(self):
+        with self.assertNumQueries(1):
+            queued = queue_mail(
+                "Subject", "Body", [f"s{i}@example.com" for i in range(50)]
+            )
+        self.assertEqual(queued, 50)
+        self.assertEqual(
+            OutboundEmail.objects.filter(status=OutboundEmail.PENDING).count(), 50
+        )
+
+    def test_batches_share_one_connection(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        queue_mail("Subject", "Body", [f"s{i}@example.com" for i in range(5)])
+        with override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.filebased.EmailBackend",
+            EMAIL_FILE_PATH=tmpdir,
+        ):
+            out = io.StringIO()
+            call_command("send_queued_mail", batch_size=2, stdout=out)
+        self.assertIn("Sent 5 queued emails", out.getvalue())
+        (name,) = os.listdir(tmpdir)
+        with open(os.path.join(tmpdir, name)) as f:
+            self.assertEqual(f.read().count("Subject: Subject"), 5)
+        self.assertFalse(
+            OutboundEmail.objects.exclude(status=OutboundEmail.SENT).exists()
+        )
+
+    @override_settings(
+        EMAIL_BACKEND="core.tests.BouncingEmailBackend",
+        MAIL_MAX_ATTEMPTS=2,
+        MAIL_RETRY_BACKOFF=60,
+    )
+    def test_failures_are_retried_with_backoff(self):
+        queue_mail("Subject", "Body", ["ok@example.com", "bounce@example.com"])
+        BouncingEmailBackend.opened = 0
+        self.assertEqual(send_queued_mail(rate_limit=0), (1, 1))
+        self.assertEqual(BouncingEmailBackend.opened, 1)
+        self.assertEqual([m.to for m in mail.outbox], [["ok@example.com"]])
+
+        bounced = OutboundEmail.objects.get(to="bounce@example.com")
+        self.assertEqual(bounced.status, OutboundEmail.PENDING)
+        self.assertEqual(bounced.attempts, 1)
+        self.assertIn("mailbox unavailable", bounced.last_error)
+        self.assertGreater(bounced.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(send_queued_mail(rate_limit=0), (0, 0))
+
+        OutboundEmail.objects.filter(pk=bounced.pk).update(
+            next_attempt_at=timezone.now()
+        )
+        self.assertEqual(send_queued_mail(rate_limit=0), (0, 1))
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.status, OutboundEmail.FAILED)
+        self.assertEqual(bounced.attempts, 2)
+
+    @override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    def test_sent_bodies_are_blanked_and_old_rows_pruned(self):
+        queue_mail("Subject", "password: secret", ["a@example.com"], html_message="x")
+        send_queued_mail(rate_limit=0)
+        self.assertIn("secret", mail.outbox[0].body)
+        sent = OutboundEmail.objects.get()
+        self.assertEqual((sent.status, sent.body, sent.html_body), ("sent", "", ""))
+
+        queue_mail("Subject", "Body", ["b@example.com"])
+        OutboundEmail.objects.update(created_at=timezone.now() - timedelta(days=30))
+        call_command("prune_outbound_email", days=7, stdout=io.StringIO())
+        # Only finished messages go
+        self.assertEqual(
+            list(OutboundEmail.objects.values_list("to", flat=True)), ["b@example.com"]
+        )
+
+    def test_admin_hides_bodies(self):
+        queue_mail("Subject", "password: secret", ["a@example.com"])
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse(
+                "admin:core_outboundemail_change",
+                args=[OutboundEmail.objects.get().pk],
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "secret")
+
+    def test_rolled_back_mail_is_never_sent(self):
+        try:
+            with transaction.atomic():
+                queue_mail("Subject", "Body", ["a@example.com"])
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(OutboundEmail.objects.exists())
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_small_run(self):
+        out = io.StringIO()
+        call_command(
+            "benchmark",
+            programs=1,
+            courses_per_program=1,
+            students=2,
+            lecturers=1,
+            days=2,
+            repeat=1,
+            stdout=out,
+            stderr=io.StringIO(),
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["rows"]["offerings"], 1)
+        self.assertEqual(set(report["results"]), set(HOT_PATHS))
+        # Everything is rolled back
+        self.assertFalse(Program.objects.exists())
+
+    def test_counts_must_be_positive(self):
+        for option in ("programs", "courses_per_program", "students", "repeat"):
+            with self.assertRaisesMessage(CommandError, "must be at least 1"):
+                call_command("benchmark", **{option: 0}, stdout=io.StringIO())
+
+    def test_keep_leaves_an_existing_current_session_alone(self):
+        session = Session.objects.create(session="2026/2027", is_current_session=True)
+        with self.assertRaisesMessage(CommandError, "--keep"):
+            call_command("benchmark", keep=True, stdout=io.StringIO())
+        session.refresh_from_db()
+        self.assertTrue(session.is_current_session)
@@ -52,6 +52,8 @@ from .views import (
     timetable_regenerate,
     # Result checking
     check_result_by_enrollment,
+    # Profiling
+    query_profile_view,
 )
 
 urlpatterns = [
@@ -130,4 +132,7 @@ urlpatterns = [
     
     # Public Result Checking
     path('check-result/', check_result_by_enrollment, name='check_result_by_enrollment'),
+
+    # Query profiling dashboard
+    path('query-profile/', query_profile_view, name='query_profile'),
 ]
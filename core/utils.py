@@ -1,49 +1,21 @@
 import random
 import string
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from django.utils.text import slugify
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from django.conf import settings
 from typing import Dict, List, Optional, Tuple
-import os
-import joblib
-import numpy as np
-import pandas as pd
 
 from typing import Any  # avoid importing accounts at module import time
-from .models import StudentMetrics, PredictionLog, TimetableSlot, CourseOffering, Classroom, Batch, Attendance, AttendanceSession
+from .mail import queue_html_mail, queue_mail
+from .models import TimetableSlot, CourseOffering, Classroom, Batch, Attendance, AttendanceSession
 import datetime
-try:
-    import pulp
-except Exception:
-    pulp = None
 
 
 # -----------------------------
-# Prediction utilities
+# Prediction utilities (models and numpy live in core.prediction)
 # -----------------------------
 
-_CLASSIFIER = None
-_REGRESSOR = None
-_FEATURE_NAMES: Optional[List[str]] = None
-
-
-def _load_models_if_needed() -> None:
-    global _CLASSIFIER, _REGRESSOR, _FEATURE_NAMES
-    if _CLASSIFIER is not None and _REGRESSOR is not None and _FEATURE_NAMES is not None:
-        return
-
-    base_dir = settings.BASE_DIR  # project root
-    clf_path = os.path.join(base_dir, "lgb_classifier.pkl")
-    reg_path = os.path.join(base_dir, "lgb_regressor.pkl")
-    feat_path = os.path.join(base_dir, "feature_names.pkl")
-
-    _CLASSIFIER = joblib.load(clf_path)
-    _REGRESSOR = joblib.load(reg_path)
-    _FEATURE_NAMES = joblib.load(feat_path)
-
-
 def get_student_by_name(name: str):
     """Find a student by ID/username or full name fragments."""
     from django.contrib.auth import get_user_model
@@ -83,105 +55,6 @@ def get_student_by_name(name: str):
     return user
 
 
-def build_feature_vector_for_student(user: Any) -> Dict[str, float]:
-    """Build a features dict for a student aligned to training features.
-
-    Strategy:
-    - Start with ZERO defaults for every entry in feature_names.pkl
-    - Optionally fill a few obvious fields if available later
-    This guarantees no "Missing features" errors and preserves correct order.
-    """
-    _load_models_if_needed()
-    assert _FEATURE_NAMES is not None
-
-    # Start with zeros for all expected features to avoid missing keys
-    features: Dict[str, float] = {name: 0.0 for name in _FEATURE_NAMES}
-
-    # Map from StudentMetrics if present
-    metrics = StudentMetrics.objects.filter(user=user).first()
-    if metrics:
-        mapping = {
-            "Attendance (%)": metrics.attendance_percent,
-            "CourseGradesAvg": metrics.course_grades_avg,
-            "GradeAvg": metrics.grade_avg,
-            "CreditHours": metrics.credit_hours,
-            "AgeAtEnroll": metrics.age_at_enroll,
-            "DaysSinceLastLogin": metrics.days_since_last_login,
-            "RiskScore": metrics.risk_score,
-        }
-        for k, v in mapping.items():
-            if k in features:
-                features[k] = float(v)
-
-        # one-hot categorical examples
-        if metrics.residency:
-            key = f"Residency_{metrics.residency}"
-            if key in features:
-                features[key] = 1.0
-        if metrics.financial_aid:
-            key = f"FinancialAid_{metrics.financial_aid}"
-            if key in features:
-                features[key] = 1.0
-        if metrics.pandemic_effect:
-            key = f"PandemicEffect_{metrics.pandemic_effect}"
-            if key in features:
-                features[key] = 1.0
-
-    # major/program one-hot from Student.program.title if available
-    try:
-        program_title = getattr(getattr(user, "student", None), "program", None).title
-        if program_title:
-            one_hot_key = f"Major_{program_title}"
-            if one_hot_key in features:
-                features[one_hot_key] = 1.0
-    except Exception:
-        pass
-
-    return features
-
-
-def align_features(raw_features: Dict[str, float]) -> np.ndarray:
-    """Align features to the training order from feature_names.pkl.
-
-    Any absent feature keys are treated as 0.0 to prevent crashes until
-    real data mapping is provided.
-    """
-    _load_models_if_needed()
-    assert _FEATURE_NAMES is not None
-    values = [raw_features.get(f, 0.0) for f in _FEATURE_NAMES]
-    arr = np.asarray(values, dtype=float).reshape(1, -1)
-    return arr
-
-
-def predict_performance(raw_features: Dict[str, float]) -> Dict[str, object]:
-    """Run classifier and regressor and return results."""
-    _load_models_if_needed()
-    X = align_features(raw_features)
-    cls = _CLASSIFIER.predict(X)[0]
-    reg = float(_REGRESSOR.predict(X)[0])
-    # Ensure category mapping is textual
-    if isinstance(cls, (int, np.integer)):
-        mapping = {0: "Low", 1: "Average", 2: "High"}
-        category = mapping.get(int(cls), str(cls))
-    else:
-        category = str(cls)
-    return {"category": category, "marks": reg}
-
-
-def log_prediction(target_user: Any, requested_by: Any, result: Dict[str, object], features: Dict[str, float]) -> None:
-    try:
-        PredictionLog.objects.create(
-            user=target_user,
-            requested_by=requested_by,
-            category=str(result.get("category")),
-            predicted_marks=float(result.get("marks", 0.0)),
-            features_snapshot=features,
-        )
-    except Exception:
-        # Do not break flow if logging fails
-        pass
-
-
 # -----------------------------
 # Timetable generation (pulp-based)
 # -----------------------------
@@ -454,53 +327,91 @@ def get_all_batches_with_timetable() -> List[Dict]:
 
 
 def send_email(user, subject, msg):
-    send_mail(
-        subject,
-        msg,
-        settings.EMAIL_FROM_ADDRESS,
-        [user.email],
-        fail_silently=False,
-    )
+    """Queue a plain text email to ``user`` (sent by ``send_queued_mail``)"""
+    queue_mail(subject, msg, [user.email])
 
 
 def send_html_email(subject, recipient_list, template, context):
-    """A function responsible for sending HTML email"""
-    # Render the HTML template
-    html_message = render_to_string(template, context)
-
-    # Generate plain text version of the email (optional)
-    plain_message = strip_tags(html_message)
-
-    # Send the email
-    send_mail(
-        subject,
-        plain_message,
-        settings.EMAIL_FROM_ADDRESS,
-        recipient_list,
-        html_message=html_message,
-    )
+    """Queue an HTML email rendered from ``template`` with a plain text version"""
+    queue_html_mail(subject, recipient_list, template, context)
 
 
 def random_string_generator(size=10, chars=string.ascii_lowercase + string.digits):
     return "".join(random.choice(chars) for _ in range(size))
 
 
+SLUG_SAVE_ATTEMPTS = 5
+
+
+def allocate_slugs(model, titles, field="slug", reserved=()):
+    """
+    Return a free ``field`` value of ``model`` for each of ``titles``.
+
+    Existing slugs starting with any of the bases are read in one query and
+    the lowest free numeric suffix is used: ``intro``, ``intro-2``,
+    ``intro-3``...  Titles allocated together never collide with each
+    other, so bulk creators can allocate all their slugs in one call.
+    ``reserved`` values are avoided as if they already existed.
+    """
+    max_length = model._meta.get_field(field).max_length
+    fallback = model._meta.model_name
+    bases = [
+        (slugify(title) or fallback)[:max_length].strip("-") or fallback
+        for title in titles
+    ]
+    if not bases:
+        return []
+
+    lookup = Q()
+    for base in set(bases):
+        lookup |= Q(**{f"{field}__startswith": base})
+    taken = set(model._default_manager.filter(lookup).values_list(field, flat=True))
+    taken.update(reserved)
+
+    next_suffix = {}
+    slugs = []
+    for base in bases:
+        n = next_suffix.get(base, 1)
+        slug = base
+        while slug in taken:
+            n += 1
+            suffix = f"-{n}"
+            slug = base[: max_length - len(suffix)].rstrip("-") + suffix
+        next_suffix[base] = n
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
 def unique_slug_generator(instance, new_slug=None):
     """
     Assumes the instance has a model with a slug field and a title
     character (char) field.
     """
-    if new_slug is not None:
-        slug = new_slug
-    else:
-        slug = slugify(instance.title)
-
-    klass = instance.__class__
-    qs_exists = klass.objects.filter(slug=slug).exists()
-    if qs_exists:
-        new_slug = f"{slug}-{random_string_generator(size=4)}"
-        return unique_slug_generator(instance, new_slug=new_slug)
-    return slug
+    return allocate_slugs(instance.__class__, [new_slug or instance.title])[0]
+
+
+class UniqueSlugMixin:
+    """
+    Fill an empty ``slug`` from ``title`` on save.
+
+    Another request may take the same slug between allocation and INSERT;
+    the unique constraint then fails and a fresh slug is allocated.
+    """
+
+    def save(self, *args, **kwargs):
+        if self.slug:
+            return super().save(*args, **kwargs)
+        for attempt in range(SLUG_SAVE_ATTEMPTS):
+            self.slug = unique_slug_generator(self)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                clash = self.__class__._default_manager.filter(slug=self.slug)
+                if attempt == SLUG_SAVE_ATTEMPTS - 1 or not clash.exists():
+                    self.slug = ""
+                    raise
 
 
 def get_attendance_percentage(student, course_offering, start_date, end_date):
@@ -31,12 +31,14 @@ from .utils import (
     generate_timetable_for_day, generate_comprehensive_timetable,
     generate_timetable_for_batch, get_timetable_data_for_batch,
     get_all_batches_with_timetable, get_student_by_name,
-    build_feature_vector_for_student, predict_performance, log_prediction,
     get_attendance_percentage, get_student_attendance_summary,
     get_batch_attendance_summary, mark_bulk_attendance,
     get_lecturer_courses, search_students, get_detention_list
 )
 from .ai_utils import get_ai_manager, is_ai_available
+from .news_feed import get_news_feed
+from .fees import apply_semester_fee, fee_status_counts
+from .mail import queue_mail
 
 # Simple test view to bypass all redirects
 def test_view(request):
@@ -136,7 +138,7 @@ def announcement_delete_view(request, pk):
 def home_view(request):
     """Home page view"""
     # Get news and events for the ticker
-    news_items = NewsAndEvents.objects.order_by('-updated_date')[:5]
+    news_items = get_news_feed()[:5]
 
     # Check if user can add news (only lecturers and admins)
     can_edit_news = request.user.is_superuser or (hasattr(request.user, 'lecturer') and request.user.is_lecturer and request.user.is_active)
@@ -430,6 +432,10 @@ def unset_current_semester():
 @login_required
 @require_POST
 def predict_api(request):
+    # numpy and the models are only loaded once a prediction is requested
+    from .prediction import (
+        build_feature_vector_for_student, log_prediction, predict_performance
+    )
 
     target_name = request.POST.get("student_name", "").strip()
     if request.user.is_student:
@@ -1327,9 +1333,7 @@ def tuition_fee_dashboard(request):
     
     # Get statistics
     total_students = User.objects.filter(is_student=True).count()
-    pending_fees = StudentTuitionFee.objects.filter(is_paid=False).count()
-    overdue_fees = StudentTuitionFee.objects.filter(is_overdue=True).count()
-    paid_fees = StudentTuitionFee.objects.filter(is_paid=True).count()
+    fee_counts = fee_status_counts()
     
     # Get recent fee updates
     recent_fees = StudentTuitionFee.objects.select_related('student').order_by('-updated_at')[:10]
@@ -1339,9 +1343,7 @@ def tuition_fee_dashboard(request):
     
     context = {
         'total_students': total_students,
-        'pending_fees': pending_fees,
-        'overdue_fees': overdue_fees,
-        'paid_fees': paid_fees,
+        **fee_counts,
         'recent_fees': recent_fees,
         'semester_fees': semester_fees,
     }
@@ -1357,19 +1359,8 @@ def student_tuition_fees(request, student_id):
         messages.error(request, "Access denied.")
         return redirect('home')
     
-    # Get or create tuition fee records for all 8 semesters
-    tuition_fees = []
-    for semester in range(1, 9):
-        fee, created = StudentTuitionFee.objects.get_or_create(
-            student=student,
-            semester=semester,
-            defaults={
-                'due_date': timezone.now().date() + timedelta(days=30),
-                'amount_paid': 0.00,
-                'is_paid': False
-            }
-        )
-        tuition_fees.append(fee)
+    # Schedules are provisioned when the student is created
+    tuition_fees = list(StudentTuitionFee.objects.filter(student=student).order_by('semester'))
     
     # Calculate totals
     total_paid = sum(fee.amount_paid for fee in tuition_fees)
@@ -1435,29 +1426,14 @@ def bulk_update_tuition_fees(request):
             
             # Update all student records for this semester
             students = User.objects.filter(is_student=True)
-            updated_count = 0
-            
-            for student in students:
-                student_fee, created = StudentTuitionFee.objects.get_or_create(
-                    student=student,
-                    semester=semester,
-                    defaults={'due_date': due_date, 'amount_paid': 0.00, 'is_paid': False}
-                )
-                if not created:
-                    student_fee.due_date = due_date
-                    student_fee.save()
-                updated_count += 1
-            
+            updated_count = apply_semester_fee(semester, due_date, students)
+
             messages.success(request, f"Updated tuition fees for {updated_count} students in Semester {semester}.")
             
-            # Send email notifications if requested
+            # Queue one email per student, sent in the background
             if send_notifications:
-                try:
-                    from django.core.mail import send_mail
-                    from django.conf import settings
-                    
-                    subject = f"Tuition Fee Update - Semester {semester}"
-                    message = f"""
+                subject = f"Tuition Fee Update - Semester {semester}"
+                message = f"""
 Dear Student,
 
 Your tuition fee for Semester {semester} has been updated:
@@ -1470,25 +1446,13 @@ Please ensure timely payment to avoid any late fees or restrictions.
 
 Best regards,
 KCET CMS Team
-                    """
-                    
-                    # Send emails to all students
-                    student_emails = [student.email for student in students if student.email]
-                    if student_emails:
-                        send_mail(
-                            subject=subject,
-                            message=message,
-                            from_email=settings.EMAIL_FROM_ADDRESS,
-                            recipient_list=student_emails,
-                            fail_silently=False,
-                        )
-                        messages.success(request, f"Email notifications sent to {len(student_emails)} students.")
-                    else:
-                        messages.warning(request, "No student emails found to send notifications.")
-                        
-                except Exception as e:
-                    messages.error(request, f"Error sending email notifications: {str(e)}")
-                    print(f"❌ Error sending tuition fee emails: {e}")
+                """
+                student_emails = students.exclude(email="").values_list("email", flat=True)
+                queued = queue_mail(subject, message, student_emails)
+                if queued:
+                    messages.success(request, f"Email notifications queued for {queued} students.")
+                else:
+                    messages.warning(request, "No student emails found to send notifications.")
             
             return redirect('tuition_fee_dashboard')
     else:
@@ -1685,3 +1649,24 @@ def check_result_by_enrollment(request):
     }
     
     return render(request, 'core/check_result_form.html', context)
+
+
+@login_required
+@admin_required
+def query_profile_view(request):
+    """Per-view query counts and timings collected by QueryProfilingMiddleware"""
+    from django.conf import settings
+    from .profiling import profile_buffer
+
+    if request.method == 'POST':
+        profile_buffer.clear()
+        messages.success(request, 'Query profile cleared.')
+        return redirect('query_profile')
+
+    context = {
+        'title': 'Query Profile',
+        'enabled': getattr(settings, 'QUERY_PROFILING', False),
+        'summary': profile_buffer.summary(),
+        'recent': profile_buffer.entries()[:50],
+    }
+    return render(request, 'core/query_profile.html', context)
@@ -0,0 +1,140 @@
+"""
+Chunked, resumable uploads of course files and videos.
+
+The protocol has three steps:
+
+1. ``POST .../uploads/`` with the form fields, ``kind``, ``filename`` and
+   ``size`` validates everything but the bytes and opens a
+   ``ChunkedUpload`` with an empty part file in private storage.
+2. ``PUT .../uploads/<id>/`` once per chunk, the position given by
+   ``Content-Range: bytes first-last/size`` and optionally an
+   ``X-Chunk-SHA256`` of the body.  Each chunk is streamed from the
+   request into the part file at its offset while being hashed, and the
+   offset only advances when the hash matches.  ``GET`` on the same URL
+   returns the offset to resume from after a dropped connection.
+3. ``POST .../uploads/<id>/complete/`` hands the part file to the usual
+   ``UploadFormFile`` / ``UploadFormVideo``.  ``FileSystemStorage`` moves
+   it into place (copying only across filesystems), so the file is never
+   read into memory.
+"""
+import hashlib
+import mimetypes
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+
+from .models import ChunkedUpload
+from .storage import private_storage
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+COPY_BLOCK_SIZE = 64 * 1024
+
+
+class ChunkRejected(Exception):
+    pass
+
+
+class OffsetConflict(ChunkRejected):
+    """The chunk does not start where the upload stands."""
+
+
+class PendingFile(UploadedFile):
+    """Name and size of a file not sent yet, for validating the upload form."""
+
+    def __init__(self, name, size):
+        super().__init__(None, name, mimetypes.guess_type(name)[0], size)
+
+
+class AssembledFile(UploadedFile):
+    """
+    The finished part file.
+
+    Like ``TemporaryUploadedFile`` it exposes ``temporary_file_path``, so
+    ``FileSystemStorage`` renames it instead of copying it.
+    """
+
+    def __init__(self, upload):
+        self.path = private_storage.path(upload.part_name)
+        super().__init__(
+            open(self.path, "rb"),
+            upload.filename,
+            mimetypes.guess_type(upload.filename)[0],
+            upload.size,
+        )
+
+    def temporary_file_path(self):
+        return self.path
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # The file was moved away
+            pass
+
+
+def start_upload(user, course, kind, title, filename, size):
+    upload = ChunkedUpload.objects.create(
+        user=user, course=course, kind=kind, title=title, filename=filename, size=size
+    )
+    private_storage.save(upload.part_name, ContentFile(b""))
+    return upload
+
+
+def parse_content_range(header):
+    """Return ``(first, last, size)`` from a ``Content-Range`` header."""
+    match = CONTENT_RANGE_RE.match(header or "")
+    if not match:
+        raise ChunkRejected("Content-Range must be 'bytes first-last/size'.")
+    first, last, size = map(int, match.groups())
+    if last < first:
+        raise ChunkRejected("Invalid Content-Range.")
+    return first, last, size
+
+
+def write_chunk(upload, content_range, stream, checksum=""):
+    """
+    Write the chunk read from ``stream`` at its offset; returns its SHA-256.
+
+    ``upload.offset`` is advanced only once the whole chunk has been
+    written and matches ``checksum`` (a hex SHA-256), so a broken chunk can
+    simply be sent again.
+    """
+    first, last, size = parse_content_range(content_range)
+    length = last - first + 1
+    if size != upload.size or last >= size:
+        raise ChunkRejected("The chunk lies outside the file.")
+    if length > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+        raise ChunkRejected(
+            f"Chunks may not exceed {settings.CHUNKED_UPLOAD_CHUNK_SIZE} bytes."
+        )
+    if first != upload.offset:
+        raise OffsetConflict(f"Expected a chunk starting at byte {upload.offset}.")
+
+    digest = hashlib.sha256()
+    received = 0
+    with open(private_storage.path(upload.part_name), "r+b") as part:
+        part.seek(first)
+        while received < length:
+            block = stream.read(min(COPY_BLOCK_SIZE, length - received))
+            if not block:
+                break
+            digest.update(block)
+            part.write(block)
+            received += len(block)
+    if received != length:
+        raise ChunkRejected(f"Received {received} of {length} bytes.")
+    if checksum and checksum.lower() != digest.hexdigest():
+        raise ChunkRejected("Checksum mismatch.")
+
+    # Only one of two concurrent copies of a chunk moves the offset
+    if not ChunkedUpload.objects.filter(pk=upload.pk, offset=first).update(
+        offset=first + length, updated_at=timezone.now()
+    ):
+        upload.refresh_from_db(fields=["offset"])
+        raise OffsetConflict(f"Expected a chunk starting at byte {upload.offset}.")
+    upload.offset = first + length
+    return digest.hexdigest()
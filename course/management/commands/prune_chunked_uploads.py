@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from course.models import ChunkedUpload
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete chunked uploads (and their part files) that have received no "
+        "chunk for CHUNKED_UPLOAD_EXPIRY_HOURS. Run hourly from cron, e.g. "
+        "`0 * * * * manage.py prune_chunked_uploads`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=settings.CHUNKED_UPLOAD_EXPIRY_HOURS,
+            help="Keep uploads active in the last HOURS hours",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        deleted = 0
+        for upload in ChunkedUpload.objects.filter(updated_at__lt=cutoff).iterator():
+            upload.delete()
+            deleted += 1
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} abandoned uploads"))
@@ -0,0 +1,57 @@
+# Generated by Django 4.0.8 on 2026-10-19 02:17
+
+import os
+import shutil
+
+from django.conf import settings
+import course.storage
+import django.core.validators
+from django.db import migrations, models
+
+
+def _private_names(apps):
+    UploadVideo = apps.get_model("course", "UploadVideo")
+    ChunkedUpload = apps.get_model("course", "ChunkedUpload")
+    names = [
+        name for name in UploadVideo.objects.values_list("video", flat=True) if name
+    ]
+    names += [
+        f"chunked_uploads/{pk}.part"
+        for pk in ChunkedUpload.objects.values_list("pk", flat=True)
+    ]
+    return names
+
+
+def _move(names, source_root, target_root):
+    for name in names:
+        source = os.path.join(source_root, name)
+        if not os.path.exists(source):
+            continue
+        target = os.path.join(target_root, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(source, target)
+
+
+def forwards(apps, schema_editor):
+    _move(_private_names(apps), settings.MEDIA_ROOT, settings.PRIVATE_MEDIA_ROOT)
+
+
+def backwards(apps, schema_editor):
+    _move(_private_names(apps), settings.PRIVATE_MEDIA_ROOT, settings.MEDIA_ROOT)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0006_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadvideo',
+            name='video',
+            field=models.FileField(help_text='Valid video formats: mp4, mkv, wmv, 3gp, f4v, avi, mp3', storage=course.storage.PrivateMediaStorage(), upload_to='course_videos/', validators=[django.core.validators.FileExtensionValidator(['mp4', 'mkv', 'wmv', '3gp', 'f4v', 'avi', 'mp3'])]),
+        ),
+        # Videos and unfinished uploads leave the public media directory
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -1,14 +1,19 @@
+import uuid
+
 from django.conf import settings
 from django.core.validators import FileExtensionValidator
 from django.db import models
 from django.db.models import Q
-from django.db.models.signals import pre_save, post_delete, post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
-from core.models import ActivityLog, Semester
-from core.utils import unique_slug_generator
+from core.activity import log_activity
+from core.models import Semester
+from core.utils import UniqueSlugMixin
+
+from .storage import private_storage
 
 
 class ProgramManager(models.Manager):
@@ -36,12 +41,12 @@ class Program(models.Model):
 @receiver(post_save, sender=Program)
 def log_program_save(sender, instance, created, **kwargs):
     verb = "created" if created else "updated"
-    ActivityLog.objects.create(message=_(f"The program '{instance}' has been {verb}."))
+    log_activity(_(f"The program '{instance}' has been {verb}."))
 
 
 @receiver(post_delete, sender=Program)
 def log_program_delete(sender, instance, **kwargs):
-    ActivityLog.objects.create(message=_(f"The program '{instance}' has been deleted."))
+    log_activity(_(f"The program '{instance}' has been deleted."))
 
 
 class CourseManager(models.Manager):
@@ -58,7 +63,7 @@ class CourseManager(models.Manager):
         return queryset
 
 
-class Course(models.Model):
+class Course(UniqueSlugMixin, models.Model):
     slug = models.SlugField(unique=True, blank=True)
     title = models.CharField(max_length=200)
     code = models.CharField(max_length=200, unique=True)
@@ -85,21 +90,15 @@ class Course(models.Model):
         return self.semester == current_semester.semester if current_semester else False
 
 
-@receiver(pre_save, sender=Course)
-def course_pre_save_receiver(sender, instance, **kwargs):
-    if not instance.slug:
-        instance.slug = unique_slug_generator(instance)
-
-
 @receiver(post_save, sender=Course)
 def log_course_save(sender, instance, created, **kwargs):
     verb = "created" if created else "updated"
-    ActivityLog.objects.create(message=_(f"The course '{instance}' has been {verb}."))
+    log_activity(_(f"The course '{instance}' has been {verb}."))
 
 
 @receiver(post_delete, sender=Course)
 def log_course_delete(sender, instance, **kwargs):
-    ActivityLog.objects.create(message=_(f"The course '{instance}' has been deleted."))
+    log_activity(_(f"The course '{instance}' has been deleted."))
 
 
 class CourseAllocation(models.Model):
@@ -120,46 +119,6 @@ class CourseAllocation(models.Model):
         return reverse("edit_allocated_course", kwargs={"pk": self.pk})
 
 
-# Signal to automatically sync CourseOfferings when CourseAllocation changes
-@receiver([post_save, post_delete], sender=CourseAllocation)
-def sync_course_offerings_on_allocation_change(sender, instance, **kwargs):
-    """Automatically sync CourseOfferings when CourseAllocation changes."""
-    from core.models import CourseOffering, Batch
-    
-    # Get the lecturer
-    lecturer = instance.lecturer
-    
-    # Get current CourseAllocation courses
-    allocation = CourseAllocation.objects.filter(lecturer=lecturer).first()
-    if not allocation:
-        # If no allocation, remove all CourseOfferings for this lecturer
-        CourseOffering.objects.filter(lecturer=lecturer).delete()
-        return
-    
-    # Get batch (assuming single batch for now)
-    batch = Batch.objects.first()
-    if not batch:
-        return
-    
-    # Get courses from allocation
-    allocation_courses = list(allocation.courses.all())
-    
-    # Remove old CourseOfferings
-    CourseOffering.objects.filter(lecturer=lecturer).delete()
-    
-    # Create new CourseOfferings
-    for course in allocation_courses:
-        CourseOffering.objects.get_or_create(
-            course=course,
-            lecturer=lecturer,
-            batch=batch,
-            defaults={
-                'program': batch.program,
-                'lectures_per_week': 3
-            }
-        )
-
-
 class Upload(models.Model):
     title = models.CharField(max_length=100)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
@@ -220,24 +179,25 @@ def log_upload_save(sender, instance, created, **kwargs):
         message = _(
             f"The file '{instance.title}' of the course '{instance.course}' has been updated."
         )
-    ActivityLog.objects.create(message=message)
+    log_activity(message)
 
 
 @receiver(post_delete, sender=Upload)
 def log_upload_delete(sender, instance, **kwargs):
-    ActivityLog.objects.create(
-        message=_(
+    log_activity(
+        _(
             f"The file '{instance.title}' of the course '{instance.course}' has been deleted."
         )
     )
 
 
-class UploadVideo(models.Model):
+class UploadVideo(UniqueSlugMixin, models.Model):
     title = models.CharField(max_length=100)
     slug = models.SlugField(unique=True, blank=True)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     video = models.FileField(
         upload_to="course_videos/",
+        storage=private_storage,
         help_text=_("Valid video formats: mp4, mkv, wmv, 3gp, f4v, avi, mp3"),
         validators=[
             FileExtensionValidator(["mp4", "mkv", "wmv", "3gp", "f4v", "avi", "mp3"])
@@ -259,12 +219,6 @@ class UploadVideo(models.Model):
         super().delete(*args, **kwargs)
 
 
-@receiver(pre_save, sender=UploadVideo)
-def video_pre_save_receiver(sender, instance, **kwargs):
-    if not instance.slug:
-        instance.slug = unique_slug_generator(instance)
-
-
 @receiver(post_save, sender=UploadVideo)
 def log_uploadvideo_save(sender, instance, created, **kwargs):
     if created:
@@ -275,18 +229,57 @@ def log_uploadvideo_save(sender, instance, created, **kwargs):
         message = _(
             f"The video '{instance.title}' of the course '{instance.course}' has been updated."
         )
-    ActivityLog.objects.create(message=message)
+    log_activity(message)
 
 
 @receiver(post_delete, sender=UploadVideo)
 def log_uploadvideo_delete(sender, instance, **kwargs):
-    ActivityLog.objects.create(
-        message=_(
+    log_activity(
+        _(
             f"The video '{instance.title}' of the course '{instance.course}' has been deleted."
         )
     )
 
 
+class ChunkedUpload(models.Model):
+    """
+    A course file or video sent in pieces (see ``course.chunked_upload``).
+
+    Chunks are written into ``part_name`` in private storage; once ``offset``
+    reaches ``size`` the part file becomes an ``Upload`` / ``UploadVideo``.
+    """
+
+    FILE = "file"
+    VIDEO = "video"
+    KIND_CHOICES = ((FILE, _("File")), (VIDEO, _("Video")))
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    title = models.CharField(max_length=100)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+    @property
+    def part_name(self):
+        return f"chunked_uploads/{self.pk}.part"
+
+    @property
+    def is_complete(self):
+        return self.offset == self.size
+
+    def delete(self, *args, **kwargs):
+        private_storage.delete(self.part_name)
+        super().delete(*args, **kwargs)
+
+
 class CourseOffer(models.Model):
     """NOTE: Only department head can offer semester courses"""
 
@@ -0,0 +1,31 @@
+"""
+Storage for course files that must not be public.
+
+``PrivateMediaStorage`` keeps files under ``PRIVATE_MEDIA_ROOT``, outside
+``MEDIA_ROOT``, so neither ``static(MEDIA_URL)`` nor a front server mapped
+to the media directory can hand them out.  They have no URL; views serve
+them after checking access (``course.streaming``).
+"""
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+
+@deconstructible
+class PrivateMediaStorage(FileSystemStorage):
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.PRIVATE_MEDIA_ROOT)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == "PRIVATE_MEDIA_ROOT":
+            self.__dict__.pop("base_location", None)
+            self.__dict__.pop("location", None)
+
+    def url(self, name):
+        return None
+
+
+private_storage = PrivateMediaStorage()
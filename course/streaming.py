@@ -0,0 +1,167 @@
+"""
+Byte-range delivery of uploaded files (course videos).
+
+``serve_file`` answers a request for a ``FieldFile`` the way a static file
+server would: ``ETag`` / ``Last-Modified`` validators, ``304`` / ``412``
+for conditional requests, and ``206 Partial Content`` for a single
+``Range`` (``If-Range`` honoured), so players can seek without fetching
+the file from the start.  The body is a ``FileResponse`` over the open
+file positioned at the range start; the WSGI server's ``file_wrapper``
+(``os.sendfile`` under gunicorn) streams at most ``Content-Length`` bytes
+from there.
+
+When ``VIDEO_SENDFILE_HEADER`` is set the bytes are not sent by Django at
+all: the response only carries ``X-Accel-Redirect`` (nginx, an internal
+location under ``VIDEO_SENDFILE_PREFIX``) or ``X-Sendfile`` (Apache,
+lighttpd; the file's path) and the front proxy serves the file, ranges
+included.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Return the ``(first, last)`` byte positions asked for by ``header``.
+
+    Returns ``None`` when the whole file should be sent: no header, a
+    malformed one or several ranges (which would need a multipart body).
+    Raises ``RangeNotSatisfiable`` when the range lies outside the file.
+    """
+    match = RANGE_RE.match(header.replace(" ", "")) if header else None
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length or not size:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable
+    return first, min(int(last or size - 1), size - 1)
+
+
+def _if_range_passes(if_range, etag, last_modified):
+    if not if_range:
+        return True
+    if if_range.startswith(("W/", '"')):
+        # If-Range requires a strong comparison
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+class _RangeFile:
+    """Read at most ``length`` bytes of ``file`` from its current position."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        # Lets the WSGI server sendfile() from the current offset
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _validators(fieldfile):
+    size = fieldfile.size
+    try:
+        modified = fieldfile.storage.get_modified_time(fieldfile.name)
+    except NotImplementedError:
+        return size, None, None
+    last_modified = int(modified.timestamp())
+    etag = quote_etag(f"{last_modified:x}-{size:x}")
+    return size, etag, last_modified
+
+
+def _sendfile_response(fieldfile, content_type):
+    response = HttpResponse(content_type=content_type)
+    header = settings.VIDEO_SENDFILE_HEADER
+    if header.lower() == "x-accel-redirect":
+        prefix = settings.VIDEO_SENDFILE_PREFIX.rstrip("/")
+        response[header] = f"{prefix}/{quote(fieldfile.name)}"
+    else:
+        response[header] = fieldfile.path
+    return response
+
+
+def serve_file(request, fieldfile, content_type=None):
+    """Serve ``fieldfile`` with Range and conditional request support."""
+    content_type = (
+        content_type
+        or mimetypes.guess_type(fieldfile.name)[0]
+        or "application/octet-stream"
+    )
+    size, etag, last_modified = _validators(fieldfile)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        if settings.VIDEO_SENDFILE_HEADER:
+            response = _sendfile_response(fieldfile, content_type)
+        else:
+            response = _stream(
+                request, fieldfile, size, etag, last_modified, content_type
+            )
+    if etag:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    response["Accept-Ranges"] = "bytes"
+    response["Cache-Control"] = "private, no-transform"
+    return response
+
+
+def _stream(request, fieldfile, size, etag, last_modified, content_type):
+    byte_range = None
+    if _if_range_passes(request.META.get("HTTP_IF_RANGE"), etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    file = fieldfile.storage.open(fieldfile.name, "rb")
+    first, last = byte_range or (0, size - 1)
+    if first:
+        file.seek(first)
+    response = FileResponse(
+        _RangeFile(file, last - first + 1),
+        content_type=content_type,
+        filename=os.path.basename(fieldfile.name),
+    )
+    response.block_size = STREAM_BLOCK_SIZE
+    response["Content-Length"] = last - first + 1
+    if byte_range:
+        response.status_code = 206
+        response["Content-Range"] = f"bytes {first}-{last}/{size}"
+    return response
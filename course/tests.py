@@ -1,3 +1,318 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from core.models import Batch, CourseOffering, StudentEnrollment
+from course.models import (
+    ChunkedUpload,
+    Course,
+    CourseAllocation,
+    Program,
+    Upload,
+    UploadVideo,
+)
+from course.storage import private_storage
+from course.streaming import RangeNotSatisfiable, parse_range
+
+VIDEO_BYTES = bytes(range(256)) * 40  # 10240 bytes
+
+
+class ParseRangeTests(TestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range("bytes=900-", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=990-2000", 1000), (990, 999))
+        self.assertEqual(parse_range("bytes=-5000", 1000), (0, 999))
+
+    def test_whole_file(self):
+        for header in (None, "", "bytes=-", "bytes=5-1", "bytes=0-1,5-9", "items=0-1"):
+            self.assertIsNone(parse_range(header, 1000))
+
+    def test_unsatisfiable(self):
+        for header in ("bytes=1000-", "bytes=-0"):
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, 1000)
+
+
+class VideoStreamTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(
+            MEDIA_ROOT=os.path.join(media_root, "public"),
+            PRIVATE_MEDIA_ROOT=os.path.join(media_root, "private"),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.program = Program.objects.create(title="Program")
+        self.course = Course.objects.create(
+            title="Course",
+            code="C-1",
+            program=self.program,
+            level=settings.BACHELOR_DEGREE,
+            semester=settings.FIRST,
+        )
+        self.video = UploadVideo.objects.create(
+            title="Lecture 1",
+            course=self.course,
+            video=SimpleUploadedFile("lecture.mp4", VIDEO_BYTES),
+        )
+        self.url = reverse(
+            "video_stream",
+            kwargs={"slug": self.course.slug, "video_slug": self.video.slug},
+        )
+        self.lecturer = User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True
+        )
+        allocation = CourseAllocation.objects.create(lecturer=self.lecturer)
+        allocation.courses.add(self.course)
+        self.client.force_login(self.lecturer)
+
+    def _content(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "video/mp4")
+        self.assertEqual(response["Content-Length"], str(len(VIDEO_BYTES)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(self._content(response), VIDEO_BYTES)
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(VIDEO_BYTES)}")
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(self._content(response), VIDEO_BYTES[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-10")
+        self.assertEqual(self._content(response), VIDEO_BYTES[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=99999-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(VIDEO_BYTES)}")
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=etag
+        )
+        self.assertEqual(response.status_code, 206)
+        # A stale validator gets the whole, current file
+        response = self.client.get(
+            self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._content(response), VIDEO_BYTES)
+
+    @override_settings(
+        VIDEO_SENDFILE_HEADER="X-Accel-Redirect",
+        VIDEO_SENDFILE_PREFIX="/protected-media/",
+    )
+    def test_proxy_hand_off(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-9")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/protected-media/{self.video.video.name}"
+        )
+        self.assertEqual(response.content, b"")
+
+    def test_video_is_not_public(self):
+        self.assertIsNone(self.video.video.url)
+        self.assertTrue(
+            self.video.video.path.startswith(settings.PRIVATE_MEDIA_ROOT + os.sep)
+        )
+        self.assertFalse(os.path.exists(settings.MEDIA_ROOT))
+
+    def test_course_access(self):
+        student = User.objects.create_user(
+            username="student", password="password", is_student=True
+        )
+        self.client.force_login(student)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        offering = CourseOffering.objects.create(
+            program=self.program,
+            course=self.course,
+            lecturer=self.lecturer,
+            batch=Batch.objects.create(title="Batch", program=self.program),
+        )
+        StudentEnrollment.objects.create(student=student, course_offering=offering)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        other = User.objects.create_user(
+            username="other", password="password", is_lecturer=True
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_SIZE=4096)
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(
+            MEDIA_ROOT=os.path.join(media_root, "public"),
+            PRIVATE_MEDIA_ROOT=os.path.join(media_root, "private"),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.course = Course.objects.create(
+            title="Course",
+            code="C-1",
+            program=Program.objects.create(title="Program"),
+            level=settings.BACHELOR_DEGREE,
+            semester=settings.FIRST,
+        )
+        self.lecturer = User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True
+        )
+        self.client.force_login(self.lecturer)
+        self.start_url = reverse(
+            "chunked_upload_start", kwargs={"slug": self.course.slug}
+        )
+
+    def _start(self, kind="video", filename="lecture.mp4", size=len(VIDEO_BYTES)):
+        return self.client.post(
+            self.start_url,
+            {"kind": kind, "title": "Lecture 1", "filename": filename, "size": size},
+        )
+
+    def _put(self, url, first, data, checksum=None):
+        headers = {
+            "HTTP_CONTENT_RANGE": (
+                f"bytes {first}-{first + len(data) - 1}/{len(VIDEO_BYTES)}"
+            )
+        }
+        if checksum is not None:
+            headers["HTTP_X_CHUNK_SHA256"] = checksum
+        return self.client.put(
+            url, data, content_type="application/octet-stream", **headers
+        )
+
+    def test_start_validates_the_form(self):
+        response = self._start(filename="lecture.exe")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("video", response.json()["errors"])
+
+        for size in (0, -5, "x", 4 * 1024**3 + 1):
+            response = self._start(kind="file", filename="notes.pdf", size=size)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("file size", response.json()["error"])
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_resumable_upload(self):
+        started = self._start().json()
+        url = started["url"]
+        self.assertEqual((started["offset"], started["chunk_size"]), (0, 4096))
+
+        chunks = [
+            (first, VIDEO_BYTES[first : first + 4096])
+            for first in range(0, len(VIDEO_BYTES), 4096)
+        ]
+        first, data = chunks[0]
+        response = self._put(url, first, data, hashlib.sha256(data).hexdigest())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["offset"], 4096)
+
+        # A corrupted chunk is refused and the offset stays put
+        first, data = chunks[1]
+        response = self._put(url, first, data, hashlib.sha256(b"other").hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(url).json()["offset"], 4096)
+
+        # Chunks must follow on from the offset
+        response = self._put(url, *chunks[2])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 4096)
+
+        response = self.client.post(url + "complete/")
+        self.assertEqual(response.status_code, 409)
+
+        for first, data in chunks[1:]:
+            self.assertEqual(self._put(url, first, data).status_code, 200)
+        upload = ChunkedUpload.objects.get()
+        part_path = private_storage.path(upload.part_name)
+
+        response = self.client.post(url + "complete/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["redirect"],
+            reverse("course_detail", kwargs={"slug": self.course.slug}),
+        )
+        video = UploadVideo.objects.get()
+        self.assertEqual((video.title, video.course), ("Lecture 1", self.course))
+        with video.video.open("rb") as f:
+            self.assertEqual(f.read(), VIDEO_BYTES)
+        # The part file was moved into place, not copied
+        self.assertFalse(os.path.exists(part_path))
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_repeated_complete(self):
+        url = self._start(kind="file", filename="notes.pdf", size=100).json()["url"]
+        self._put_whole(url)
+        self.assertEqual(self.client.post(url + "complete/").status_code, 200)
+        self.assertEqual(self.client.post(url + "complete/").status_code, 404)
+        self.assertEqual(Upload.objects.count(), 1)
+
+    def test_complete_without_part_file(self):
+        url = self._start(kind="file", filename="notes.pdf", size=100).json()["url"]
+        self._put_whole(url)
+        private_storage.delete(ChunkedUpload.objects.get().part_name)
+        response = self.client.post(url + "complete/")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertFalse(Upload.objects.exists())
+
+    def _put_whole(self, url):
+        return self.client.put(
+            url,
+            VIDEO_BYTES[:100],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE="bytes 0-99/100",
+        )
+
+    def test_file_upload_in_one_chunk(self):
+        url = self._start(kind="file", filename="notes.pdf", size=100).json()["url"]
+        self._put_whole(url)
+        self.assertEqual(self.client.post(url + "complete/").status_code, 200)
+        self.assertEqual(Upload.objects.get().file.size, 100)
+
+    def test_uploads_are_private(self):
+        url = self._start().json()["url"]
+        other = User.objects.create_user(
+            username="other", password="password", is_lecturer=True
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_prune_abandoned_uploads(self):
+        self._start()
+        upload = ChunkedUpload.objects.get()
+        part_name = upload.part_name
+        call_command("prune_chunked_uploads", stdout=open(os.devnull, "w"))
+        self.assertTrue(ChunkedUpload.objects.exists())
+
+        ChunkedUpload.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        call_command("prune_chunked_uploads", stdout=open(os.devnull, "w"))
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertFalse(private_storage.exists(part_name))
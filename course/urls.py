@@ -60,6 +60,11 @@ urlpatterns = [
         views.handle_video_single,
         name="video_single",
     ),
+    path(
+        "course/<slug>/video_tutorials/<video_slug>/stream/",
+        views.handle_video_stream,
+        name="video_stream",
+    ),
     path(
         "course/<slug>/video_tutorials/<video_slug>/edit/",
         views.handle_video_edit,
@@ -70,6 +75,22 @@ urlpatterns = [
         views.handle_video_delete,
         name="upload_video_delete",
     ),
+    # Chunked uploads urls
+    path(
+        "course/<slug>/uploads/",
+        views.chunked_upload_start,
+        name="chunked_upload_start",
+    ),
+    path(
+        "course/<slug>/uploads/<uuid:upload_id>/",
+        views.chunked_upload_detail,
+        name="chunked_upload_detail",
+    ),
+    path(
+        "course/<slug>/uploads/<uuid:upload_id>/complete/",
+        views.chunked_upload_complete,
+        name="chunked_upload_complete",
+    ),
     # course registration
     path("course/registration/", views.course_registration, name="course_registration"),
     path("course/drop/", views.course_drop, name="course_drop"),
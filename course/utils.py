@@ -0,0 +1,25 @@
+from core.models import CourseOffering, StudentEnrollment
+from result.models import TakenCourse
+
+from .models import CourseAllocation
+
+
+def can_view_course_material(user, course):
+    """Whether ``user`` teaches or takes ``course`` (admins always can)."""
+    if not user.is_active:
+        return False
+    if user.is_superuser:
+        return True
+    if user.is_lecturer:
+        return (
+            CourseAllocation.objects.filter(lecturer=user, courses=course).exists()
+            or CourseOffering.objects.filter(lecturer=user, course=course).exists()
+        )
+    if user.is_student:
+        return (
+            TakenCourse.objects.filter(student__student=user, course=course).exists()
+            or StudentEnrollment.objects.filter(
+                student=user, course_offering__course=course, is_active=True
+            ).exists()
+        )
+    return False
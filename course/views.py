@@ -1,16 +1,29 @@
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Sum
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_http_methods, require_POST
 from django.views.generic import CreateView
 from django_filters.views import FilterView
 
 from accounts.decorators import lecturer_required, student_required
 from accounts.models import Student
 from core.models import Semester
+from course.chunked_upload import (
+    AssembledFile,
+    ChunkRejected,
+    OffsetConflict,
+    PendingFile,
+    start_upload,
+    write_chunk,
+)
 from course.filters import CourseAllocationFilter, ProgramFilter
 from course.forms import (
     CourseAddForm,
@@ -21,12 +34,15 @@ from course.forms import (
     UploadFormVideo,
 )
 from course.models import (
+    ChunkedUpload,
     Course,
     CourseAllocation,
     Program,
     Upload,
     UploadVideo,
 )
+from course.streaming import serve_file
+from course.utils import can_view_course_material
 from result.models import TakenCourse
 
 
@@ -203,8 +219,11 @@ class CourseAllocationFormView(CreateView):
         lecturer = form.cleaned_data["lecturer"]
         selected_courses = form.cleaned_data["courses"]
         session = form.cleaned_data.get("session")
-        allocation, created = CourseAllocation.objects.get_or_create(lecturer=lecturer, session=session)
-        allocation.courses.set(selected_courses)
+        with transaction.atomic():
+            allocation, created = CourseAllocation.objects.get_or_create(
+                lecturer=lecturer, session=session
+            )
+            allocation.courses.set(selected_courses)
         messages.success(
             self.request, f"Courses allocated to {lecturer.get_full_name} successfully."
         )
@@ -244,7 +263,8 @@ def edit_allocated_course(request, pk):
     if request.method == "POST":
         form = EditCourseAllocationForm(request.POST, instance=allocation)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             messages.success(request, "Course allocation has been updated.")
             return redirect("course_allocation_view")
         messages.error(request, "Correct the error(s) below.")
@@ -362,6 +382,18 @@ def handle_video_single(request, slug, video_slug):
     )
 
 
+@login_required
+def handle_video_stream(request, slug, video_slug):
+    video = get_object_or_404(
+        UploadVideo.objects.select_related("course"),
+        slug=video_slug,
+        course__slug=slug,
+    )
+    if not can_view_course_material(request.user, video.course):
+        raise PermissionDenied
+    return serve_file(request, video.video)
+
+
 @login_required
 @lecturer_required
 def handle_video_edit(request, slug, video_slug):
@@ -393,6 +425,129 @@ def handle_video_delete(request, slug, video_slug):
     return redirect("course_detail", slug=slug)
 
 
+# ########################################################
+# Chunked Upload Views
+# ########################################################
+
+
+CHUNKED_UPLOAD_FORMS = {
+    ChunkedUpload.FILE: (UploadFormFile, "file"),
+    ChunkedUpload.VIDEO: (UploadFormVideo, "video"),
+}
+
+
+@login_required
+@lecturer_required
+@require_POST
+def chunked_upload_start(request, slug):
+    course = get_object_or_404(Course, slug=slug)
+    kind = request.POST.get("kind")
+    if kind not in CHUNKED_UPLOAD_FORMS:
+        return JsonResponse({"error": "Unknown upload kind."}, status=400)
+    form_class, field = CHUNKED_UPLOAD_FORMS[kind]
+    try:
+        size = int(request.POST.get("size", ""))
+    except ValueError:
+        size = 0
+    if not 0 < size <= settings.CHUNKED_UPLOAD_MAX_SIZE:
+        error = (
+            f"The file size must be between 1 and "
+            f"{settings.CHUNKED_UPLOAD_MAX_SIZE} bytes."
+        )
+        return JsonResponse({"error": error}, status=400)
+    # Everything but the bytes is validated before the first chunk is sent
+    form = form_class(
+        request.POST, {field: PendingFile(request.POST.get("filename", ""), size)}
+    )
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors.get_json_data()}, status=400)
+    upload = start_upload(
+        request.user,
+        course,
+        kind,
+        form.cleaned_data["title"],
+        form.cleaned_data[field].name,
+        size,
+    )
+    return JsonResponse(
+        {
+            "id": str(upload.pk),
+            "url": reverse(
+                "chunked_upload_detail",
+                kwargs={"slug": slug, "upload_id": upload.pk},
+            ),
+            "offset": upload.offset,
+            "chunk_size": settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        },
+        status=201,
+    )
+
+
+@login_required
+@lecturer_required
+@require_http_methods(["GET", "PUT", "DELETE"])
+def chunked_upload_detail(request, slug, upload_id):
+    upload = get_object_or_404(
+        ChunkedUpload, pk=upload_id, user=request.user, course__slug=slug
+    )
+    if request.method == "DELETE":
+        upload.delete()
+        return HttpResponse(status=204)
+    if request.method == "PUT":
+        try:
+            checksum = write_chunk(
+                upload,
+                request.META.get("HTTP_CONTENT_RANGE"),
+                request,
+                request.META.get("HTTP_X_CHUNK_SHA256", ""),
+            )
+        except OffsetConflict as e:
+            return JsonResponse({"error": str(e), "offset": upload.offset}, status=409)
+        except ChunkRejected as e:
+            return JsonResponse({"error": str(e), "offset": upload.offset}, status=400)
+        return JsonResponse(
+            {"offset": upload.offset, "size": upload.size, "sha256": checksum}
+        )
+    return JsonResponse({"offset": upload.offset, "size": upload.size})
+
+
+@login_required
+@lecturer_required
+@require_POST
+@transaction.atomic
+def chunked_upload_complete(request, slug, upload_id):
+    # A repeated request waits for the lock, then finds the upload gone
+    upload = get_object_or_404(
+        ChunkedUpload.objects.select_for_update(),
+        pk=upload_id,
+        user=request.user,
+        course__slug=slug,
+    )
+    if not upload.is_complete:
+        return JsonResponse(
+            {"error": "The upload is not complete.", "offset": upload.offset},
+            status=409,
+        )
+    form_class, field = CHUNKED_UPLOAD_FORMS[upload.kind]
+    try:
+        assembled = AssembledFile(upload)
+    except FileNotFoundError:
+        upload.delete()
+        return JsonResponse({"error": "The uploaded data is gone."}, status=404)
+    try:
+        form = form_class({"title": upload.title}, {field: assembled})
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors.get_json_data()}, status=400)
+        instance = form.save(commit=False)
+        instance.course = upload.course
+        instance.save()
+    finally:
+        assembled.close()
+    upload.delete()
+    messages.success(request, f"{instance.title} has been uploaded.")
+    return JsonResponse({"redirect": reverse("course_detail", kwargs={"slug": slug})})
+
+
 # ########################################################
 # Course Registration Views
 # ########################################################
@@ -1,6 +1,11 @@
 from django import forms
 from django.contrib import admin
 from django.contrib.admin.widgets import FilteredSelectMultiple
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from modeltranslation.admin import TranslationAdmin
 from modeltranslation.forms import TranslationModelForm
@@ -14,6 +19,7 @@ from .models import (
     EssayQuestion,
     Sitting,
 )
+from .analytics import get_item_analysis
 
 
 class ChoiceInline(admin.TabularInline):
@@ -48,19 +54,46 @@ class QuizAdminForm(TranslationModelForm):
 
 
 class QuizAdmin(TranslationAdmin):
-    pass
+    list_display = ("title", "course", "category", "item_analysis_link")
     # form = QuizAdminForm
     # fields = (
     #     "title",
     #     "description",
     # )
-    # list_display = ("title",)
     # # list_filter = ('category',)
     # search_fields = (
     #     "description",
     #     "category",
     # )
 
+    def get_urls(self):
+        urls = [
+            path(
+                "<int:pk>/item-analysis/",
+                self.admin_site.admin_view(self.item_analysis_view),
+                name="quiz_quiz_item_analysis",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    @admin.display(description=_("Item analysis"))
+    def item_analysis_link(self, obj):
+        url = reverse("admin:quiz_quiz_item_analysis", args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, _("View"))
+
+    def item_analysis_view(self, request, pk):
+        quiz = get_object_or_404(Quiz, pk=pk)
+        if not self.has_view_permission(request, quiz):
+            raise PermissionDenied
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "original": quiz,
+            "title": _("Item analysis: %s") % quiz.title,
+            "report": get_item_analysis(quiz, refresh="refresh" in request.GET),
+        }
+        return TemplateResponse(request, "admin/quiz/quiz/item_analysis.html", context)
+
 
 class MCQuestionAdmin(TranslationAdmin):
     list_display = ("content",)
@@ -76,10 +109,7 @@ class MCQuestionAdmin(TranslationAdmin):
 
 
 class ProgressAdmin(admin.ModelAdmin):
-    search_fields = (
-        "user",
-        "score",
-    )
+    search_fields = ("user__username",)
 
 
 class EssayQuestionAdmin(admin.ModelAdmin):
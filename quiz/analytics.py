@@ -0,0 +1,119 @@
+"""
+Item analysis for quizzes.
+
+For every question of a quiz, over all completed sittings:
+
+* ``correct_rate`` – share of the answers that were correct (difficulty);
+* ``discrimination`` – point-biserial correlation between getting the
+  question right and the score on the *other* questions, so strong
+  students answering it correctly pushes it towards 1;
+* ``choices`` – how often each choice of a multiple choice question was
+  picked.
+
+Answers are streamed once from ``SittingAnswer`` into index arrays; the
+statistics are then computed column-wise with NumPy.  Reports hold the
+translated question and choice texts, so they are cached under
+``Quiz.version`` and the active language for
+``QUIZ_ANALYTICS_CACHE_TIMEOUT`` seconds.
+"""
+from array import array
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import get_language
+
+from .models import SittingAnswer
+from .snapshot import get_quiz_snapshot
+
+ANALYTICS_CACHE_KEY = "quiz:analytics:%s:%s:%s"
+STREAM_CHUNK_SIZE = 5000
+
+
+def _round(value, digits=3):
+    return None if value != value else round(float(value), digits)  # NaN -> None
+
+
+def compute_item_analysis(quiz):
+    """Build the item analysis report of ``quiz`` from the database."""
+    import numpy as np
+
+    snapshot = get_quiz_snapshot(quiz)
+    columns = {question_id: i for i, question_id in enumerate(snapshot.questions)}
+
+    rows = {}
+    row_idx, col_idx, correct_flags = array("l"), array("l"), array("b")
+    picks = Counter()
+    answers = (
+        SittingAnswer.objects.filter(
+            sitting__quiz=quiz, sitting__complete=True, question_id__in=columns
+        )
+        .values_list("sitting_id", "question_id", "answer", "is_correct")
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    for sitting_id, question_id, answer, is_correct in answers:
+        row_idx.append(rows.setdefault(sitting_id, len(rows)))
+        col_idx.append(columns[question_id])
+        correct_flags.append(is_correct)
+        picks[question_id, answer] += 1
+
+    n_sittings, n_questions = len(rows), len(columns)
+    answered = np.zeros((n_sittings, n_questions), dtype=bool)
+    correct = np.zeros((n_sittings, n_questions), dtype=np.float64)
+    if n_sittings:
+        r = np.frombuffer(row_idx, dtype=row_idx.typecode)
+        c = np.frombuffer(col_idx, dtype=col_idx.typecode)
+        answered[r, c] = True
+        correct[r, c] = np.frombuffer(correct_flags, dtype=np.int8)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n_answered = answered.sum(axis=0)
+        n_correct = correct.sum(axis=0)
+        p = n_correct / n_answered
+        # Score on the other questions, only where the question was answered
+        rest = (correct.sum(axis=1)[:, None] - correct) * answered
+        mean_right = (rest * correct).sum(axis=0) / n_correct
+        mean_wrong = (rest * (answered & (correct == 0))).sum(axis=0) / (
+            n_answered - n_correct
+        )
+        mean_rest = rest.sum(axis=0) / n_answered
+        std_rest = np.sqrt((rest**2).sum(axis=0) / n_answered - mean_rest**2)
+        discrimination = (mean_right - mean_wrong) / std_rest * np.sqrt(p * (1 - p))
+
+    questions = []
+    for question_id, i in columns.items():
+        question = snapshot.questions[question_id]
+        questions.append(
+            {
+                "id": question_id,
+                "content": question.content,
+                "answered": int(n_answered[i]),
+                "correct_rate": _round(p[i]),
+                "discrimination": _round(discrimination[i]),
+                "choices": [
+                    {
+                        "text": choice.choice_text,
+                        "correct": choice.correct,
+                        "count": picks[question_id, str(choice.id)],
+                    }
+                    for choice in question.choices
+                ],
+            }
+        )
+    totals = correct.sum(axis=1)
+    return {
+        "sittings": n_sittings,
+        "mean_score": _round(totals.mean()) if n_sittings else None,
+        "max_score": n_questions,
+        "questions": questions,
+    }
+
+
+def get_item_analysis(quiz, refresh=False):
+    """Return the cached item analysis report of ``quiz`` in the active language."""
+    key = ANALYTICS_CACHE_KEY % (quiz.pk, quiz.version, get_language())
+    report = None if refresh else cache.get(key)
+    if report is None:
+        report = compute_item_analysis(quiz)
+        cache.set(key, report, getattr(settings, "QUIZ_ANALYTICS_CACHE_TIMEOUT", 900))
+    return report
@@ -0,0 +1,128 @@
+# Generated by Django 4.0.8 on 2026-10-19 01:17
+
+import json
+import re
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _ids(value):
+    return [int(q) for q in (value or "").split(",") if q]
+
+
+def forwards(apps, schema_editor):
+    Sitting = apps.get_model("quiz", "Sitting")
+    SittingAnswer = apps.get_model("quiz", "SittingAnswer")
+    Question = apps.get_model("quiz", "Question")
+    existing = set(Question.objects.values_list("id", flat=True))
+
+    answers = []
+    sittings = []
+    for sitting in Sitting.objects.iterator():
+        order = _ids(sitting.question_order)
+        remaining = set(_ids(sitting.question_list))
+        incorrect = set(_ids(sitting.incorrect_questions))
+        try:
+            user_answers = json.loads(sitting.user_answers or "{}")
+        except ValueError:
+            user_answers = {}
+
+        for position, question_id in enumerate(order):
+            answered = (
+                question_id not in remaining
+                or str(question_id) in user_answers
+                or question_id in incorrect
+            )
+            if answered and question_id in existing:
+                answers.append(
+                    SittingAnswer(
+                        sitting_id=sitting.pk,
+                        question_id=question_id,
+                        position=position,
+                        answer=str(user_answers.get(str(question_id), "")),
+                        is_correct=question_id not in incorrect,
+                    )
+                )
+        sitting.cursor = len(order) - len(remaining)
+        sittings.append(sitting)
+
+    SittingAnswer.objects.bulk_create(answers, batch_size=1000)
+    Sitting.objects.bulk_update(sittings, ["cursor"], batch_size=1000)
+
+
+def backwards(apps, schema_editor):
+    Sitting = apps.get_model("quiz", "Sitting")
+    SittingAnswer = apps.get_model("quiz", "SittingAnswer")
+
+    sittings = []
+    for sitting in Sitting.objects.iterator():
+        order = _ids(sitting.question_order)
+        rows = SittingAnswer.objects.filter(sitting_id=sitting.pk)
+        sitting.question_list = "".join(f"{q}," for q in order[sitting.cursor :])
+        sitting.incorrect_questions = "".join(
+            f"{row.question_id}," for row in rows if not row.is_correct
+        )
+        sitting.user_answers = json.dumps(
+            {str(row.question_id): row.answer for row in rows}
+        )
+        sittings.append(sitting)
+    Sitting.objects.bulk_update(
+        sittings,
+        ["question_list", "incorrect_questions", "user_answers"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_alter_essayquestion_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitting',
+            name='cursor',
+            field=models.PositiveIntegerField(default=0, verbose_name='Questions answered'),
+        ),
+        migrations.CreateModel(
+            name='SittingAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='Position')),
+                ('answer', models.TextField(blank=True, verbose_name='Answer')),
+                ('is_correct', models.BooleanField(default=False, verbose_name='Correct')),
+                ('answered_at', models.DateTimeField(auto_now_add=True, verbose_name='Answered')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.question', verbose_name='Question')),
+                ('sitting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='quiz.sitting', verbose_name='Sitting')),
+            ],
+            options={
+                'verbose_name': 'Sitting answer',
+                'verbose_name_plural': 'Sitting answers',
+                'ordering': ['sitting', 'position'],
+                'unique_together': {('sitting', 'question')},
+            },
+        ),
+        migrations.RunPython(forwards, backwards),
+        migrations.RemoveField(
+            model_name='sitting',
+            name='incorrect_questions',
+        ),
+        # Lets the reverse re-add the column on a table with rows; backwards()
+        # fills it in afterwards
+        migrations.AlterField(
+            model_name='sitting',
+            name='question_list',
+            field=models.CharField(default='', max_length=1024, validators=[django.core.validators.RegexValidator(re.compile('^\\d+(?:,\\d+)*\\Z'), code='invalid', message='Enter only digits separated by commas.')], verbose_name='Question List'),
+        ),
+        migrations.RemoveField(
+            model_name='sitting',
+            name='question_list',
+        ),
+        migrations.RemoveField(
+            model_name='sitting',
+            name='user_answers',
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.0.8 on 2026-10-19 01:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def forwards(apps, schema_editor):
+    # The old Progress.score string cannot be carried over: it was keyed by
+    # str(question.quiz), the many-to-many manager's repr ("quiz.Quiz.None"),
+    # so it never recorded which quiz a score belonged to and is discarded.
+    # The totals are rebuilt from the answers of the sittings still stored;
+    # sittings deleted on completion (quizzes that are not exam papers) are
+    # gone, and their scores with them.
+    ProgressScore = apps.get_model("quiz", "ProgressScore")
+    SittingAnswer = apps.get_model("quiz", "SittingAnswer")
+
+    rows = (
+        SittingAnswer.objects.values("sitting__user_id", "sitting__quiz_id")
+        .annotate(score=Count("pk", filter=Q(is_correct=True)), possible=Count("pk"))
+        .order_by()
+    )
+    ProgressScore.objects.bulk_create(
+        (
+            ProgressScore(
+                user_id=row["sitting__user_id"],
+                quiz_id=row["sitting__quiz_id"],
+                score=row["score"],
+                possible=row["possible"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quiz', '0005_sitting_answers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField(default=0, verbose_name='Score')),
+                ('possible', models.PositiveIntegerField(default=0, verbose_name='Possible')),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.quiz', verbose_name='Quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_scores', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Progress score',
+                'verbose_name_plural': 'Progress scores',
+                'unique_together': {('user', 'quiz')},
+            },
+        ),
+        # The old string had no usable quiz keys, so there is nothing to restore
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='progress',
+            name='score',
+        ),
+    ]
@@ -1,5 +1,4 @@
-import json
-import re
+import itertools
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured, ValidationError
@@ -7,9 +6,15 @@ from django.core.validators import (
     MaxValueValidator,
     validate_comma_separated_integer_list,
 )
-from django.db import models
-from django.db.models import Q
-from django.db.models.signals import pre_save
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
 from django.urls import reverse
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
@@ -17,7 +22,7 @@ from django.dispatch import receiver
 from model_utils.managers import InheritanceManager
 
 from course.models import Course
-from core.utils import unique_slug_generator
+from core.utils import UniqueSlugMixin
 
 CHOICE_ORDER_OPTIONS = (
     ("content", _("Content")),
@@ -25,6 +30,8 @@ CHOICE_ORDER_OPTIONS = (
     ("none", _("None")),
 )
 
+ANSWER_SHEET_CHUNK_SIZE = 200
+
 CATEGORY_OPTIONS = (
     ("assignment", _("Assignment")),
     ("exam", _("Exam")),
@@ -46,7 +53,7 @@ class QuizManager(models.Manager):
         return queryset
 
 
-class Quiz(models.Model):
+class Quiz(UniqueSlugMixin, models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     title = models.CharField(verbose_name=_("Title"), max_length=60)
     slug = models.SlugField(unique=True, blank=True)
@@ -94,6 +101,7 @@ class Quiz(models.Model):
         ),
     )
     timestamp = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     objects = QuizManager()
 
@@ -111,7 +119,13 @@ class Quiz(models.Model):
         if not (0 <= self.pass_mark <= 100):
             raise ValidationError(_("Pass mark must be between 0 and 100."))
 
+        bump = not self._state.adding and kwargs.get("update_fields") is None
+        if bump:
+            # Invalidates the cached snapshot (quiz.snapshot)
+            self.version = F("version") + 1
         super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=["version"])
 
     def get_questions(self):
         return self.question_set.all().select_subclasses()
@@ -124,15 +138,9 @@ class Quiz(models.Model):
         return reverse("quiz_index", kwargs={"slug": self.course.slug})
 
 
-@receiver(pre_save, sender=Quiz)
-def quiz_pre_save_receiver(sender, instance, **kwargs):
-    if not instance.slug:
-        instance.slug = unique_slug_generator(instance)
-
-
 class ProgressManager(models.Manager):
     def new_progress(self, user):
-        new_progress = self.create(user=user, score="")
+        new_progress = self.create(user=user)
         return new_progress
 
 
@@ -140,11 +148,6 @@ class Progress(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL, verbose_name=_("User"), on_delete=models.CASCADE
     )
-    score = models.CharField(
-        max_length=1024,
-        verbose_name=_("Score"),
-        validators=[validate_comma_separated_integer_list],
-    )
 
     objects = ProgressManager()
 
@@ -153,28 +156,31 @@ class Progress(models.Model):
         verbose_name_plural = _("User progress records")
 
     def list_all_cat_scores(self):
-        return {}  # Implement as needed
-
-    def update_score(self, question, score_to_add=0, possible_to_add=0):
+        """
+        ``{category: [correct, incorrect, percent]}`` over every quiz the
+        user has answered, computed in a single grouped query.
+        """
+        labels = dict(CATEGORY_OPTIONS)
+        rows = (
+            ProgressScore.objects.filter(user_id=self.user_id)
+            .values("quiz__category")
+            .annotate(correct=Sum("score"), possible=Sum("possible"))
+            .order_by("quiz__category")
+        )
+        scores = {}
+        for row in rows:
+            correct, possible = row["correct"], row["possible"]
+            percent = int(round(correct / possible * 100)) if possible else 0
+            category = labels.get(row["quiz__category"], _("Other"))
+            scores[category] = [correct, possible - correct, percent]
+        return scores
+
+    def update_score(self, quiz, score_to_add=0, possible_to_add=0):
         if not isinstance(score_to_add, int) or not isinstance(possible_to_add, int):
             return _("Error"), _("Invalid score values.")
-
-        to_find = re.escape(str(question.quiz)) + r",(?P<score>\d+),(?P<possible>\d+),"
-        match = re.search(to_find, self.score, re.IGNORECASE)
-
-        if match:
-            updated_score = int(match.group("score")) + abs(score_to_add)
-            updated_possible = int(match.group("possible")) + abs(possible_to_add)
-            new_score = ",".join(
-                [str(question.quiz), str(updated_score), str(updated_possible), ""]
-            )
-            self.score = self.score.replace(match.group(), new_score)
-            self.save()
-        else:
-            self.score += ",".join(
-                [str(question.quiz), str(score_to_add), str(possible_to_add), ""]
-            )
-            self.save()
+        ProgressScore.objects.add(
+            self.user_id, quiz, abs(score_to_add), abs(possible_to_add)
+        )
 
     def show_exams(self):
         if self.user.is_superuser:
@@ -185,6 +191,45 @@ class Progress(models.Model):
             )
 
 
+class ProgressScoreManager(models.Manager):
+    def add(self, user, quiz, score=0, possible=0):
+        """Atomically add to the user's running totals for ``quiz``."""
+        user_id = getattr(user, "pk", user)
+        increments = {"score": F("score") + score, "possible": F("possible") + possible}
+        if self.filter(user_id=user_id, quiz=quiz).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, quiz=quiz, score=score, possible=possible)
+        except IntegrityError:
+            # Another request created the row first
+            self.filter(user_id=user_id, quiz=quiz).update(**increments)
+
+
+class ProgressScore(models.Model):
+    """Running score of a user on one quiz, across all of their sittings."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="quiz_scores",
+        verbose_name=_("User"),
+        on_delete=models.CASCADE,
+    )
+    quiz = models.ForeignKey(Quiz, verbose_name=_("Quiz"), on_delete=models.CASCADE)
+    score = models.PositiveIntegerField(default=0, verbose_name=_("Score"))
+    possible = models.PositiveIntegerField(default=0, verbose_name=_("Possible"))
+
+    objects = ProgressScoreManager()
+
+    class Meta:
+        verbose_name = _("Progress score")
+        verbose_name_plural = _("Progress scores")
+        unique_together = [("user", "quiz")]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.quiz_id} {self.score}/{self.possible}"
+
+
 class SittingManager(models.Manager):
     def new_sitting(self, user, quiz, course):
         if quiz.random_order:
@@ -207,14 +252,40 @@ class SittingManager(models.Manager):
             quiz=quiz,
             course=course,
             question_order=questions,
-            question_list=questions,
-            incorrect_questions="",
             current_score=0,
             complete=False,
-            user_answers="{}",
         )
         return new_sitting
 
+    def answer_sheets(self, sittings, chunk_size=ANSWER_SHEET_CHUNK_SIZE):
+        """
+        Yield ``(sitting, [(question, answer), ...])`` for every sitting,
+        questions in the order the sitting asked them and ``answer`` the
+        ``SittingAnswer`` or ``None``.
+
+        Questions and answers are loaded with one query each per
+        ``chunk_size`` sittings, however many sittings there are.
+        """
+        sittings = iter(sittings)
+        while True:
+            chunk = list(itertools.islice(sittings, chunk_size))
+            if not chunk:
+                return
+            question_ids = set()
+            for sitting in chunk:
+                question_ids.update(sitting._question_ids())
+            questions = Question.objects.filter(id__in=question_ids).select_subclasses()
+            questions = {question.id: question for question in questions}
+            answers = {}
+            for answer in SittingAnswer.objects.filter(sitting__in=chunk):
+                answers.setdefault(answer.sitting_id, {})[answer.question_id] = answer
+            for sitting in chunk:
+                sitting._answers = answers.get(sitting.pk, {})
+                yield sitting, [
+                    (question, sitting._answers.get(question.id))
+                    for question in sitting._in_order(questions)
+                ]
+
     def user_sitting(self, user, quiz, course):
         if (
             quiz.single_attempt
@@ -233,6 +304,15 @@ class SittingManager(models.Manager):
 
 
 class Sitting(models.Model):
+    """
+    One attempt at a quiz.
+
+    ``question_order`` is written once when the sitting starts; ``cursor``
+    is the position of the next unanswered question in it.  Answers live
+    in ``SittingAnswer`` rows, so answering a question is one INSERT and
+    one UPDATE instead of rewriting the whole sitting.
+    """
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, verbose_name=_("User"), on_delete=models.CASCADE
     )
@@ -245,22 +325,11 @@ class Sitting(models.Model):
         verbose_name=_("Question Order"),
         validators=[validate_comma_separated_integer_list],
     )
-    question_list = models.CharField(
-        max_length=1024,
-        verbose_name=_("Question List"),
-        validators=[validate_comma_separated_integer_list],
-    )
-    incorrect_questions = models.CharField(
-        max_length=1024,
-        blank=True,
-        verbose_name=_("Incorrect questions"),
-        validators=[validate_comma_separated_integer_list],
+    cursor = models.PositiveIntegerField(
+        default=0, verbose_name=_("Questions answered")
     )
     current_score = models.IntegerField(verbose_name=_("Current Score"))
     complete = models.BooleanField(default=False, verbose_name=_("Complete"))
-    user_answers = models.TextField(
-        blank=True, default="{}", verbose_name=_("User Answers")
-    )
     start = models.DateTimeField(auto_now_add=True, verbose_name=_("Start"))
     end = models.DateTimeField(null=True, blank=True, verbose_name=_("End"))
 
@@ -269,22 +338,51 @@ class Sitting(models.Model):
     class Meta:
         permissions = (("view_sittings", _("Can see completed exams.")),)
 
+    def current_question_id(self):
+        question_ids = self._question_ids()
+        if self.cursor >= len(question_ids):
+            return None
+        return question_ids[self.cursor]
+
     def get_first_question(self):
-        if not self.question_list:
+        question_id = self.current_question_id()
+        if question_id is None:
             return False
-        first_question_id = int(self.question_list.split(",", 1)[0])
-        return Question.objects.get_subclass(id=first_question_id)
+        return Question.objects.get_subclass(id=question_id)
 
-    def remove_first_question(self):
-        if not self.question_list:
-            return
-        _, remaining_questions = self.question_list.split(",", 1)
-        self.question_list = remaining_questions
-        self.save()
+    def record_answer(self, question, guess, is_correct):
+        """
+        Store the answer to the current question and advance the cursor.
+
+        Returns ``False`` without writing anything if the question was
+        already answered, e.g. when a form is submitted twice.
+        """
+        try:
+            with transaction.atomic():
+                SittingAnswer.objects.create(
+                    sitting=self,
+                    question_id=question.id,
+                    position=self.cursor,
+                    answer=str(guess),
+                    is_correct=is_correct,
+                )
+                Sitting.objects.filter(pk=self.pk).update(
+                    cursor=F("cursor") + 1,
+                    current_score=F("current_score") + int(is_correct),
+                )
+        except IntegrityError:
+            self.refresh_from_db(fields=["cursor", "current_score"])
+            return False
+        self.cursor += 1
+        self.current_score += int(is_correct)
+        self._answers = None
+        return True
 
     def add_to_score(self, points):
+        Sitting.objects.filter(pk=self.pk).update(
+            current_score=F("current_score") + int(points)
+        )
         self.current_score += int(points)
-        self.save()
 
     @property
     def get_current_score(self):
@@ -304,27 +402,43 @@ class Sitting(models.Model):
     def mark_quiz_complete(self):
         self.complete = True
         self.end = now()
-        self.save()
+        self.save(update_fields=["complete", "end"])
+
+    def _answer_map(self):
+        """``{question_id: SittingAnswer}``, loaded once per instance."""
+        if getattr(self, "_answers", None) is None:
+            self._answers = {a.question_id: a for a in self.answers.all()}
+        return self._answers
 
     def add_incorrect_question(self, question):
-        incorrect_ids = self.get_incorrect_questions
-        incorrect_ids.append(question.id)
-        self.incorrect_questions = ",".join(map(str, incorrect_ids)) + ","
-        if self.complete:
-            self.add_to_score(-1)
-        self.save()
+        answer = self._answer_map().get(question.id)
+        if answer is None:
+            SittingAnswer.objects.create(
+                sitting=self,
+                question=question,
+                position=self._question_ids().index(question.id),
+                is_correct=False,
+            )
+        elif answer.is_correct:
+            SittingAnswer.objects.filter(pk=answer.pk).update(is_correct=False)
+            if self.complete:
+                self.add_to_score(-1)
+        self._answers = None
 
     @property
     def get_incorrect_questions(self):
-        return [int(q) for q in self.incorrect_questions.split(",") if q]
+        return [
+            question_id
+            for question_id, answer in self._answer_map().items()
+            if not answer.is_correct
+        ]
 
     def remove_incorrect_question(self, question):
-        incorrect_ids = self.get_incorrect_questions
-        if question.id in incorrect_ids:
-            incorrect_ids.remove(question.id)
-            self.incorrect_questions = ",".join(map(str, incorrect_ids)) + ","
+        answer = self._answer_map().get(question.id)
+        if answer is not None and not answer.is_correct:
+            SittingAnswer.objects.filter(pk=answer.pk).update(is_correct=True)
             self.add_to_score(1)
-            self.save()
+            self._answers = None
 
     @property
     def check_if_passed(self):
@@ -337,22 +451,29 @@ class Sitting(models.Model):
         else:
             return _("You failed this quiz, try again.")
 
-    def add_user_answer(self, question, guess):
-        user_answers = json.loads(self.user_answers)
-        user_answers[str(question.id)] = guess
-        self.user_answers = json.dumps(user_answers)
-        self.save()
+    def _in_order(self, questions):
+        """``questions`` (a ``{id: question}`` map) in the order they were asked."""
+        return [
+            questions[question_id]
+            for question_id in self._question_ids()
+            if question_id in questions
+        ]
 
     def get_questions(self, with_answers=False):
-        question_ids = self._question_ids()
-        questions = sorted(
-            self.quiz.question_set.filter(id__in=question_ids).select_subclasses(),
-            key=lambda q: question_ids.index(q.id),
+        questions = self._in_order(
+            {
+                question.id: question
+                for question in self.quiz.question_set.filter(
+                    id__in=self._question_ids()
+                ).select_subclasses()
+            }
         )
         if with_answers:
-            user_answers = json.loads(self.user_answers)
+            answers = self._answer_map()
             for question in questions:
-                question.user_answer = user_answers.get(str(question.id))
+                answer = answers.get(question.id)
+                question.sitting_answer = answer
+                question.user_answer = answer.answer if answer else None
         return questions
 
     @property
@@ -364,9 +485,65 @@ class Sitting(models.Model):
         return len(self._question_ids())
 
     def progress(self):
-        answered = len(json.loads(self.user_answers))
-        total = self.get_max_score
-        return answered, total
+        return self.cursor, self.get_max_score
+
+
+class SittingAnswerManager(models.Manager):
+    def mark(self, verdicts):
+        """
+        Apply ``{answer_pk: is_correct}`` verdicts and recompute the score of
+        every affected sitting from its answers, in one transaction.
+
+        Returns the number of sittings rescored.
+        """
+        if not verdicts:
+            return 0
+        correct = [pk for pk, is_correct in verdicts.items() if is_correct]
+        incorrect = [pk for pk, is_correct in verdicts.items() if not is_correct]
+        score = Subquery(
+            self.filter(sitting=OuterRef("pk"), is_correct=True)
+            .order_by()
+            .values("sitting")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        with transaction.atomic():
+            self.filter(pk__in=correct, is_correct=False).update(is_correct=True)
+            self.filter(pk__in=incorrect, is_correct=True).update(is_correct=False)
+            sitting_ids = set(
+                self.filter(pk__in=list(verdicts)).values_list("sitting_id", flat=True)
+            )
+            Sitting.objects.filter(pk__in=sitting_ids).update(
+                current_score=Coalesce(score, 0)
+            )
+        return len(sitting_ids)
+
+
+class SittingAnswer(models.Model):
+    sitting = models.ForeignKey(
+        Sitting,
+        related_name="answers",
+        verbose_name=_("Sitting"),
+        on_delete=models.CASCADE,
+    )
+    question = models.ForeignKey(
+        "Question", verbose_name=_("Question"), on_delete=models.CASCADE
+    )
+    position = models.PositiveIntegerField(verbose_name=_("Position"))
+    answer = models.TextField(blank=True, verbose_name=_("Answer"))
+    is_correct = models.BooleanField(default=False, verbose_name=_("Correct"))
+    answered_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Answered"))
+
+    objects = SittingAnswerManager()
+
+    class Meta:
+        verbose_name = _("Sitting answer")
+        verbose_name_plural = _("Sitting answers")
+        ordering = ["sitting", "position"]
+        unique_together = [("sitting", "question")]
+
+    def __str__(self):
+        return f"{self.sitting_id}: {self.question_id}"
 
 
 class Question(models.Model):
@@ -481,3 +658,34 @@ class EssayQuestion(Question):
 
     def answer_choice_to_string(self, guess):
         return str(guess)
+
+
+def bump_quiz_version(quizzes):
+    """Invalidate the cached snapshots of ``quizzes`` (a ``Quiz`` queryset)."""
+    quizzes.update(version=F("version") + 1)
+
+
+@receiver(post_save, sender=MCQuestion)
+@receiver(post_save, sender=EssayQuestion)
+@receiver(pre_delete, sender=MCQuestion)
+@receiver(pre_delete, sender=EssayQuestion)
+def question_changed(sender, instance, **kwargs):
+    bump_quiz_version(Quiz.objects.filter(question__id=instance.id))
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    bump_quiz_version(Quiz.objects.filter(question__id=instance.question_id))
+
+
+@receiver(m2m_changed, sender=Question.quiz.through)
+def quiz_questions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        bump_quiz_version(Quiz.objects.filter(pk=instance.pk))
+    elif action == "pre_clear":
+        bump_quiz_version(Quiz.objects.filter(question__id=instance.id))
+    else:
+        bump_quiz_version(Quiz.objects.filter(pk__in=pk_set))
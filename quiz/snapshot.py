@@ -0,0 +1,128 @@
+"""
+Immutable snapshot of a quiz's questions and choices.
+
+Taking a quiz used to load the current question (a multi-table
+``get_subclass`` join) and its choices on every request, and grading hit
+``Choice`` again.  The snapshot holds everything needed to render and grade
+every question and is cached under ``Quiz.version`` and the active language
+(the text fields are translated).  Editing the quiz, its
+questions or their choices bumps the version (see the receivers in
+``quiz.models``), so a stale snapshot is never read and simply expires.
+"""
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import get_language
+
+from .models import Choice, EssayQuestion, Question
+
+SNAPSHOT_CACHE_KEY = "quiz:snapshot:%s:%s:%s"
+
+
+class ChoiceSnapshot:
+    __slots__ = ("id", "choice_text", "correct")
+
+    def __init__(self, id, choice_text, correct):
+        self.id = id
+        self.choice_text = choice_text
+        self.correct = correct
+
+    def __str__(self):
+        return self.choice_text
+
+
+class QuestionSnapshot:
+    """Read-only stand-in for ``MCQuestion`` / ``EssayQuestion`` in quiz views."""
+
+    def __init__(self, question, choices=()):
+        self.id = question.id
+        self.content = question.content
+        self.explanation = question.explanation
+        self.figure_url = question.figure.url if question.figure else ""
+        self.question_type = question.__class__.__name__
+        self.is_essay = isinstance(question, EssayQuestion)
+        self.choice_order = getattr(question, "choice_order", "")
+        self.choices = tuple(choices)
+        self._choice_map = {choice.id: choice for choice in self.choices}
+
+    def __str__(self):
+        return self.content
+
+    def get_choices(self):
+        if self.choice_order == "content":
+            return sorted(self.choices, key=lambda choice: choice.choice_text)
+        if self.choice_order == "random":
+            return random.sample(self.choices, len(self.choices))
+        return list(self.choices)
+
+    def get_choices_list(self):
+        return [(choice.id, choice.choice_text) for choice in self.get_choices()]
+
+    def _choice(self, guess):
+        try:
+            return self._choice_map.get(int(guess))
+        except (TypeError, ValueError):
+            return None
+
+    def check_if_correct(self, guess):
+        if self.is_essay:
+            return False  # Needs manual grading
+        choice = self._choice(guess)
+        return bool(choice and choice.correct)
+
+    def answer_choice_to_string(self, guess):
+        if self.is_essay:
+            return str(guess)
+        choice = self._choice(guess)
+        return choice.choice_text if choice else ""
+
+
+class QuizSnapshot:
+    def __init__(self, questions):
+        self.questions = {question.id: question for question in questions}
+
+    def __bool__(self):
+        return bool(self.questions)
+
+    def get(self, question_id):
+        """
+        The question with ``question_id``, or ``None``.
+
+        A sitting may still reference a question that was unlinked from the
+        quiz after it started; that one is loaded from the database.
+        """
+        if question_id is None:
+            return None
+        question = self.questions.get(question_id)
+        if question is None:
+            question = _load_questions(Question.objects.filter(id=question_id))
+            question = question[0] if question else None
+        return question
+
+
+def _load_questions(queryset):
+    questions = list(queryset.select_subclasses())
+    choices = {}
+    for choice in Choice.objects.filter(
+        question_id__in=[q.id for q in questions]
+    ).order_by("id"):
+        choices.setdefault(choice.question_id, []).append(
+            ChoiceSnapshot(choice.id, choice.choice_text, choice.correct)
+        )
+    return [QuestionSnapshot(q, choices.get(q.id, ())) for q in questions]
+
+
+def get_quiz_snapshot(quiz):
+    """
+    Return the cached ``QuizSnapshot`` for the current version of ``quiz``,
+    in the active language.
+    """
+    key = SNAPSHOT_CACHE_KEY % (quiz.pk, quiz.version, get_language())
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = QuizSnapshot(_load_questions(quiz.question_set.all()))
+        cache.set(
+            key, snapshot, getattr(settings, "QUIZ_SNAPSHOT_CACHE_TIMEOUT", 3600)
+        )
+    return snapshot
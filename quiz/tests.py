@@ -1,3 +1,394 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import translation
+
+from accounts.models import User
+from core.profiling import record_queries
+from course.models import Course, Program
+
+from .models import (
+    Choice,
+    EssayQuestion,
+    MCQuestion,
+    Progress,
+    ProgressScore,
+    Question,
+    Quiz,
+    Sitting,
+    SittingAnswer,
+)
+from .analytics import get_item_analysis
+from .snapshot import get_quiz_snapshot
+
+
+class SittingAnswerTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(title="Program")
+        course = Course.objects.create(
+            title="Course",
+            code="C-1",
+            program=program,
+            level=settings.BACHELOR_DEGREE,
+            semester=settings.FIRST,
+        )
+        self.quiz = Quiz.objects.create(course=course, title="Quiz", pass_mark=50)
+        self.questions = []
+        for i in range(3):
+            question = MCQuestion.objects.create(content=f"Question {i}")
+            question.quiz.add(self.quiz)
+            self.questions.append(question)
+        self.user = User.objects.create_user(username="student", is_student=True)
+        self.sitting = Sitting.objects.new_sitting(self.user, self.quiz, course)
+
+    def test_answer_is_one_insert_and_one_update(self):
+        question = self.sitting.get_first_question()
+        with self.assertNumQueries(4):  # savepoint, INSERT, UPDATE, release
+            self.assertTrue(self.sitting.record_answer(question, 7, True))
+
+        self.sitting.refresh_from_db()
+        self.assertEqual(self.sitting.progress(), (1, 3))
+        self.assertEqual(self.sitting.current_score, 1)
+        self.assertEqual(self.sitting.get_first_question().id, self.questions[1].id)
+
+    def test_double_submit_is_ignored(self):
+        question = self.sitting.get_first_question()
+        self.sitting.record_answer(question, 7, False)
+        self.assertFalse(self.sitting.record_answer(question, 8, True))
+
+        self.sitting.refresh_from_db()
+        self.assertEqual(self.sitting.cursor, 1)
+        self.assertEqual(self.sitting.current_score, 0)
+        self.assertEqual(SittingAnswer.objects.get(sitting=self.sitting).answer, "7")
+
+    def test_marking_updates_score_and_incorrect_list(self):
+        for question in self.questions:
+            self.sitting.record_answer(question, 1, question is not self.questions[2])
+        self.sitting.mark_quiz_complete()
+        self.assertEqual(self.sitting.get_incorrect_questions, [self.questions[2].id])
+
+        self.sitting.remove_incorrect_question(self.questions[2])
+        self.sitting.add_incorrect_question(self.questions[0])
+        self.sitting.refresh_from_db()
+        self.assertEqual(self.sitting.current_score, 2)
+        self.assertEqual(self.sitting.get_incorrect_questions, [self.questions[0].id])
+        self.assertEqual(
+            [q.user_answer for q in self.sitting.get_questions(with_answers=True)],
+            ["1", "1", "1"],
+        )
+
+
+class ProgressScoreTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(title="Program")
+        course = Course.objects.create(
+            title="Course",
+            code="C-1",
+            program=program,
+            level=settings.BACHELOR_DEGREE,
+            semester=settings.FIRST,
+        )
+        self.exam = Quiz.objects.create(course=course, title="Exam", category="exam")
+        self.practice = Quiz.objects.create(
+            course=course, title="Practice", category="practice"
+        )
+        self.user = User.objects.create_user(username="student", is_student=True)
+
+    def test_scores_are_incremented_in_place(self):
+        ProgressScore.objects.add(self.user, self.exam, 1, 1)
+        with self.assertNumQueries(1):
+            ProgressScore.objects.add(self.user, self.exam, 0, 1)
+        ProgressScore.objects.add(self.user, self.exam, 1, 1)
+
+        score = ProgressScore.objects.get(user=self.user, quiz=self.exam)
+        self.assertEqual((score.score, score.possible), (2, 3))
+
+    def test_category_scores_are_one_query(self):
+        progress = Progress.objects.new_progress(self.user)
+        progress.update_score(self.exam, 3, 4)
+        progress.update_score(self.practice, 0, 2)
+
+        with self.assertNumQueries(1):
+            scores = progress.list_all_cat_scores()
+        self.assertEqual(
+            {str(category): value for category, value in scores.items()},
+            {"Exam": [3, 1, 75], "Practice Quiz": [0, 2, 0]},
+        )
+
+
+class QuizSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        program = Program.objects.create(title="Program")
+        self.course = Course.objects.create(
+            title="Course",
+            code="C-1",
+            program=program,
+            level=settings.BACHELOR_DEGREE,
+            semester=settings.FIRST,
+        )
+        self.quiz = Quiz.objects.create(course=self.course, title="Quiz")
+        self.choices = []
+        for i in range(2):
+            question = MCQuestion.objects.create(content=f"Question {i}")
+            question.quiz.add(self.quiz)
+            self.choices.append(
+                [
+                    Choice.objects.create(
+                        question=question, choice_text="Yes", correct=True
+                    ),
+                    Choice.objects.create(question=question, choice_text="No"),
+                ]
+            )
+        self.quiz.refresh_from_db()
+
+    def test_snapshot_is_cached_until_the_quiz_changes(self):
+        snapshot = get_quiz_snapshot(self.quiz)
+        right, wrong = self.choices[0]
+        question = snapshot.get(right.question_id)
+        self.assertTrue(question.check_if_correct(right.id))
+        self.assertFalse(question.check_if_correct(wrong.id))
+        with self.assertNumQueries(0):
+            get_quiz_snapshot(self.quiz)
+
+        wrong.correct = True
+        wrong.save()
+        self.quiz.refresh_from_db()
+        question = get_quiz_snapshot(self.quiz).get(wrong.question_id)
+        self.assertTrue(question.check_if_correct(wrong.id))
+
+    def test_snapshot_is_cached_per_language(self):
+        right = self.choices[0][0]
+        Question.objects.filter(pk=right.question_id).update(
+            content_fr="Question 0 (fr)"
+        )
+        Choice.objects.filter(pk=right.pk).update(choice_text_fr="Oui")
+        with translation.override("fr"):
+            question = get_quiz_snapshot(self.quiz).get(right.question_id)
+            self.assertEqual(question.content, "Question 0 (fr)")
+            self.assertEqual(str(question.choices[0]), "Oui")
+        with translation.override("en"):
+            question = get_quiz_snapshot(self.quiz).get(right.question_id)
+            self.assertEqual(question.content, "Question 0")
+            self.assertEqual(str(question.choices[0]), "Yes")
+
+    def test_answering_runs_no_question_or_choice_queries(self):
+        user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.force_login(user)
+        url = reverse("quiz_take", args=[self.course.pk, self.quiz.slug])
+        self.client.get(url)
+
+        with record_queries() as recorder:
+            response = self.client.post(url, {"answers": self.choices[0][0].id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context["question"].id, self.choices[1][0].question_id
+        )
+        self.assertFalse(
+            [
+                sql
+                for sql, _ in recorder.queries
+                if "quiz_question" in sql or "quiz_choice" in sql
+            ]
+        )
+
+
+class MarkingTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(title="Program")
+        course = Course.objects.create(
+            title="Course",
+            code="C-1",
+            program=program,
+            level=settings.BACHELOR_DEGREE,
+            semester=settings.FIRST,
+        )
+        quiz = Quiz.objects.create(course=course, title="Quiz")
+        self.essay = EssayQuestion.objects.create(content="Explain")
+        self.essay.quiz.add(quiz)
+        self.sittings = []
+        for i in range(4):
+            user = User.objects.create_user(username=f"student{i}", is_student=True)
+            sitting = Sitting.objects.new_sitting(user, quiz, course)
+            sitting.record_answer(self.essay, f"answer {i}", False)
+            sitting.mark_quiz_complete()
+            self.sittings.append(sitting)
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="password"
+        )
+        self.client.force_login(self.admin)
+
+    def _scores(self):
+        return list(
+            Sitting.objects.order_by("pk").values_list("current_score", flat=True)
+        )
+
+    def test_mark_recomputes_scores_in_sql(self):
+        answers = list(SittingAnswer.objects.order_by("sitting_id"))
+        verdicts = {answer.pk: i % 2 == 0 for i, answer in enumerate(answers)}
+        with self.assertNumQueries(6):
+            self.assertEqual(SittingAnswer.objects.mark(verdicts), 4)
+        self.assertEqual(self._scores(), [1, 0, 1, 0])
+
+    def test_question_marking_form(self):
+        url = reverse("quiz_question_marking", args=[self.essay.pk])
+        response = self.client.get(url)
+        answers = list(response.context["answers"])
+        self.assertEqual(len(answers), 4)
+
+        self.client.post(
+            url,
+            {
+                "answer": [answer.pk for answer in answers],
+                "correct": [answers[0].pk, answers[3].pk],
+            },
+        )
+        self.assertEqual(self._scores(), [1, 0, 0, 1])
+
+    def test_sitting_marking_form(self):
+        sitting = self.sittings[1]
+        answer = sitting.answers.get()
+        url = reverse("quiz_marking_detail", args=[sitting.pk])
+        self.assertContains(self.client.get(url), "answer 1")
+        self.client.post(url, {"answer": [answer.pk], "correct": [answer.pk]})
+        self.assertEqual(self._scores(), [0, 1, 0, 0])
+
+        self.client.post(url, {"answer": [answer.pk]})
+        self.assertEqual(self._scores(), [0, 0, 0, 0])
+
+    def test_marking_list_query_count_is_flat(self):
+        with record_queries() as recorder:
+            response = self.client.get(reverse("quiz_marking"))
+        self.assertEqual(len(response.context["sitting_list"]), 4)
+        self.assertFalse(recorder.duplicates())
+
+    def test_answer_sheets_load_in_two_queries(self):
+        sittings = list(Sitting.objects.order_by("pk"))
+        with self.assertNumQueries(2):
+            sheets = list(Sitting.objects.answer_sheets(sittings))
+        self.assertEqual(
+            [(sitting.pk, [a.answer for _, a in sheet]) for sitting, sheet in sheets],
+            [(sitting.pk, [f"answer {i}"]) for i, sitting in enumerate(sittings)],
+        )
+
+    def test_answer_scripts_export(self):
+        response = self.client.get(
+            reverse("quiz_answer_scripts", args=[self.essay.quiz.get().pk])
+        )
+        rows = response.content.decode().splitlines()
+        self.assertEqual(len(rows), 5)
+        self.assertIn("student0", rows[1])
+        self.assertIn("answer 0", rows[1])
+
+
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        program = Program.objects.create(title="Program")
+        course = Course.objects.create(
+            title="Course",
+            code="C-1",
+            program=program,
+            level=settings.BACHELOR_DEGREE,
+            semester=settings.FIRST,
+        )
+        self.quiz = Quiz.objects.create(course=course, title="Quiz")
+        self.questions = []
+        for i in range(2):
+            question = MCQuestion.objects.create(content=f"Question {i}")
+            question.quiz.add(self.quiz)
+            right = Choice.objects.create(
+                question=question, choice_text="Yes", correct=True
+            )
+            wrong = Choice.objects.create(question=question, choice_text="No")
+            self.questions.append((question, right, wrong))
+        # Who answered each question correctly, per student
+        for i, verdicts in enumerate([(1, 1), (1, 0), (0, 0), (0, 0)]):
+            user = User.objects.create_user(username=f"student{i}", is_student=True)
+            sitting = Sitting.objects.new_sitting(user, self.quiz, course)
+            for (question, right, wrong), ok in zip(self.questions, verdicts):
+                sitting.record_answer(question, (right if ok else wrong).id, bool(ok))
+            sitting.mark_quiz_complete()
+        self.quiz.refresh_from_db()
+
+    def test_report(self):
+        report = get_item_analysis(self.quiz)
+        self.assertEqual(report["sittings"], 4)
+        self.assertEqual(report["mean_score"], 0.75)
+        first, second = report["questions"]
+        self.assertEqual((first["correct_rate"], second["correct_rate"]), (0.5, 0.25))
+        self.assertEqual(first["discrimination"], 0.577)
+        self.assertEqual(second["discrimination"], 0.577)
+        self.assertEqual(
+            [(c["text"], c["count"]) for c in second["choices"]], [("Yes", 1), ("No", 3)]
+        )
+        with self.assertNumQueries(0):
+            get_item_analysis(self.quiz)
+
+    def test_report_is_cached_per_language(self):
+        question = self.questions[0][0]
+        Question.objects.filter(pk=question.pk).update(content_fr="Question 0 (fr)")
+        with translation.override("fr"):
+            report = get_item_analysis(self.quiz)
+            self.assertEqual(report["questions"][0]["content"], "Question 0 (fr)")
+        with translation.override("en"):
+            report = get_item_analysis(self.quiz)
+            self.assertEqual(report["questions"][0]["content"], "Question 0")
+
+    def test_admin_page(self):
+        self.client.force_login(
+            User.objects.create_superuser(
+                username="admin", email="admin@example.com", password="password"
+            )
+        )
+        response = self.client.get(
+            reverse("admin:quiz_quiz_item_analysis", args=[self.quiz.pk])
+        )
+        self.assertContains(response, "Question 1")
+
+
+class SittingAnswerMigrationTests(TransactionTestCase):
+    before = [("quiz", "0004_alter_essayquestion_options_and_more")]
+
+    def test_reverse_with_sittings(self):
+        program = Program.objects.create(title="Program")
+        course = Course.objects.create(
+            title="Course",
+            code="C-1",
+            program=program,
+            level=settings.BACHELOR_DEGREE,
+            semester=settings.FIRST,
+        )
+        quiz = Quiz.objects.create(course=course, title="Quiz")
+        questions = []
+        for i in range(3):
+            question = MCQuestion.objects.create(content=f"Question {i}")
+            question.quiz.add(quiz)
+            questions.append(question)
+        user = User.objects.create_user(username="student", is_student=True)
+        sitting = Sitting.objects.new_sitting(user, quiz, course)
+        sitting.record_answer(questions[0], 5, False)
+
+        executor = MigrationExecutor(connection)
+        latest = executor.loader.graph.leaf_nodes("quiz")
+        executor.migrate(self.before)
+        try:
+            apps = executor.loader.project_state(self.before).apps
+            old = apps.get_model("quiz", "Sitting").objects.get()
+            self.assertEqual(
+                old.question_list, f"{questions[1].id},{questions[2].id},"
+            )
+            self.assertEqual(old.incorrect_questions, f"{questions[0].id},")
+            self.assertEqual(
+                json.loads(old.user_answers), {str(questions[0].id): "5"}
+            )
+        finally:
+            executor = MigrationExecutor(connection)
+            executor.migrate(latest)
@@ -11,6 +11,16 @@ urlpatterns = [
         view=views.QuizMarkingDetail.as_view(),
         name="quiz_marking_detail",
     ),
+    path(
+        "marking/<int:pk>/answer-scripts/",
+        views.quiz_answer_scripts,
+        name="quiz_answer_scripts",
+    ),
+    path(
+        "marking/question/<int:pk>/",
+        view=views.QuestionMarking.as_view(),
+        name="quiz_question_marking",
+    ),
     path("<int:pk>/<slug>/take/", view=views.QuizTake.as_view(), name="quiz_take"),
     path("<slug>/quiz_add/", views.QuizCreateView.as_view(), name="quiz_create"),
     path("<slug>/<int:pk>/add/", views.QuizUpdateView.as_view(), name="quiz_update"),
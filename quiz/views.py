@@ -1,6 +1,9 @@
+import csv
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.decorators import method_decorator
 from django.views.generic import (
@@ -22,13 +25,15 @@ from .forms import (
 )
 from .models import (
     Course,
-    EssayQuestion,
     MCQuestion,
     Progress,
+    ProgressScore,
     Question,
     Quiz,
     Sitting,
+    SittingAnswer,
 )
+from .snapshot import get_quiz_snapshot
 
 
 # ########################################################
@@ -171,30 +176,55 @@ class QuizUserProgressView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         progress, _ = Progress.objects.get_or_create(user=self.request.user)
-        context["cat_scores"] = progress.list_all_cat_scores
+        context["cat_scores"] = progress.list_all_cat_scores()
         context["exams"] = progress.show_exams()
         context["exams_counter"] = context["exams"].count()
         return context
 
 
+MARKING_PAGE_SIZE = 50
+
+
+def _marking_queryset(user):
+    """Completed sittings ``user`` may mark."""
+    queryset = Sitting.objects.filter(complete=True)
+    if not user.is_superuser:
+        queryset = queryset.filter(
+            quiz__course__allocated_course__lecturer__pk=user.id
+        ).distinct()
+    return queryset
+
+
+def _posted_verdicts(request, answers):
+    """
+    ``{answer_pk: is_correct}`` for the posted ``answer`` ids found in
+    ``answers``; an answer is correct when its ``correct`` box is ticked.
+    """
+    posted = [pk for pk in request.POST.getlist("answer") if pk.isdigit()]
+    correct = set(request.POST.getlist("correct"))
+    return {
+        pk: str(pk) in correct
+        for pk in answers.filter(pk__in=posted).values_list("pk", flat=True)
+    }
+
+
 @method_decorator([login_required, lecturer_required], name="dispatch")
 class QuizMarkingList(ListView):
     model = Sitting
-    template_name = "quiz/quiz_marking_list.html"
+    template_name = "quiz/sitting_list.html"
+    paginate_by = MARKING_PAGE_SIZE
 
     def get_queryset(self):
-        queryset = Sitting.objects.filter(complete=True)
-        if not self.request.user.is_superuser:
-            queryset = queryset.filter(
-                quiz__course__allocated_course__lecturer__pk=self.request.user.id
-            )
+        queryset = _marking_queryset(self.request.user).select_related(
+            "user", "quiz__course"
+        )
         quiz_filter = self.request.GET.get("quiz_filter")
         if quiz_filter:
             queryset = queryset.filter(quiz__title__icontains=quiz_filter)
         user_filter = self.request.GET.get("user_filter")
         if user_filter:
             queryset = queryset.filter(user__username__icontains=user_filter)
-        return queryset
+        return queryset.order_by("-end", "-pk")
 
 
 @method_decorator([login_required, lecturer_required], name="dispatch")
@@ -202,16 +232,14 @@ class QuizMarkingDetail(DetailView):
     model = Sitting
     template_name = "quiz/quiz_marking_detail.html"
 
+    def get_queryset(self):
+        return _marking_queryset(self.request.user).select_related("user", "quiz")
+
     def post(self, request, *args, **kwargs):
         sitting = self.get_object()
-        question_id = request.POST.get("qid")
-        if question_id:
-            question = Question.objects.get_subclass(id=int(question_id))
-            if int(question_id) in sitting.get_incorrect_questions:
-                sitting.remove_incorrect_question(question)
-            else:
-                sitting.add_incorrect_question(question)
-        return self.get(request, *args, **kwargs)
+        SittingAnswer.objects.mark(_posted_verdicts(request, sitting.answers.all()))
+        messages.success(request, "Marks saved.")
+        return redirect("quiz_marking_detail", pk=sitting.pk)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -219,6 +247,76 @@ class QuizMarkingDetail(DetailView):
         return context
 
 
+@login_required
+@lecturer_required
+def quiz_answer_scripts(request, pk):
+    """Every completed answer script of a quiz as one CSV, row per answer."""
+    quiz = get_object_or_404(Quiz, pk=pk)
+    snapshot = get_quiz_snapshot(quiz)
+    sittings = (
+        _marking_queryset(request.user)
+        .filter(quiz=quiz)
+        .select_related("user")
+        .order_by("user__username", "pk")
+    )
+
+    response = HttpResponse(content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{quiz.slug}_answers.csv"'
+    writer = csv.writer(response)
+    writer.writerow(["Student", "Completed", "#", "Question", "Answer", "Correct"])
+    for sitting, sheet in Sitting.objects.answer_sheets(sittings.iterator()):
+        for number, (question, answer) in enumerate(sheet, start=1):
+            if answer is None:
+                text, correct = "", ""
+            else:
+                text = snapshot.get(question.id).answer_choice_to_string(answer.answer)
+                correct = "Yes" if answer.is_correct else "No"
+            writer.writerow(
+                [
+                    sitting.user.username,
+                    sitting.end.strftime("%Y-%m-%d %H:%M") if sitting.end else "",
+                    number,
+                    question.content,
+                    text,
+                    correct,
+                ]
+            )
+    return response
+
+
+@method_decorator([login_required, lecturer_required], name="dispatch")
+class QuestionMarking(ListView):
+    """Every completed answer to one question, marked in a single form."""
+
+    template_name = "quiz/question_marking.html"
+    context_object_name = "answers"
+    paginate_by = MARKING_PAGE_SIZE
+
+    def get_queryset(self):
+        return (
+            SittingAnswer.objects.filter(
+                question_id=self.kwargs["pk"],
+                sitting__in=_marking_queryset(self.request.user),
+            )
+            .select_related("sitting__user", "sitting__quiz")
+            .order_by("sitting__user__username", "sitting_id")
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["question"] = get_object_or_404(
+            Question.objects.select_subclasses(), pk=self.kwargs["pk"]
+        )
+        return context
+
+    def post(self, request, *args, **kwargs):
+        count = SittingAnswer.objects.mark(
+            _posted_verdicts(request, self.get_queryset())
+        )
+        messages.success(request, f"Marks saved for {count} sittings.")
+        return redirect(request.get_full_path())
+
+
 # ########################################################
 # Quiz Taking View
 # ########################################################
@@ -233,7 +331,8 @@ class QuizTake(FormView):
     def dispatch(self, request, *args, **kwargs):
         self.quiz = get_object_or_404(Quiz, slug=self.kwargs["slug"])
         self.course = get_object_or_404(Course, pk=self.kwargs["pk"])
-        if not Question.objects.filter(quiz=self.quiz).exists():
+        self.snapshot = get_quiz_snapshot(self.quiz)
+        if not self.snapshot:
             messages.warning(request, "This quiz has no questions available.")
             return redirect("quiz_index", slug=self.course.slug)
 
@@ -248,7 +347,7 @@ class QuizTake(FormView):
             return redirect("quiz_index", slug=self.course.slug)
 
         # Set self.question and self.progress here
-        self.question = self.sitting.get_first_question()
+        self.question = self.snapshot.get(self.sitting.current_question_id())
         self.progress = self.sitting.progress()
 
         return super().dispatch(request, *args, **kwargs)
@@ -259,27 +358,28 @@ class QuizTake(FormView):
         return kwargs
 
     def get_form_class(self):
-        if isinstance(self.question, EssayQuestion):
+        if self.question and self.question.is_essay:
             return EssayForm
         return self.form_class
 
     def form_valid(self, form):
         self.form_valid_user(form)
-        if not self.sitting.get_first_question():
+        if not self.question:
             return self.final_result_user()
         return super().get(self.request)
 
     def form_valid_user(self, form):
-        progress, _ = Progress.objects.get_or_create(user=self.request.user)
         guess = form.cleaned_data["answers"]
         is_correct = self.question.check_if_correct(guess)
 
-        if is_correct:
-            self.sitting.add_to_score(1)
-            progress.update_score(self.question, 1, 1)
-        else:
-            self.sitting.add_incorrect_question(self.question)
-            progress.update_score(self.question, 0, 1)
+        if not self.sitting.record_answer(self.question, guess, is_correct):
+            # Already answered (double submit): just move on to the next question
+            self.previous = {}
+            self.question = self.snapshot.get(self.sitting.current_question_id())
+            self.progress = self.sitting.progress()
+            return
+
+        ProgressScore.objects.add(self.request.user, self.quiz, int(is_correct), 1)
 
         if not self.quiz.answers_at_end:
             self.previous = {
@@ -287,16 +387,13 @@ class QuizTake(FormView):
                 "previous_outcome": is_correct,
                 "previous_question": self.question,
                 "answers": self.question.get_choices(),
-                "question_type": {self.question.__class__.__name__: True},
+                "question_type": {self.question.question_type: True},
             }
         else:
             self.previous = {}
 
-        self.sitting.add_user_answer(self.question, guess)
-        self.sitting.remove_first_question()
-
         # Update self.question and self.progress for the next question
-        self.question = self.sitting.get_first_question()
+        self.question = self.snapshot.get(self.sitting.current_question_id())
         self.progress = self.sitting.progress()
 
     def get_context_data(self, **kwargs):
@@ -0,0 +1,449 @@
+"""
+Payload collection and reportlab builders for result documents.
+
+Builders only read the payload dict so they can run on a render worker,
+away from the request and the database connection.
+"""
+import os
+
+from django.conf import settings
+
+from reportlab.platypus import (
+    SimpleDocTemplate,
+    Paragraph,
+    Spacer,
+    Table,
+    TableStyle,
+    Image,
+)
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER, TA_RIGHT
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+
+from .models import TakenCourse, PASS, FAIL
+
+CM = 2.54
+
+RESULT_SHEET = "result_sheet"
+REGISTRATION_FORM = "registration_form"
+
+
+# ########################################################
+# Payloads
+# ########################################################
+
+
+def result_sheet_payload(course, lecturer, current_semester, current_session):
+    rows = []
+    no_of_pass = 0
+    no_of_fail = 0
+    taken_courses = (
+        TakenCourse.objects.filter(course=course)
+        .select_related("student__student")
+        .order_by("pk")
+    )
+    for taken in taken_courses:
+        user = taken.student.student
+        rows.append(
+            [
+                user.username.upper(),
+                user.get_full_name.capitalize(),
+                str(taken.total),
+                taken.grade,
+                str(taken.point),
+                taken.comment,
+            ]
+        )
+        if taken.comment == PASS:
+            no_of_pass += 1
+        elif taken.comment == FAIL:
+            no_of_fail += 1
+
+    fname = (
+        str(current_semester)
+        + "_semester_"
+        + str(current_session)
+        + "_"
+        + str(course)
+        + "_resultSheet.pdf"
+    )
+    return {
+        "filename": fname.replace("/", "-"),
+        "semester": str(current_semester),
+        "session": str(current_session),
+        "lecturer": lecturer.get_full_name,
+        "level": str(course.level),
+        "rows": rows,
+        "no_of_pass": no_of_pass,
+        "no_of_fail": no_of_fail,
+        "logo": settings.STATICFILES_DIRS[0] + "/img/brand.png",
+    }
+
+
+def registration_form_payload(user, student, current_session):
+    taken_courses = TakenCourse.objects.filter(student=student).select_related(
+        "course"
+    )
+    first_semester = []
+    second_semester = []
+    for taken in taken_courses:
+        course = taken.course
+        row = [course.code.upper(), course.title, course.credit]
+        if course.semester == settings.FIRST:
+            first_semester.append(row)
+        elif course.semester == settings.SECOND:
+            second_semester.append(row)
+
+    picture = settings.BASE_DIR + user.get_picture()
+    return {
+        "filename": (user.username + ".pdf").replace("/", "-"),
+        "username": user.username.upper(),
+        "full_name": user.get_full_name.upper(),
+        "session": current_session.session.upper(),
+        "level": student.level,
+        "first_semester": first_semester,
+        "second_semester": second_semester,
+        "logo": settings.STATICFILES_DIRS[0] + "/img/brand.png",
+        "picture": picture,
+        # A replaced upload may keep its name; the mtime keeps the cache honest.
+        "picture_mtime": os.path.getmtime(picture) if os.path.exists(picture) else None,
+    }
+
+
+# ########################################################
+# Builders
+# ########################################################
+
+
+def build_result_sheet(path, payload):
+    doc = SimpleDocTemplate(
+        path,
+        rightMargin=0,
+        leftMargin=6.5 * CM,
+        topMargin=0.3 * CM,
+        bottomMargin=0,
+    )
+    styles = getSampleStyleSheet()
+    styles.add(
+        ParagraphStyle(name="ParagraphTitle", fontSize=11, fontName="FreeSansBold")
+    )
+    Story = [Spacer(1, 0.2)]
+
+    im = Image(payload["logo"], 1 * inch, 1 * inch)
+    im.__setattr__("_offs_x", -200)
+    im.__setattr__("_offs_y", -45)
+    Story.append(im)
+
+    style = getSampleStyleSheet()
+    normal = style["Normal"]
+    normal.alignment = TA_CENTER
+    normal.fontName = "Helvetica"
+    normal.fontSize = 12
+    normal.leading = 15
+    title = (
+        "<b> "
+        + payload["semester"]
+        + " Semester "
+        + payload["session"]
+        + " Result Sheet</b>"
+    )
+    title = Paragraph(title.upper(), normal)
+    Story.append(title)
+    Story.append(Spacer(1, 0.1 * inch))
+
+    style = getSampleStyleSheet()
+    normal = style["Normal"]
+    normal.alignment = TA_CENTER
+    normal.fontName = "Helvetica"
+    normal.fontSize = 10
+    normal.leading = 15
+    title = "<b>Course lecturer: " + payload["lecturer"] + "</b>"
+    title = Paragraph(title.upper(), normal)
+    Story.append(title)
+    Story.append(Spacer(1, 0.1 * inch))
+
+    title = "<b>Level: </b>" + payload["level"]
+    title = Paragraph(title.upper(), normal)
+    Story.append(title)
+    Story.append(Spacer(1, 0.6 * inch))
+
+    header = [("S/N", "ID NO.", "FULL NAME", "TOTAL", "GRADE", "POINT", "COMMENT")]
+
+    table_header = Table(header, [inch], [0.5 * inch])
+    table_header.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, -1), colors.black),
+                ("TEXTCOLOR", (1, 0), (-1, -1), colors.white),
+                ("TEXTCOLOR", (0, 0), (0, 0), colors.cyan),
+                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+                ("BOX", (0, 0), (-1, -1), 1, colors.black),
+            ]
+        )
+    )
+    Story.append(table_header)
+
+    for count, (username, full_name, total, grade, point, comment) in enumerate(
+        payload["rows"], start=1
+    ):
+        data = [
+            (
+                count,
+                username,
+                Paragraph(full_name, styles["Normal"]),
+                total,
+                grade,
+                point,
+                comment,
+            )
+        ]
+        t_body = Table(data, colWidths=[inch])
+        t_body.setStyle(
+            TableStyle(
+                [
+                    ("INNERGRID", (0, 0), (-1, -1), 0.05, colors.black),
+                    ("BOX", (0, 0), (-1, -1), 0.1, colors.black),
+                ]
+            )
+        )
+        Story.append(t_body)
+
+    Story.append(Spacer(1, 1 * inch))
+    style_right = ParagraphStyle(
+        name="right", parent=styles["Normal"], alignment=TA_RIGHT
+    )
+    tbl_data = [
+        [
+            Paragraph("<b>Date:</b>_____________________________", styles["Normal"]),
+            Paragraph(
+                "<b>No. of PASS:</b> " + str(payload["no_of_pass"]), style_right
+            ),
+        ],
+        [
+            Paragraph(
+                "<b>Siganture / Stamp:</b> _____________________________",
+                styles["Normal"],
+            ),
+            Paragraph(
+                "<b>No. of FAIL: </b>" + str(payload["no_of_fail"]), style_right
+            ),
+        ],
+    ]
+    tbl = Table(tbl_data)
+    Story.append(tbl)
+
+    doc.build(Story)
+
+
+def _registration_semester_table(Story, style, title, rows, header_label):
+    semester = style["Normal"]
+    semester.alignment = TA_LEFT
+    semester.fontName = "Helvetica"
+    semester.fontSize = 9
+    semester.leading = 18
+    Story.append(Paragraph(title, semester))
+
+    header = [
+        (
+            "S/No",
+            "Course Code",
+            "Course Title",
+            "Unit",
+            Paragraph(header_label, style["Normal"]),
+        )
+    ]
+    table_header = Table(header, 1 * [1.4 * inch], 1 * [0.5 * inch])
+    table_header.setStyle(
+        TableStyle(
+            [
+                ("ALIGN", (-2, -2), (-2, -2), "CENTER"),
+                ("VALIGN", (-2, -2), (-2, -2), "MIDDLE"),
+                ("ALIGN", (1, 0), (1, 0), "CENTER"),
+                ("VALIGN", (1, 0), (1, 0), "MIDDLE"),
+                ("ALIGN", (0, 0), (0, 0), "CENTER"),
+                ("VALIGN", (0, 0), (0, 0), "MIDDLE"),
+                ("ALIGN", (-4, 0), (-4, 0), "LEFT"),
+                ("VALIGN", (-4, 0), (-4, 0), "MIDDLE"),
+                ("ALIGN", (-3, 0), (-3, 0), "LEFT"),
+                ("VALIGN", (-3, 0), (-3, 0), "MIDDLE"),
+                ("TEXTCOLOR", (0, -1), (-1, -1), colors.black),
+                ("INNERGRID", (0, 0), (-1, -1), 0.25, colors.black),
+                ("BOX", (0, 0), (-1, -1), 0.25, colors.black),
+            ]
+        )
+    )
+    Story.append(table_header)
+
+    total_unit = 0
+    for count, (code, course_title, credit) in enumerate(rows, start=1):
+        total_unit += int(credit)
+        data = [(count, code, Paragraph(course_title, style["Normal"]), credit, "")]
+        table_body = Table(data, 1 * [1.4 * inch], 1 * [0.3 * inch])
+        table_body.setStyle(
+            TableStyle(
+                [
+                    ("ALIGN", (-2, -2), (-2, -2), "CENTER"),
+                    ("ALIGN", (1, 0), (1, 0), "CENTER"),
+                    ("ALIGN", (0, 0), (0, 0), "CENTER"),
+                    ("ALIGN", (-4, 0), (-4, 0), "LEFT"),
+                    ("TEXTCOLOR", (0, -1), (-1, -1), colors.black),
+                    ("INNERGRID", (0, 0), (-1, -1), 0.25, colors.black),
+                    ("BOX", (0, 0), (-1, -1), 0.25, colors.black),
+                ]
+            )
+        )
+        Story.append(table_body)
+    return total_unit
+
+
+def build_registration_form(path, payload):
+    doc = SimpleDocTemplate(
+        path, rightMargin=15, leftMargin=15, topMargin=0, bottomMargin=0
+    )
+    styles = getSampleStyleSheet()
+
+    Story = [Spacer(1, 0.5)]
+    Story.append(Spacer(1, 0.4 * inch))
+
+    style = getSampleStyleSheet()
+    normal = style["Normal"]
+    normal.alignment = TA_CENTER
+    normal.fontName = "Helvetica"
+    normal.fontSize = 12
+    normal.leading = 18
+    title = "<b>EZOD UNIVERSITY OF TECHNOLOGY, ADAMA</b>"  # TODO: Make this dynamic
+    title = Paragraph(title.upper(), normal)
+    Story.append(title)
+    style = getSampleStyleSheet()
+
+    school = style["Normal"]
+    school.alignment = TA_CENTER
+    school.fontName = "Helvetica"
+    school.fontSize = 10
+    school.leading = 18
+    school_title = (
+        "<b>SCHOOL OF ELECTRICAL ENGINEERING & COMPUTING</b>"  # TODO: Make this dynamic
+    )
+    school_title = Paragraph(school_title.upper(), school)
+    Story.append(school_title)
+
+    style = getSampleStyleSheet()
+    Story.append(Spacer(1, 0.1 * inch))
+    department = style["Normal"]
+    department.alignment = TA_CENTER
+    department.fontName = "Helvetica"
+    department.fontSize = 9
+    department.leading = 18
+    department_title = (
+        "<b>DEPARTMENT OF COMPUTER SCIENCE & ENGINEERING</b>"  # TODO: Make this dynamic
+    )
+    department_title = Paragraph(department_title, department)
+    Story.append(department_title)
+    Story.append(Spacer(1, 0.3 * inch))
+
+    title = "<b><u>STUDENT COURSE REGISTRATION FORM</u></b>"
+    title = Paragraph(title.upper(), normal)
+    Story.append(title)
+
+    tbl_data = [
+        [
+            Paragraph(
+                "<b>Registration Number : " + payload["username"] + "</b>",
+                styles["Normal"],
+            )
+        ],
+        [
+            Paragraph(
+                "<b>Name : " + payload["full_name"] + "</b>",
+                styles["Normal"],
+            )
+        ],
+        [
+            Paragraph(
+                "<b>Session : " + payload["session"] + "</b>",
+                styles["Normal"],
+            ),
+            Paragraph("<b>Level: " + payload["level"] + "</b>", styles["Normal"]),
+        ],
+    ]
+    tbl = Table(tbl_data)
+    Story.append(tbl)
+    Story.append(Spacer(1, 0.6 * inch))
+
+    # FIRST SEMESTER
+    style = getSampleStyleSheet()
+    first_semester_unit = _registration_semester_table(
+        Story,
+        style,
+        "<b>FIRST SEMESTER</b>",
+        payload["first_semester"],
+        "Name, Siganture of course lecturer & Date",
+    )
+
+    style = getSampleStyleSheet()
+    semester = style["Normal"]
+    semester.alignment = TA_LEFT
+    semester.fontName = "Helvetica"
+    semester.fontSize = 8
+    semester.leading = 18
+    semester_title = (
+        "<b>Total Second First Credit : " + str(first_semester_unit) + "</b>"
+    )
+    Story.append(Paragraph(semester_title, semester))
+
+    # FIRST SEMESTER ENDS HERE
+    Story.append(Spacer(1, 0.6 * inch))
+
+    # SECOND SEMESTER
+    style = getSampleStyleSheet()
+    second_semester_unit = _registration_semester_table(
+        Story,
+        style,
+        "<b>SECOND SEMESTER</b>",
+        payload["second_semester"],
+        "<b>Name, Signature of course lecturer & Date</b>",
+    )
+
+    style = getSampleStyleSheet()
+    semester = style["Normal"]
+    semester.alignment = TA_LEFT
+    semester.fontName = "Helvetica"
+    semester.fontSize = 8
+    semester.leading = 18
+    semester_title = (
+        "<b>Total Second Semester Credit : " + str(second_semester_unit) + "</b>"
+    )
+    Story.append(Paragraph(semester_title, semester))
+
+    Story.append(Spacer(1, 2))
+    style = getSampleStyleSheet()
+    certification = style["Normal"]
+    certification.alignment = TA_JUSTIFY
+    certification.fontName = "Helvetica"
+    certification.fontSize = 8
+    certification.leading = 18
+    certification_text = (
+        "CERTIFICATION OF REGISTRATION: I certify that <b>"
+        + payload["full_name"]
+        + "</b>\
+    has been duly registered for the <b>"
+        + payload["level"]
+        + " level </b> of study in the department\
+    of COMPUTER SICENCE & ENGINEERING and that the courses and credits \
+    registered are as approved by the senate of the University"
+    )
+    Story.append(Paragraph(certification_text, certification))
+
+    im_logo = Image(payload["logo"], 1 * inch, 1 * inch)
+    setattr(im_logo, "_offs_x", -218)
+    setattr(im_logo, "_offs_y", 480)
+    Story.append(im_logo)
+
+    im = Image(payload["picture"], 1.0 * inch, 1.0 * inch)
+    setattr(im, "_offs_x", 218)
+    setattr(im, "_offs_y", 550)
+    Story.append(im)
+
+    doc.build(Story)
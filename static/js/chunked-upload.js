@@ -0,0 +1,178 @@
+"use strict";
+
+// Sends the file of a form marked with data-chunked-upload in chunks:
+// start the upload, PUT each chunk (retrying and resuming from the
+// server's offset after a failure), then complete it. Browsers without
+// fetch/Blob.slice, and forms the server rejects, fall back to a normal
+// submit so errors are rendered as usual.
+
+(function () {
+  var MAX_RETRIES = 5;
+
+  function csrfToken(form) {
+    return form.querySelector("[name=csrfmiddlewaretoken]").value;
+  }
+
+  function sleep(ms) {
+    return new Promise(function (resolve) {
+      setTimeout(resolve, ms);
+    });
+  }
+
+  function sha256(blob) {
+    if (!window.crypto || !window.crypto.subtle) {
+      return Promise.resolve(null); // only available on secure origins
+    }
+    return blob.arrayBuffer().then(function (buffer) {
+      return crypto.subtle.digest("SHA-256", buffer).then(function (hash) {
+        return Array.from(new Uint8Array(hash))
+          .map(function (b) {
+            return b.toString(16).padStart(2, "0");
+          })
+          .join("");
+      });
+    });
+  }
+
+  function json(response) {
+    return response.json().then(function (data) {
+      data.status = response.status;
+      return data;
+    });
+  }
+
+  function sendChunk(form, upload, file, offset) {
+    var end = Math.min(offset + upload.chunk_size, file.size);
+    var chunk = file.slice(offset, end);
+    return sha256(chunk).then(function (checksum) {
+      var headers = {
+        "Content-Range": "bytes " + offset + "-" + (end - 1) + "/" + file.size,
+        "Content-Type": "application/octet-stream",
+        "X-CSRFToken": csrfToken(form),
+      };
+      if (checksum) {
+        headers["X-Chunk-SHA256"] = checksum;
+      }
+      return fetch(upload.url, {
+        method: "PUT",
+        headers: headers,
+        body: chunk,
+        credentials: "same-origin",
+      }).then(json);
+    });
+  }
+
+  function currentOffset(upload) {
+    return fetch(upload.url, { credentials: "same-origin" })
+      .then(json)
+      .then(function (data) {
+        return data.offset;
+      });
+  }
+
+  function sendFile(form, upload, file, progress) {
+    var offset = upload.offset;
+    var failures = 0;
+
+    function next() {
+      progress(offset / file.size);
+      if (offset >= file.size) {
+        return Promise.resolve();
+      }
+      return sendChunk(form, upload, file, offset)
+        .then(function (data) {
+          if (data.status === 200) {
+            failures = 0;
+            offset = data.offset;
+            return next();
+          }
+          if (data.status === 409 || data.status === 400) {
+            offset = data.offset;
+            throw data;
+          }
+          throw new Error(data.error || "Upload failed");
+        })
+        .catch(function (error) {
+          failures += 1;
+          if (failures > MAX_RETRIES) {
+            throw error;
+          }
+          return sleep(1000 * failures)
+            .then(function () {
+              return currentOffset(upload);
+            })
+            .then(function (serverOffset) {
+              offset = serverOffset;
+              return next();
+            });
+        });
+    }
+
+    return next();
+  }
+
+  function upload(form, input) {
+    var file = input.files[0];
+    var button = form.querySelector("[type=submit]");
+    var label = button.innerHTML;
+    var data = new FormData(form);
+    data.delete(input.name);
+    data.append("kind", form.dataset.uploadKind);
+    data.append("filename", file.name);
+    data.append("size", file.size);
+
+    button.classList.add("disabled");
+    return fetch(form.dataset.chunkedUpload, {
+      method: "POST",
+      body: data,
+      credentials: "same-origin",
+    })
+      .then(json)
+      .then(function (started) {
+        if (started.status !== 201) {
+          // Let the regular form view show the validation errors
+          form.dataset.chunkedUpload = "";
+          form.submit();
+          return;
+        }
+        return sendFile(form, started, file, function (done) {
+          button.innerHTML =
+            gettext("Uploading") + " " + Math.floor(done * 100) + "%";
+        })
+          .then(function () {
+            return fetch(started.url + "complete/", {
+              method: "POST",
+              headers: { "X-CSRFToken": csrfToken(form) },
+              credentials: "same-origin",
+            }).then(json);
+          })
+          .then(function (completed) {
+            if (completed.redirect) {
+              window.location = completed.redirect;
+              return;
+            }
+            throw completed;
+          });
+      })
+      .catch(function (error) {
+        button.classList.remove("disabled");
+        button.innerHTML = label;
+        alert(gettext("The upload failed, please try again.") +
+          (error && error.error ? "\n" + error.error : ""));
+      });
+  }
+
+  document.querySelectorAll("form[data-chunked-upload]").forEach(function (form) {
+    var input = form.querySelector("input[type=file]");
+    if (!input || !window.fetch || !window.Blob || !Blob.prototype.slice) {
+      return;
+    }
+    form.addEventListener("submit", function (event) {
+      if (!form.dataset.chunkedUpload || !input.files.length) {
+        return;
+      }
+      event.preventDefault();
+      upload(form, input);
+    });
+  });
+})();